@@ -0,0 +1,77 @@
+"""Упреждающее чтение на «медленной» файловой системе.
+
+Каждое чтение файла задерживается (prefetch.SlowFilesystem) — так локально
+воспроизводится NFS. Общий проход всех стадий запускается без упреждения
+и с ним; результаты должны совпасть, а время — заметно сократиться.
+
+    python benchmarks/read_ahead.py --latency-ms 5 --threads 0,4,8,16
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def scan(repo: str, jobs: int, threads: int, latency: float, max_mb: float,
+         regex_timeout: float) -> dict:
+    from anatooly.analyzers.language_analyzer import LanguageAnalyzer
+    from anatooly.ignore import IgnoreEngine
+    from anatooly.patterns import ENDPOINT_PATTERNS
+    from anatooly.pipeline import FilePipeline
+    from anatooly.prefetch import ReadAhead, SlowFilesystem
+    from run import _scan_all
+
+    read_ahead = ReadAhead(threads, 4 * threads, int(max_mb * 1024 * 1024)) if threads else None
+    pipeline = FilePipeline(repo, jobs=jobs, ignore=IgnoreEngine(repo), regex_timeout=regex_timeout or None,
+                            read_ahead=read_ahead, opener=SlowFilesystem(latency, jitter=0.5))
+    distro = LanguageAnalyzer(repo, pipeline).detect_languages()
+    non_other = {l: p for l, p in distro.items() if l != "Other"}
+    main_lang = max(non_other, key=non_other.get) if non_other else None
+    active_langs = [lang for lang in distro if lang in ENDPOINT_PATTERNS]
+    return _scan_all(repo, pipeline, main_lang, active_langs)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Упреждающее чтение при задержке ФС')
+    parser.add_argument('--repo', help='Свой репозиторий вместо синтетического')
+    parser.add_argument('--synth-dir', default=os.path.join(tempfile.gettempdir(), 'anatooly-synth'))
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='Задержка на чтение файла, мс')
+    parser.add_argument('--threads', default='0,8', help='Потоков чтения через запятую (0 — без упреждения)')
+    parser.add_argument('--max-mb', type=float, default=64.0, help='Лимит прочитанного наперёд, МБ')
+    parser.add_argument('--jobs', '-j', type=int, default=1)
+    parser.add_argument('--regex-timeout', type=float, default=0.0,
+                        help='Бюджет на файл, как у anatooly --regex-timeout (0 — без рабочих-сторожей)')
+    args = parser.parse_args()
+
+    if args.repo:
+        repo = os.path.abspath(args.repo)
+    else:
+        from synth import generate
+        repo = args.synth_dir
+        generate(repo, scale=args.scale)
+
+    print('%-8s %9s %8s' % ('потоков', 'время, с', 'ускор.'))
+    reference = base = None
+    for threads in (int(t) for t in args.threads.split(',')):
+        start = time.perf_counter()
+        results = scan(repo, args.jobs, threads, args.latency_ms / 1000, args.max_mb, args.regex_timeout)
+        wall = time.perf_counter() - start
+        dump = json.dumps(results, sort_keys=True, default=lambda x: sorted(x) if isinstance(x, set) else str(x))
+        if reference is None:
+            reference, base = dump, wall
+        elif dump != reference:
+            print('результаты с %d потоками отличаются' % threads, file=sys.stderr)
+            return 1
+        print('%-8d %9.3f %7.1fx' % (threads, wall, base / wall))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
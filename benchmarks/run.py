@@ -0,0 +1,257 @@
+"""Бенчмарк по стадиям ``cli.main`` на синтетическом (или своём) репозитории.
+
+Каждая стадия запускается отдельным процессом — так пиковый RSS относится
+к ней одной. Для стадии печатаются время, файлы/с, МБ/с и пиковый RSS;
+``--save`` пишет результат в JSON-базу, ``--compare`` сравнивает с ней и
+возвращает код 1, если какая-то стадия стала медленнее порога.
+
+    python benchmarks/run.py --save benchmarks/baselines/default.json
+    python benchmarks/run.py --compare benchmarks/baselines/default.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # нет на Windows — RSS не меряется
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+# walk — обход и опись файлов; full — cli.main целиком, одним общим проходом
+STAGES = ('walk', 'languages', 'stack', 'dependencies', 'endpoints', 'headers', 'configs',
+          'report', 'full')
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux отдаёт килобайты, macOS — байты
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _wanted(pipeline, visitors):
+    # файлы и байты, которые стадия действительно получила
+    files = size = 0
+    for e in pipeline.inventory.entries:
+        if any(v.wants(e.path, e.rel) for v in visitors):
+            files += 1
+            size += e.size or 0
+    return files, size
+
+
+def run_stage(stage: str, repo: str, jobs: int) -> dict:
+    """Одна стадия в текущем процессе: подготовка не входит в замер."""
+    sys.path.insert(0, SRC)
+    from anatooly.ignore import IgnoreEngine
+    from anatooly.pipeline import FilePipeline
+    from anatooly.inventory import FileInventory
+
+    if stage == 'walk':
+        start = time.perf_counter()
+        inventory = FileInventory.scan(repo, IgnoreEngine(repo))
+        wall = time.perf_counter() - start
+        return _stats(wall, len(inventory.entries), sum(e.size or 0 for e in inventory.entries))
+
+    if stage == 'full':
+        from anatooly import cli
+        inventory = FileInventory.scan(repo, IgnoreEngine(repo))
+        argv = sys.argv
+        sys.argv = ['anatooly', repo, '--format', 'json', '--output', os.devnull, '--jobs', str(jobs)]
+        try:
+            start = time.perf_counter()
+            cli.main()
+            wall = time.perf_counter() - start
+        finally:
+            sys.argv = argv
+        return _stats(wall, len(inventory.entries), sum(e.size or 0 for e in inventory.entries))
+
+    from anatooly.analyzers.language_analyzer import LanguageAnalyzer
+    from anatooly.patterns import CONFIG_PATTERNS, ENDPOINT_PATTERNS
+
+    pipeline = FilePipeline(repo, jobs=jobs, ignore=IgnoreEngine(repo))
+    distro = LanguageAnalyzer(repo, pipeline).detect_languages()
+    non_other = {l: p for l, p in distro.items() if l != "Other"}
+    main_lang = max(non_other, key=non_other.get) if non_other else None
+    active_langs = [lang for lang in distro if lang in ENDPOINT_PATTERNS]
+
+    if stage == 'report':
+        from anatooly.analyzers.report_generator import ReportGenerator
+        results = _scan_all(repo, pipeline, main_lang, active_langs)
+        files, size = len(pipeline.inventory.entries), sum(e.size or 0 for e in pipeline.inventory.entries)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            ReportGenerator('json', os.path.join(tmp, 'report.json')).generate(results)
+            ReportGenerator('html', os.path.join(tmp, 'report.html')).generate(results)
+            wall = time.perf_counter() - start
+        return _stats(wall, files, size)
+
+    visitor = _make_visitor(stage, repo, pipeline, main_lang, active_langs, CONFIG_PATTERNS)
+    start = time.perf_counter()
+    pipeline.run([visitor])
+    visitor.finalize()
+    wall = time.perf_counter() - start
+    return _stats(wall, *_wanted(pipeline, [visitor]))
+
+
+def _make_visitor(stage, repo, pipeline, main_lang, active_langs, config_patterns):
+    if stage == 'languages':
+        from anatooly.analyzers.language_analyzer import LanguageAnalyzer
+        return LanguageAnalyzer(repo, pipeline)
+    if stage == 'stack':
+        from anatooly.analyzers.stack_analyzer import StackAnalyzer
+        visitor = StackAnalyzer(repo, main_lang or "", pipeline)
+        visitor.prepare_detectors()
+        return visitor
+    if stage == 'dependencies':
+        from anatooly.analyzers.dependency_analyzer import DependencyAnalyzer
+        return DependencyAnalyzer(repo, main_lang, pipeline)
+    if stage == 'endpoints':
+        from anatooly.detectors.endpoint_detector import EndpointDetector
+        return EndpointDetector(repo, active_langs, pipeline)
+    if stage == 'headers':
+        from anatooly.detectors.header_detector import HeaderDetector
+        return HeaderDetector(repo, active_langs, pipeline)
+    if stage == 'configs':
+        from anatooly.detectors.config_detector import ConfigDetector
+        return ConfigDetector(repo, config_patterns, pipeline)
+    raise ValueError('неизвестная стадия: %s' % stage)
+
+
+def _scan_all(repo, pipeline, main_lang, active_langs) -> dict:
+    # результаты для стадии report — тем же набором визитёров, что и в cli.main
+    from anatooly.patterns import CONFIG_PATTERNS
+    visitors = {stage: _make_visitor(stage, repo, pipeline, main_lang, active_langs, CONFIG_PATTERNS)
+                for stage in ('languages', 'stack', 'dependencies', 'endpoints', 'headers', 'configs')}
+    pipeline.run(visitors.values())
+    sloc_by_lang, total_sloc = visitors['languages'].finalize()
+    ep_res = visitors['endpoints'].finalize()
+    configs = visitors['configs']
+    return {
+        "languages":      visitors['languages'].detect_languages(),
+        "sloc":           {"by_lang": sloc_by_lang, "total": total_sloc},
+        "stack":          visitors['stack'].finalize(),
+        "dependencies":   visitors['dependencies'].finalize(),
+        "secrets":        None,
+        "endpoints":      ep_res.get('endpoints', []),
+        "ajax":           ep_res.get('ajax', []),
+        "headers":        visitors['headers'].finalize(),
+        "configs":        configs.finalize(),
+        "config_secrets": configs.secrets,
+    }
+
+
+def _stats(wall: float, files: int, size: int) -> dict:
+    return {
+        'wall_s': round(wall, 4),
+        'files': files,
+        'bytes': size,
+        'files_per_s': round(files / wall, 1) if wall else None,
+        'mb_per_s': round(size / 1024 / 1024 / wall, 2) if wall else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def measure(stage: str, repo: str, jobs: int, repeat: int) -> dict:
+    # лучший по времени из нескольких запусков; RSS — наибольший
+    best = None
+    peak = 0.0
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', stage,
+                              '--repo', repo, '--jobs', str(jobs)],
+                             check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        peak = max(peak, result['peak_rss_mb'])
+        if best is None or result['wall_s'] < best['wall_s']:
+            best = result
+    best['peak_rss_mb'] = peak
+    return best
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Печатает разницу с базой; True — есть стадия медленнее порога."""
+    regressed = False
+    print('\n%-13s %10s %10s %8s' % ('стадия', 'база, с', 'сейчас, с', 'Δ'))
+    for stage, now in current['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if not old:
+            continue
+        delta = now['wall_s'] / old['wall_s'] - 1 if old['wall_s'] else 0.0
+        mark = ''
+        if delta > threshold:
+            mark = '  РЕГРЕССИЯ'
+            regressed = True
+        print('%-13s %10.3f %10.3f %+7.1f%%%s' % (stage, old['wall_s'], now['wall_s'], delta * 100, mark))
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк стадий anatooly')
+    parser.add_argument('--repo', help='Свой репозиторий вместо синтетического')
+    parser.add_argument('--synth-dir', default=os.path.join(tempfile.gettempdir(), 'anatooly-synth'),
+                        help='Куда генерировать синтетический репозиторий')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--jobs', '-j', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='Запусков на стадию, берётся лучший')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Стадии через запятую')
+    parser.add_argument('--save', metavar='JSON', help='Записать результат как базу')
+    parser.add_argument('--compare', metavar='JSON', help='Сравнить с базой')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Допустимое замедление стадии относительно базы (0.15 = 15%%)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.repo, args.jobs)))
+        return 0
+
+    meta = {'jobs': args.jobs, 'repeat': args.repeat, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+    if args.repo:
+        repo = os.path.abspath(args.repo)
+        meta['repo'] = repo
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from synth import generate
+        repo = args.synth_dir
+        manifest = generate(repo, seed=args.seed, scale=args.scale)
+        meta.update({'seed': args.seed, 'scale': args.scale,
+                     'files': manifest['files'], 'bytes': manifest['bytes']})
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error('неизвестные стадии: %s' % ', '.join(sorted(unknown)))
+
+    print('%-13s %9s %7s %10s %9s %9s' % ('стадия', 'время, с', 'файлов', 'файлов/с', 'МБ/с', 'RSS, МБ'))
+    current = {'meta': meta, 'stages': {}}
+    for stage in stages:
+        r = current['stages'][stage] = measure(stage, repo, args.jobs, args.repeat)
+        print('%-13s %9.3f %7d %10.1f %9.2f %9.1f' % (stage, r['wall_s'], r['files'],
+                                                      r['files_per_s'] or 0, r['mb_per_s'] or 0,
+                                                      r['peak_rss_mb']))
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressed = compare(current, json.load(f), args.threshold)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
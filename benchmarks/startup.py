@@ -0,0 +1,88 @@
+"""Проверка бюджета на время старта: ``python benchmarks/startup.py [--budget MS]``.
+
+Меряет ``anatooly --help`` и импорт ``anatooly.cli`` в отдельных процессах
+(лучшее из нескольких запусков) и проверяет, что на старте не грузятся
+rich, конвейер, аналитики и детекторы. Код возврата 1 — бюджет превышен
+или тяжёлый модуль импортирован раньше времени.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+# модули, которые до разбора аргументов не нужны
+LAZY_MODULES = (
+    'rich',
+    'anatooly.pipeline',
+    'anatooly.cache',
+    'anatooly.analyzers.language_analyzer',
+    'anatooly.analyzers.stack_analyzer',
+    'anatooly.analyzers.dependency_analyzer',
+    'anatooly.analyzers.report_generator',
+    'anatooly.detectors.endpoint_detector',
+    'anatooly.detectors.header_detector',
+    'anatooly.detectors.config_detector',
+    'anatooly.detectors.code_detector',
+)
+
+_CHECK_IMPORTS = (
+    'import sys, anatooly.cli, anatooly.patterns as p\n'
+    'print("\\n".join(m for m in %r if m in sys.modules))\n'
+    'print("compiled:%%d" %% sum(len(t._compiled) for t in vars(p).values() if isinstance(t, p.LazyTable)))\n'
+) % (LAZY_MODULES,)
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = SRC + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def best_of(argv, runs: int) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=150.0,
+                        help='Бюджет на anatooly --help, мс (по умолчанию 150)')
+    parser.add_argument('--runs', type=int, default=7, help='Число запусков, берётся лучший')
+    args = parser.parse_args()
+
+    python = sys.executable
+    baseline = best_of([python, '-c', 'pass'], args.runs)
+    help_ms = best_of([python, '-m', 'anatooly.cli', '--help'], args.runs)
+    import_ms = best_of([python, '-c', 'import anatooly.cli'], args.runs)
+
+    out = subprocess.run([python, '-c', _CHECK_IMPORTS], env=_env(), check=True,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+    compiled = int(out.pop().split(':')[1])
+
+    print('python -c pass        %7.1f ms' % baseline)
+    print('import anatooly.cli   %7.1f ms' % import_ms)
+    print('anatooly --help       %7.1f ms  (бюджет %.0f ms)' % (help_ms, args.budget))
+
+    failed = False
+    if help_ms > args.budget:
+        print('FAIL: --help дольше бюджета')
+        failed = True
+    for module in out:
+        print('FAIL: %s импортирован на старте' % module)
+        failed = True
+    if compiled:
+        print('FAIL: на старте скомпилированы правила %d ключей patterns.LazyTable' % compiled)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Детерминированный синтетический репозиторий для бенчмарков.
+
+Одинаковые ``seed`` и параметры дают байт-в-байт одинаковое дерево:
+исходники на нескольких языках с маршрутами Spring/Express/Flask,
+конфиги, вендоренный ``node_modules`` (его обход должен пропускать)
+и большие минифицированные бандлы в ``dist/``.
+
+    python benchmarks/synth.py /tmp/synth --scale 2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+from typing import Dict, Optional
+
+# файлов каждого языка при scale=1
+DEFAULT_COUNTS = {
+    'java': 300,
+    'javascript': 300,
+    'typescript': 150,
+    'python': 300,
+    'go': 100,
+    'php': 100,
+    'text': 100,
+}
+# файлов в node_modules и размер каждого минифицированного бандла при scale=1
+NODE_MODULES_FILES = 500
+BUNDLES = 3
+BUNDLE_BYTES = 2 * 1024 * 1024
+
+MARKER = '.synth.json'
+
+_WORDS = ('user', 'order', 'item', 'cart', 'account', 'invoice', 'report', 'token',
+          'session', 'profile', 'payment', 'product', 'search', 'admin', 'audit', 'file')
+
+
+def _name(rnd: random.Random, parts: int = 2) -> str:
+    return '_'.join(rnd.choice(_WORDS) for _ in range(parts))
+
+
+def _camel(rnd: random.Random) -> str:
+    return ''.join(w.capitalize() for w in _name(rnd).split('_'))
+
+
+def _route(rnd: random.Random) -> str:
+    return '/api/' + '/'.join(rnd.choice(_WORDS) for _ in range(rnd.randint(1, 3)))
+
+
+def _filler(rnd: random.Random, lines: int, comment: str) -> str:
+    # обычный код без маршрутов: на нём префильтр должен отсекать правила
+    out = []
+    for _ in range(lines):
+        kind = rnd.random()
+        if kind < 0.15:
+            out.append('%s %s' % (comment, ' '.join(rnd.choice(_WORDS) for _ in range(8))))
+        elif kind < 0.2:
+            out.append('')
+        else:
+            out.append('    %s = compute(%s, %d);' % (_name(rnd), _name(rnd), rnd.randint(0, 9999)))
+    return '\n'.join(out) + '\n'
+
+
+def java_file(rnd: random.Random) -> str:
+    cls = _camel(rnd) + 'Controller'
+    methods = []
+    for _ in range(rnd.randint(1, 6)):
+        verb = rnd.choice(('Get', 'Post', 'Put', 'Delete', 'Request'))
+        methods.append(
+            '    @%sMapping("%s")\n'
+            '    public ResponseEntity<String> %s() {\n'
+            '        response.setHeader("X-%s", "%d");\n'
+            '        return ResponseEntity.ok("ok");\n'
+            '    }\n' % (verb, _route(rnd), _name(rnd, 1), _camel(rnd), rnd.randint(0, 99)))
+    return ('package com.example.%s;\n\n'
+            'import org.springframework.web.bind.annotation.*;\n'
+            'import org.springframework.http.ResponseEntity;\n\n'
+            '@RestController\npublic class %s {\n%s%s}\n'
+            % (_name(rnd, 1), cls, ''.join(methods), _filler(rnd, rnd.randint(20, 200), '//')))
+
+
+def js_file(rnd: random.Random) -> str:
+    routes = ''.join(
+        "app.%s('%s', (req, res) => {\n  res.setHeader('X-%s', '1');\n  res.json({});\n});\n"
+        % (rnd.choice(('get', 'post', 'put', 'delete')), _route(rnd), _camel(rnd))
+        for _ in range(rnd.randint(0, 5)))
+    calls = ''.join("fetch('%s')\n" % _route(rnd) for _ in range(rnd.randint(0, 3)))
+    calls += ''.join("axios.post('%s', payload)\n" % _route(rnd) for _ in range(rnd.randint(0, 2)))
+    return ("const express = require('express');\nimport React from 'react';\n"
+            "const app = express();\n%s%s%s" % (routes, calls, _filler(rnd, rnd.randint(20, 200), '//')))
+
+
+def ts_file(rnd: random.Random) -> str:
+    return ("import { Component } from '@angular/core';\n\n@Component({ selector: 'app-%s' })\n"
+            "export class %s {\n  load() { return fetch('%s'); }\n}\n%s"
+            % (_name(rnd, 1), _camel(rnd), _route(rnd), _filler(rnd, rnd.randint(20, 150), '//')))
+
+
+def py_file(rnd: random.Random) -> str:
+    routes = ''.join(
+        "@app.%s('%s')\ndef %s():\n    resp = make_response('')\n"
+        "    resp.headers['X-%s'] = '1'\n    return resp\n\n"
+        % (rnd.choice(('get', 'post', 'put', 'delete')), _route(rnd), _name(rnd), _camel(rnd))
+        for _ in range(rnd.randint(0, 5)))
+    body = _filler(rnd, rnd.randint(20, 200), '#').replace(';', '')
+    return 'from flask import Flask, make_response\n\napp = Flask(__name__)\n\n%s%s' % (routes, body)
+
+
+def go_file(rnd: random.Random) -> str:
+    routes = ''.join('\tr.HandleFunc("%s", handler)\n' % _route(rnd) for _ in range(rnd.randint(0, 4)))
+    return ('package main\n\nimport "github.com/gorilla/mux"\n\nfunc routes(r *mux.Router) {\n%s}\n%s'
+            % (routes, _filler(rnd, rnd.randint(20, 150), '//')))
+
+
+def php_file(rnd: random.Random) -> str:
+    routes = ''.join("Route::%s('%s', 'Controller@%s');\n"
+                     % (rnd.choice(('get', 'post')), _route(rnd), _name(rnd, 1))
+                     for _ in range(rnd.randint(0, 4)))
+    return '<?php\nuse Illuminate\\Support\\Facades\\Route;\n%s%s' % (routes, _filler(rnd, rnd.randint(20, 150), '//'))
+
+
+def text_file(rnd: random.Random) -> str:
+    return '\n'.join(' '.join(rnd.choice(_WORDS) for _ in range(12)) for _ in range(rnd.randint(10, 100))) + '\n'
+
+
+_LANGS = {
+    'java': ('src/main/java/com/example', '.java', java_file),
+    'javascript': ('web/src', '.js', js_file),
+    'typescript': ('web/app', '.ts', ts_file),
+    'python': ('service', '.py', py_file),
+    'go': ('cmd', '.go', go_file),
+    'php': ('php/app', '.php', php_file),
+    'text': ('docs', '.txt', text_file),
+}
+
+_CONFIGS = {
+    'package.json': json.dumps({
+        'name': 'synth', 'version': '1.0.0',
+        'dependencies': {'express': '^4.18.0', 'react': '^18.0.0', 'axios': '^1.0.0'},
+        'devDependencies': {'jest': '^29.0.0', 'webpack': '^5.0.0'},
+    }, indent=2) + '\n',
+    'requirements.txt': 'flask==2.3.0\nrequests==2.31.0\npsycopg2==2.9.0\n',
+    'pom.xml': ('<project>\n  <dependencies>\n'
+                '    <dependency><artifactId>spring-boot-starter-web</artifactId></dependency>\n'
+                '    <dependency><artifactId>mysql-connector-java</artifactId></dependency>\n'
+                '  </dependencies>\n</project>\n'),
+    'go.mod': 'module example.com/synth\n\nrequire github.com/gorilla/mux v1.8.0\n',
+    'composer.json': '{"require": {"laravel/framework": "^10.0"}}\n',
+    '.env': 'DB_CONNECTION=mysql\nDB_PASSWORD=hunter2\nREDIS_HOST=localhost\n',
+    'docker-compose.yml': 'services:\n  db:\n    image: postgres:15\n  cache:\n    image: redis:7\n',
+    'Dockerfile': 'FROM python:3.11\nCOPY . /app\n',
+    'src/main/resources/application.properties':
+        'spring.datasource.url=jdbc:mysql://localhost/db\nspring.datasource.password=secret123\n',
+}
+
+
+def _write(root: str, rel: str, text: str) -> int:
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = text.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def _bundle(rnd: random.Random, size: int) -> str:
+    # одна огромная строка, как у минификатора: худший случай для построчных правил
+    parts = []
+    total = 0
+    while total < size:
+        if rnd.random() < 0.02:
+            chunk = 'fetch("%s").then(function(r){return r.json()});' % _route(rnd)
+        else:
+            chunk = 'var %s=function(a,b){return a+b*%d};' % (_name(rnd), rnd.randint(0, 999))
+        parts.append(chunk)
+        total += len(chunk)
+    return ''.join(parts)
+
+
+def generate(root: str, seed: int = 0, scale: float = 1.0,
+             counts: Optional[Dict[str, int]] = None,
+             node_modules: Optional[int] = None, bundles: Optional[int] = None,
+             bundle_bytes: int = BUNDLE_BYTES) -> Dict[str, object]:
+    """Строит дерево в ``root`` и возвращает его описание (параметры, файлы, байты).
+
+    Если в ``root`` уже лежит дерево с теми же параметрами, оно не пересоздаётся.
+    """
+    counts = dict(counts or {lang: int(n * scale) for lang, n in DEFAULT_COUNTS.items()})
+    params = {
+        'seed': seed,
+        'counts': counts,
+        'node_modules': int(NODE_MODULES_FILES * scale) if node_modules is None else node_modules,
+        'bundles': BUNDLES if bundles is None else bundles,
+        'bundle_bytes': bundle_bytes,
+    }
+    marker = os.path.join(root, MARKER)
+    try:
+        with open(marker, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('params') == params:
+            return manifest
+    except (OSError, ValueError):
+        pass
+
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+    rnd = random.Random(seed)
+    files = 0
+    size = 0
+
+    for lang in sorted(counts):
+        base, ext, make = _LANGS[lang]
+        for i in range(counts[lang]):
+            rel = os.path.join(base, 'm%02d' % (i % 20), '%s_%d%s' % (_name(rnd, 1), i, ext))
+            size += _write(root, rel, make(rnd))
+            files += 1
+
+    for rel in sorted(_CONFIGS):
+        size += _write(root, rel, _CONFIGS[rel])
+        files += 1
+
+    # вендоренные пакеты: при обходе по умолчанию не читаются вовсе
+    for i in range(params['node_modules']):
+        rel = os.path.join('node_modules', 'pkg%d' % (i // 10), 'index%d.js' % i)
+        size += _write(root, rel, js_file(rnd))
+        files += 1
+
+    for i in range(params['bundles']):
+        size += _write(root, os.path.join('web', 'dist', 'bundle%d.min.js' % i), _bundle(rnd, bundle_bytes))
+        size += _write(root, os.path.join('web', 'static', 'app%d.min.js' % i), _bundle(rnd, bundle_bytes))
+        files += 2
+
+    manifest = {'params': params, 'files': files, 'bytes': size}
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Синтетический репозиторий для бенчмарков')
+    parser.add_argument('root', help='Куда сложить дерево')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=float, default=1.0, help='Множитель числа файлов')
+    parser.add_argument('--bundle-mb', type=float, default=BUNDLE_BYTES / 1024 / 1024,
+                        help='Размер каждого минифицированного бандла, МБ')
+    args = parser.parse_args()
+    manifest = generate(args.root, args.seed, args.scale, bundle_bytes=int(args.bundle_mb * 1024 * 1024))
+    print('%s: %d файлов, %.1f МБ' % (args.root, manifest['files'], manifest['bytes'] / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,11 @@ Code Analyzer — инструмент для анализа безопасно
 """
 __version__ = "0.1.0"
 
+
 # чтобы можно было делать:
 #   import code_analyzer
 #   code_analyzer.main(...)
-from .cli import main
\ No newline at end of file
+# cli импортируется только при вызове: import пакета остаётся дешёвым
+def main():
+    from .cli import main as _main
+    return _main()
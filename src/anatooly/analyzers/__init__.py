@@ -1,14 +1,20 @@
 """Компоненты-аналитики, которые обёртывают детекторы и собирают результаты"""
-from .language_analyzer import LanguageAnalyzer
-from .stack_analyzer import StackAnalyzer
-from .dependency_analyzer import DependencyAnalyzer
-from .secret_analyzer import SecretAnalyzer
-from .report_generator import ReportGenerator
-
-__all__ = [
-    "LanguageAnalyzer",
-    "StackAnalyzer",
-    "DependencyAnalyzer",
-    "SecretAnalyzer",
-    "ReportGenerator",
-]
\ No newline at end of file
+from importlib import import_module
+
+# модуль каждого аналитика импортируется при первом обращении к нему
+_MODULES = {
+    "LanguageAnalyzer": ".language_analyzer",
+    "StackAnalyzer": ".stack_analyzer",
+    "DependencyAnalyzer": ".dependency_analyzer",
+    "SecretAnalyzer": ".secret_analyzer",
+    "ReportGenerator": ".report_generator",
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = globals()[name] = getattr(import_module(_MODULES[name], __name__), name)
+    return value
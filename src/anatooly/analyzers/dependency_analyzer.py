@@ -1,23 +1,59 @@
 from collections import defaultdict
 import os, json
-from typing import Dict, Set, Union
+from typing import Dict, Optional, Set, Union
+from ..detectors.base import FileVisitor
+from ..pipeline import FilePipeline
+from ..source import SourceFile
+from ..literals import LiteralMatcher
 from ..patterns import DEPENDENCY_PATTERNS, JS_TECH_DETECTION
 
-class DependencyAnalyzer:
-    def __init__(self, directory: str, main_lang: str):
+class DependencyAnalyzer(FileVisitor):
+    stage = 'dependencies'
+
+    def __init__(self, directory: str, main_lang: str, pipeline: Optional[FilePipeline] = None):
         self.directory = directory
         self.main_lang = main_lang
+        self.pipeline = pipeline or FilePipeline(directory)
+        self._contents: Optional[Dict[str, str]] = None
+        self._pkg: Optional[str] = None
+
+    def start(self) -> None:
+        self._contents = {}
+        # первый package.json в порядке обхода — как раньше делал os.walk
+        self._pkg = self.pipeline.find_first('package.json')
+
+    def wants(self, path: str, rel: str) -> bool:
+        if rel in {spec[0] for spec in DEPENDENCY_PATTERNS.get(self.main_lang, [])}:
+            return True
+        return path == self._pkg
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> str:
+        return source.text
+
+    def merge(self, path: str, rel: str, partial: str) -> None:
+        self._contents[path] = partial
+
+    def unmerge(self, path: str, rel: str, partial: str) -> bool:
+        self._contents.pop(path, None)
+        return True
+
+    def finalize(self) -> Dict[str, Set[str]]:
+        return self.analyze()
 
     def analyze(self) -> Dict[str, Set[str]]:
+        if self._contents is None:
+            self.pipeline.run([self])
         tech_stack: Dict[str, Set[str]] = defaultdict(set)
-        for file_spec in DEPENDENCY_PATTERNS.get(self.main_lang, []):
+        specs = DEPENDENCY_PATTERNS.get(self.main_lang, [])
+        hits: Dict[str, Set[str]] = {}
+        for file_spec in specs:
             filename, patterns, category, *rest = (*file_spec, None)
             path = os.path.join(self.directory, filename)
-            if not os.path.exists(path):
+            if path not in self._contents:
                 continue
             if isinstance(patterns, dict):
                 try:
-                    data = json.load(open(path, 'r', encoding='utf-8', errors='ignore'))
+                    data = json.loads(self._contents[path])
                 except Exception:
                     data = {}
                 require = data.get('require', {})
@@ -25,20 +61,18 @@ class DependencyAnalyzer:
                     if pkg in require:
                         tech_stack[category].add(tech)
             else:
-                try:
-                    text = open(path, 'r', encoding='utf-8', errors='ignore').read().lower()
-                except Exception:
-                    continue
-                if patterns.lower() in text:
-                    tech = rest[0] or patterns  
+                if path not in hits:
+                    # все строки-признаки этого файла ищутся одним проходом
+                    needles = [spec[1].lower() for spec in specs
+                               if spec[0] == filename and isinstance(spec[1], str)]
+                    text = self._contents[path].lower().encode('utf-8', 'surrogatepass')
+                    hits[path] = LiteralMatcher(needles).hits(text)
+                if patterns.lower() in hits[path]:
+                    tech = rest[0] or patterns
                     tech_stack[category].add(tech)
-        pkg = None
-        for root, _, files in os.walk(self.directory):
-            if 'package.json' in files:
-                pkg = os.path.join(root, 'package.json')
-                break
+        pkg = self._pkg
         try:
-            data = json.load(open(pkg, 'r', encoding='utf-8', errors='ignore')) if pkg else {}
+            data = json.loads(self._contents[pkg]) if pkg else {}
         except Exception:
             data = {}
             deps = {**data.get('dependencies', {}), **data.get('devDependencies', {})}
@@ -47,4 +81,4 @@ class DependencyAnalyzer:
                     cat = detector['type']
                     tech_stack[cat].add(tech)
 
-        return tech_stack
\ No newline at end of file
+        return tech_stack
@@ -1,54 +1,72 @@
-import os
+import re
 from collections import Counter, defaultdict
-from typing import Dict, Tuple
-from ..utils import read_files
-from ..patterns import LANG_EXTENSIONS
+from typing import Dict, Optional, Tuple
+from ..detectors.base import FileVisitor
+from ..pipeline import FilePipeline
+from ..source import SourceFile
+from ..inventory import LANG_INDEX, classify
 
-class LanguageAnalyzer:
-    def __init__(self, directory: str):
-        self.directory = directory
+# непустая строка: от начала строки (после \n или одиночного \r) до первого
+# непробельного байта — SLOC считается по байтам, без декодирования файла
+_CODE_LINE = re.compile(rb'(?:^|(?<=\r))[ \t\f\v]*[^\s]', re.MULTILINE)
 
-    def detect_languages(self) -> Dict[str, float]:
-        counter = Counter()
-        total_files = 0
 
-        for path, _ in read_files(self.directory):
-            ext = os.path.splitext(path)[1].lower()
-            filename = os.path.basename(path).lower()
-            lang = "Other"
+class LanguageAnalyzer(FileVisitor):
+    stage = 'languages'
+
+    def __init__(self, directory: str, pipeline: Optional[FilePipeline] = None, sloc: bool = True):
+        self.directory = directory
+        self.pipeline = pipeline or FilePipeline(directory)
+        # без SLOC классификация идёт только по именам и stat, файлы не читаются
+        self.needs_content = sloc
+        self._sloc: Optional[Dict[str, int]] = None
+
+    classify = staticmethod(classify)
 
-            for language, exts in LANG_EXTENSIONS.items():
-                exts_lower = [e.lower() for e in exts]
-                if ext in exts_lower or filename in exts_lower:
-                    lang = language
-                    break
+    def detect_languages(self, by_bytes: bool = False) -> Dict[str, float]:
+        counter = Counter()
+        total = 0
 
-            counter[lang] += 1
-            total_files += 1
+        # язык и размер уже известны из описи файлов — файлы не трогаем
+        for entry in self.pipeline.inventory.entries:
+            if by_bytes:
+                if entry.size is None:
+                    continue
+                weight = entry.size
+            else:
+                weight = 1
+            counter[entry.lang] += weight
+            total += weight
 
         distribution: Dict[str, float] = {}
-        if total_files > 0:
+        if total > 0:
             for lang, count in counter.items():
-                distribution[lang] = count / total_files * 100.0
+                distribution[lang] = count / total * 100.0
         return distribution
 
-    def count_sloc(self) -> Tuple[Dict[str, int], int]:
-        sloc_counter: Dict[str, int] = defaultdict(int)
-        total_sloc = 0
+    def start(self) -> None:
+        self._sloc = defaultdict(int)
+
+    def wants(self, path: str, rel: str) -> bool:
+        return self.needs_content
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> int:
+        return sum(1 for _ in _CODE_LINE.finditer(source.data))
 
-        for path, content in read_files(self.directory):
-            ext = os.path.splitext(path)[1].lower()
-            filename = os.path.basename(path).lower()
-            lang = "Other"
+    def merge(self, path: str, rel: str, partial: int) -> None:
+        self._sloc[classify(path)] += partial
 
-            for language, exts in LANG_EXTENSIONS.items():
-                exts_lower = [e.lower() for e in exts]
-                if ext in exts_lower or filename in exts_lower:
-                    lang = language
-                    break
+    def unmerge(self, path: str, rel: str, partial: int) -> bool:
+        self._sloc[classify(path)] -= partial
+        return True
 
-            lines = sum(1 for line in content.splitlines() if line.strip())
-            sloc_counter[lang] += lines
-            total_sloc += lines
+    def cache_key(self) -> Optional[str]:
+        return 'sloc'
 
-        return dict(sloc_counter), total_sloc
+    def finalize(self) -> Tuple[Dict[str, int], int]:
+        return dict(self._sloc), sum(self._sloc.values())
+
+    def count_sloc(self) -> Tuple[Dict[str, int], int]:
+        if self._sloc is None:
+            self.pipeline.run([self])
+        return self.finalize()
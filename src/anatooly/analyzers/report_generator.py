@@ -1,51 +1,189 @@
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+from html import escape
+import gzip
 import json
+import lzma
 import os
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
-from rich import box
+import sys
+from itertools import islice
+
+from ..findings import FindingTable, compact as compact_findings
+
+# по сколько находок кодировать за раз при записи json
+_JSON_CHUNK = 1024
+
+def _json_default(value: Any) -> Any:
+    # стек технологий хранится во множествах
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    # находки — столбцами (findings.FindingTable), наружу — строками
+    if isinstance(value, FindingTable):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def open_output(path: Optional[str], compress: Optional[str] = None) -> TextIO:
+    # None или '-' — stdout; сжатие задаётся явно или по расширению
+    if path is None or path == '-':
+        if compress:
+            return gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8') if compress == 'gzip' \
+                else lzma.open(sys.stdout.buffer, 'wt', encoding='utf-8')
+        return sys.stdout
+    if compress is None:
+        if path.endswith('.gz'):
+            compress = 'gzip'
+        elif path.endswith('.xz'):
+            compress = 'xz'
+    if compress == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if compress == 'xz':
+        return lzma.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+class JsonLinesWriter:
+    """Находки по одной JSON-записи на строку, по мере обнаружения.
+
+    Детекторы отдают записи в ``write`` прямо из слияния (см.
+    FileVisitor.sink), поэтому в памяти ничего не копится.
+    """
+
+    def __init__(self, path: Optional[str] = None, compress: Optional[str] = None):
+        self.out = open_output(path, compress)
+
+    def write(self, kind: str, record: Dict[str, Any]) -> None:
+        row = {'type': kind}
+        row.update(record)
+        self.out.write(json.dumps(row, ensure_ascii=False, separators=(',', ':'),
+                                  default=_json_default))
+        self.out.write('\n')
+
+    def close(self) -> None:
+        if self.out is sys.stdout:
+            self.out.flush()
+        else:
+            self.out.close()
+
 
 class ReportGenerator:
-    def __init__(self, output_format: str = 'console'):
+    def __init__(self, output_format: str = 'console', output: Optional[str] = None,
+                 writer: Optional[JsonLinesWriter] = None, compact: bool = False,
+                 root: Optional[str] = None):
         self.output_format = output_format
-        self.console = Console()
+        self.output = output
+        self.writer = writer
+        # json: находки столбцами с общей таблицей путей
+        self.compact = compact
+        # корень сканирования: в jsonl пути секретов из конфигов — от него,
+        # как у всех прочих записей
+        self.root = root
 
     def generate(self, results: Dict[str, Any]) -> None:
         if self.output_format == 'console':
             self._to_console(results)
         elif self.output_format == 'json':
-            print(json.dumps(results, indent=2, ensure_ascii=False))
+            self._to_json(results)
+        elif self.output_format == 'jsonl':
+            self._to_jsonl(results)
         elif self.output_format == 'html':
             self._to_html(results)
 
+    def _to_json(self, results: Dict[str, Any]) -> None:
+        # То же, что json.dump(indent=2), но таблицы находок пишутся по
+        # строке за раз: отчёт не собирается в памяти целиком
+        items = list(results.items())
+        sections = {}
+        if self.compact:
+            paths, sections = compact_findings(results)
+            items.insert(0, ('paths', paths))
+        out = open_output(self.output)
+        out.write('{')
+        for n, (key, value) in enumerate(items):
+            out.write(',\n  ' if n else '\n  ')
+            out.write(json.dumps(key, ensure_ascii=False) + ': ')
+            if key in sections:
+                columns, rows = sections[key]
+                out.write('{\n    "columns": %s,\n    "rows": ' % json.dumps(columns, ensure_ascii=False))
+                encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_json_default)
+                _json_list(out, map(encoder.encode, rows), '    ')
+                out.write('\n  }')
+            elif key == 'paths' and self.compact:
+                _json_list(out, (json.dumps(path, ensure_ascii=False) for path in value), '  ')
+            elif isinstance(value, FindingTable):
+                _json_table(out, value, '  ')
+            else:
+                out.write(_json(value, '  '))
+        out.write('\n}\n' if items else '}\n')
+        if out is not sys.stdout:
+            out.close()
+
+    def _to_jsonl(self, results: Dict[str, Any]) -> None:
+        writer = self.writer or JsonLinesWriter(self.output)
+        # находки, которые не ушли потоком (например, после слияния --since)
+        for key, kind in (('endpoints', 'endpoint'), ('ajax', 'ajax'), ('headers', 'header'),
+                          ('timeouts', 'timeout')):
+            for row in results.get(key, []):
+                writer.write(kind, row)
+        for path, values in results.get('config_secrets', []):
+            rel = os.path.relpath(path, self.root) if self.root else path
+            for value in values:
+                writer.write('config_secret', {'file': rel, 'value': value})
+        for row in results.get('secrets') or []:
+            writer.write('secret', row)
+
+        summary = {key: results[key] for key in
+                   ('languages', 'languages_bytes', 'sloc', 'stack', 'dependencies', 'configs')
+                   if key in results}
+        writer.write('summary', summary)
+        if 'profile' in results:
+            writer.write('profile', results['profile'])
+        if self.writer is None:
+            writer.close()
+
     def _to_console(self, results: Dict[str, Any]) -> None:
-        console = self.console
+        # rich нужен только консольному отчёту — на старте его не грузим
+        from rich.console import Console
+        from rich.table import Table
+        from rich.panel import Panel
+        from rich.text import Text
+        from rich import box
+
+        console = Console()
         # Banner
         banner = Text("anatooly", justify="center", style="bold magenta")
         subtitle = Text("Security Code Analyzer", justify="center", style="bold green")
         console.print(Panel(banner + "\n" + subtitle, expand=False, box=box.DOUBLE))
 
         # Language Distribution
-        langs = results.get('languages', {})
-        table_lang = Table(title="Language Distribution", box=box.SIMPLE_HEAVY)
-        table_lang.add_column("Language", style="cyan bold")
-        table_lang.add_column("%", style="white bold", justify="right")
-        for lang, perc in sorted(langs.items(), key=lambda x: -x[1]):
-            table_lang.add_row(lang, f"{perc:.2f}%")
-        console.print(table_lang)
+        if 'languages' in results:
+            langs = results.get('languages', {})
+            table_lang = Table(title="Language Distribution", box=box.SIMPLE_HEAVY)
+            table_lang.add_column("Language", style="cyan bold")
+            table_lang.add_column("%", style="white bold", justify="right")
+            for lang, perc in sorted(langs.items(), key=lambda x: -x[1]):
+                table_lang.add_row(lang, f"{perc:.2f}%")
+            console.print(table_lang)
+
+        langs_bytes = results.get('languages_bytes')
+        if langs_bytes:
+            table_bytes = Table(title="Language Distribution by Size", box=box.SIMPLE_HEAVY)
+            table_bytes.add_column("Language", style="cyan bold")
+            table_bytes.add_column("%", style="white bold", justify="right")
+            for lang, perc in sorted(langs_bytes.items(), key=lambda x: -x[1]):
+                table_bytes.add_row(lang, f"{perc:.2f}%")
+            console.print(table_bytes)
 
         # SLOC
-        sloc = results.get('sloc', {})
-        by_lang = sloc.get('by_lang', {})
-        total = sloc.get('total', 0)
-        table_sloc = Table(title=f"Source Lines of Code: {total}", box=box.SIMPLE_HEAVY)
-        table_sloc.add_column("Language", style="cyan")
-        table_sloc.add_column("Lines", style="white", justify="right")
-        for lang, count in sorted(by_lang.items(), key=lambda x: -x[1]):
-            table_sloc.add_row(lang, str(count))
-        console.print(table_sloc)
+        if 'sloc' in results:
+            sloc = results.get('sloc', {})
+            by_lang = sloc.get('by_lang', {})
+            total = sloc.get('total', 0)
+            table_sloc = Table(title=f"Source Lines of Code: {total}", box=box.SIMPLE_HEAVY)
+            table_sloc.add_column("Language", style="cyan")
+            table_sloc.add_column("Lines", style="white", justify="right")
+            for lang, count in sorted(by_lang.items(), key=lambda x: -x[1]):
+                table_sloc.add_row(lang, str(count))
+            console.print(table_sloc)
 
         # Technology Stack
         stack = results.get('stack', {}) or {}
@@ -59,35 +197,55 @@ class ReportGenerator:
             for p in panels:
                 console.print(p)
 
+        # Secrets
+        if 'secrets' in results:
+            secrets = results.get('secrets', [])
+            if secrets:
+                table_s = Table(title="Potential Secrets", box=box.SIMPLE_HEAVY)
+                table_s.add_column("File", style="magenta", overflow="fold")
+                table_s.add_column("Line", style="green", justify="right")
+                table_s.add_column("Rule", style="yellow")
+                table_s.add_column("Value", style="red", overflow="fold")
+                table_s.add_column("Entropy", justify="right")
+                table_s.add_column("Also in", justify="right")
+                for s in secrets:
+                    table_s.add_row(s['file'], str(s['line']), s['rule'], s['value'],
+                                    f"{s['entropy']:.2f}", str(len(s['duplicates'])))
+                console.print(table_s)
+            else:
+                console.print(Panel("No secrets found", style="green"))
+
         # Endpoints
-        eps = results.get('endpoints', [])
-        if eps:
-            table_ep = Table(title="API Endpoints", box=box.SIMPLE_HEAVY)
-            table_ep.add_column("File", style="magenta")
-            table_ep.add_column("Line", style="green", justify="right")
-            table_ep.add_column("Method", style="yellow")
-            table_ep.add_column("Framework", style="cyan")
-            table_ep.add_column("Route", style="white")
-            for ep in eps:
-                table_ep.add_row(
-                    ep['file'], str(ep['line']), ep['method'], ep['framework'], ep['endpoint']
-                )
-            console.print(table_ep)
-        else:
-            console.print(Panel("No API endpoints found", style="red"))
+        if 'endpoints' in results:
+            eps = results.get('endpoints', [])
+            if eps:
+                table_ep = Table(title="API Endpoints", box=box.SIMPLE_HEAVY)
+                table_ep.add_column("File", style="magenta")
+                table_ep.add_column("Line", style="green", justify="right")
+                table_ep.add_column("Method", style="yellow")
+                table_ep.add_column("Framework", style="cyan")
+                table_ep.add_column("Route", style="white")
+                for ep in eps:
+                    table_ep.add_row(
+                        ep['file'], str(ep['line']), ep['method'], ep['framework'], ep['endpoint']
+                    )
+                console.print(table_ep)
+            else:
+                console.print(Panel("No API endpoints found", style="red"))
 
         # AJAX
-        ajax = results.get('ajax', [])
-        if ajax:
-            table_ajax = Table(title="AJAX Calls", box=box.SIMPLE_HEAVY)
-            table_ajax.add_column("File", style="magenta")
-            table_ajax.add_column("Line", style="green", justify="right")
-            table_ajax.add_column("Call", style="white")
-            for call in ajax:
-                table_ajax.add_row(call['file'], str(call['line']), call['call'])
-            console.print(table_ajax)
-        else:
-            console.print(Panel("No AJAX calls found", style="red"))
+        if 'ajax' in results:
+            ajax = results.get('ajax', [])
+            if ajax:
+                table_ajax = Table(title="AJAX Calls", box=box.SIMPLE_HEAVY)
+                table_ajax.add_column("File", style="magenta")
+                table_ajax.add_column("Line", style="green", justify="right")
+                table_ajax.add_column("Call", style="white")
+                for call in ajax:
+                    table_ajax.add_row(call['file'], str(call['line']), call['call'])
+                console.print(table_ajax)
+            else:
+                console.print(Panel("No AJAX calls found", style="red"))
 
         # HTTP Methods
         http_methods = results.get('http_methods', [])
@@ -104,120 +262,249 @@ class ReportGenerator:
             console.print(Panel("No HTTP methods found", style="red"))
 
         # HTTP Headers
-        table_h = Table(show_header=True, header_style="bold cyan")
-        table_h.add_column("File", overflow="fold")
-        table_h.add_column("Line", justify="right")
-        table_h.add_column("Header")
-        table_h.add_column("Value", overflow="fold")
-
-        headers = results.get("headers", [])
-        if headers:
-            for h in headers:
-                hdr_dict = h["headers"]
-                hdr_text = json.dumps(hdr_dict, ensure_ascii=False)
-                value = h.get("value")
-                val_text = "" if value is None else str(value)
-
-                table_h.add_row(
-                    h["file"],
-                    str(h["line"]),
-                    hdr_text,
-                    val_text
-                )
-            console.print(table_h)
-        else:
-            console.print(Panel("No HTTP headers found", style="dim"))
+        if 'headers' in results:
+            table_h = Table(show_header=True, header_style="bold cyan")
+            table_h.add_column("File", overflow="fold")
+            table_h.add_column("Line", justify="right")
+            table_h.add_column("Header")
+            table_h.add_column("Value", overflow="fold")
+
+            headers = results.get("headers", [])
+            if headers:
+                for h in headers:
+                    hdr_dict = h["headers"]
+                    hdr_text = json.dumps(hdr_dict, ensure_ascii=False)
+                    value = h.get("value")
+                    val_text = "" if value is None else str(value)
+
+                    table_h.add_row(
+                        h["file"],
+                        str(h["line"]),
+                        hdr_text,
+                        val_text
+                    )
+                console.print(table_h)
+            else:
+                console.print(Panel("No HTTP headers found", style="dim"))
+
+        # Regex timeouts
+        timeouts = results.get("timeouts", [])
+        if timeouts:
+            table_t = Table(title="Regex Timeouts", box=box.SIMPLE_HEAVY)
+            table_t.add_column("File", style="magenta", overflow="fold")
+            table_t.add_column("Stage", style="yellow")
+            table_t.add_column("Rule", overflow="fold")
+            table_t.add_column("Fallback", style="red")
+            for t in timeouts:
+                table_t.add_row(t["file"], t.get("stage") or "", t.get("rule") or "", t["fallback"])
+            console.print(table_t)
 
     def _to_html(self, results: Dict[str, Any]) -> None:
+        # Пишем по разделам прямо в файл, не собирая страницу в памяти.
+        # Большие таблицы встраиваются как компактный JSON (строка — массив
+        # значений) и листаются постранично скриптом на стороне браузера.
+        output_path = self.output or os.path.join(os.getcwd(), 'report.html')
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(_HTML_HEAD)
+            f.write('<h1>Security Code Analysis Report</h1>\n')
 
-        html_parts = []
-        html_parts.append('<!DOCTYPE html>')
-        html_parts.append('<html lang="ru">')
-        html_parts.append('<head>')
-        html_parts.append('  <meta charset="utf-8" />')
-        html_parts.append('  <title>Security Code Analysis Report</title>')
-        html_parts.append('  <style>')
-        html_parts.append('    body { font-family: Arial, sans-serif; padding: 20px; }')
-        html_parts.append('    h1, h2, h3 { color: #333; }')
-        html_parts.append('    table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }')
-        html_parts.append('    th, td { border: 1px solid #ccc; padding: 8px; text-align: left; }')
-        html_parts.append('    th { background-color: #f5f5f5; }')
-        html_parts.append('  </style>')
-        html_parts.append('</head>')
-        html_parts.append('<body>')
-        html_parts.append('<h1>Security Code Analysis Report</h1>')
-
-        # Языки
-        html_parts.append('<h2>Language Distribution</h2>')
-        html_parts.append('<table>')
-        html_parts.append('<tr><th>Language</th><th>Percentage</th></tr>')
-        for lang, perc in results.get('languages', {}).items():
-            html_parts.append(f'<tr><td>{lang}</td><td>{perc:.2f}%</td></tr>')
-        html_parts.append('</table>')
+            # Языки
+            if 'languages' in results:
+                _html_table(f, 'Language Distribution', ['Language', 'Percentage'],
+                            ((lang, f'{perc:.2f}%') for lang, perc in results.get('languages', {}).items()))
 
-        # SLOC
-        sloc = results.get('sloc', {})
-        html_parts.append(f'<h2>SLOC: total {sloc.get("total", 0)}</h2>')
-        html_parts.append('<table>')
-        html_parts.append('<tr><th>Language</th><th>Lines</th></tr>')
-        for lang, count in sloc.get('by_lang', {}).items():
-            html_parts.append(f'<tr><td>{lang}</td><td>{count}</td></tr>')
-        html_parts.append('</table>')
-
-        # Технологический стек
-        html_parts.append('<h2>Technology Stack</h2>')
-        for category, techs in results.get('stack', {}).items():
-            if techs:
-                html_parts.append(f'<h3>{category.capitalize()}</h3>')
-                html_parts.append('<ul>')
-                for tech in sorted(techs):
-                    html_parts.append(f'<li>{tech}</li>')
-                html_parts.append('</ul>')
-
-        # Dependencies
-        html_parts.append('<h2>Dependencies</h2>')
-        html_parts.append('<ul>')
-        for cat, items in results.get('dependencies', {}).items():
-            html_parts.append(f'<li>{cat}: {", ".join(sorted(items))}</li>')
-        html_parts.append('</ul>')
+            langs_bytes = results.get('languages_bytes')
+            if langs_bytes:
+                _html_table(f, 'Language Distribution by Size', ['Language', 'Percentage'],
+                            ((lang, f'{perc:.2f}%') for lang, perc in langs_bytes.items()))
 
-        # Secrets
-        secrets = results.get('secrets', [])
-        if secrets:
-            html_parts.append('<h2>Potential Secrets</h2>')
-            for path, items in secrets:
-                html_parts.append(f'<h3>{path}</h3>')
-                html_parts.append('<ul>')
-                for val in items:
-                    html_parts.append(f'<li>{val}</li>')
-                html_parts.append('</ul>')
+            # SLOC
+            if 'sloc' in results:
+                sloc = results.get('sloc', {})
+                _html_table(f, f'SLOC: total {sloc.get("total", 0)}', ['Language', 'Lines'],
+                            sloc.get('by_lang', {}).items())
 
-        # Endpoints
-        endpoints = results.get('endpoints', [])
-        html_parts.append('<h2>API Endpoints</h2>')
-        html_parts.append('<table>')
-        html_parts.append('<tr><th>File</th><th>Line</th><th>Method</th><th>Framework</th><th>Route</th></tr>')
-        for ep in endpoints:
-            html_parts.append(
-                f'<tr><td>{ep["file"]}</td><td>{ep["line"]}</td><td>{ep["method"]}</td>'
-                f'<td>{ep["framework"]}</td><td>{ep["endpoint"]}</td></tr>'
-            )
-        html_parts.append('</table>')
-
-        # AJAX Calls
-        ajax = results.get('ajax', [])
-        html_parts.append('<h2>AJAX Calls</h2>')
-        html_parts.append('<table>')
-        html_parts.append('<tr><th>File</th><th>Line</th><th>Call</th></tr>')
-        for call in ajax:
-            html_parts.append(f'<tr><td>{call["file"]}</td><td>{call["line"]}</td><td>{call["call"]}</td></tr>')
-        html_parts.append('</table>')
-
-        html_parts.append('</body>')
-        html_parts.append('</html>')
-
-        # Write to file
-        output_path = os.path.join(os.getcwd(), 'report.html')
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(html_parts))
+            # Технологический стек
+            if 'stack' in results:
+                f.write('<h2>Technology Stack</h2>\n')
+                for category, techs in results.get('stack', {}).items():
+                    if techs:
+                        f.write(f'<h3>{escape(category.capitalize())}</h3>\n<ul>\n')
+                        for tech in sorted(techs):
+                            f.write(f'<li>{escape(tech)}</li>\n')
+                        f.write('</ul>\n')
+
+            # Dependencies
+            if 'dependencies' in results:
+                f.write('<h2>Dependencies</h2>\n<ul>\n')
+                for cat, items in results.get('dependencies', {}).items():
+                    f.write(f'<li>{escape(cat)}: {escape(", ".join(sorted(items)))}</li>\n')
+                f.write('</ul>\n')
+
+            # Secrets
+            if 'secrets' in results:
+                _html_data_table(f, 'secrets', 'Potential Secrets',
+                                 ['File', 'Line', 'Rule', 'Value', 'Entropy', 'Also in'],
+                                 ([s['file'], s['line'], s['rule'], s['value'], s['entropy'],
+                                   len(s['duplicates'])] for s in results.get('secrets', [])))
+
+            # Endpoints, AJAX, заголовки — постраничные таблицы
+            if 'endpoints' in results:
+                _html_data_table(f, 'endpoints', 'API Endpoints',
+                                 ['File', 'Line', 'Method', 'Framework', 'Route'],
+                                 ([ep['file'], ep['line'], ep['method'], ep['framework'], ep['endpoint']]
+                                  for ep in results.get('endpoints', [])))
+            if 'ajax' in results:
+                _html_data_table(f, 'ajax', 'AJAX Calls', ['File', 'Line', 'Call'],
+                                 ([call['file'], call['line'], call['call']]
+                                  for call in results.get('ajax', [])))
+            if 'headers' in results:
+                _html_data_table(f, 'headers', 'HTTP Headers', ['File', 'Line', 'Header', 'Value'],
+                                 ([h['file'], h['line'], h['headers'], h.get('value')]
+                                  for h in results.get('headers', [])))
+
+            timeouts = results.get('timeouts', [])
+            if timeouts:
+                _html_table(f, 'Regex Timeouts', ['File', 'Stage', 'Rule', 'Fallback'],
+                            ((t['file'], t.get('stage') or '', t.get('rule') or '', t['fallback'])
+                             for t in timeouts))
+
+            f.write(_HTML_SCRIPT)
+            f.write('</body>\n</html>\n')
         print(f"HTML report generated: {output_path}")
+
+
+def _json(value: Any, indent: str) -> str:
+    # json.dumps(indent=2) со сдвигом: значение вложено на уровень indent
+    return json.dumps(value, indent=2, ensure_ascii=False, default=_json_default).replace('\n', '\n' + indent)
+
+
+def _json_list(f: TextIO, items: Iterable[str], indent: str) -> None:
+    # JSON-массив из готовых элементов, по одному на строку
+    first = True
+    for item in items:
+        f.write('[\n' if first else ',\n')
+        f.write(indent + '  ' + item)
+        first = False
+    f.write('[]' if first else '\n' + indent + ']')
+
+
+def _json_table(f: TextIO, table: Iterable[Dict[str, Any]], indent: str) -> None:
+    # как _json_list для строк-словарей, но пачками: кодировщик с отступами
+    # написан на Python, и вызов на каждую строку обходится дороже самой строки
+    encoder = json.JSONEncoder(indent=2, ensure_ascii=False, default=_json_default)
+    rows = iter(table)
+    first = True
+    while True:
+        chunk = list(islice(rows, _JSON_CHUNK))
+        if not chunk:
+            break
+        # '[\n  {...},\n  {...}\n]' без скобок массива, со сдвигом на indent
+        body = encoder.encode(chunk)[2:-2].replace('\n', '\n' + indent)
+        f.write('[\n' if first else ',\n')
+        f.write(indent + body)
+        first = False
+    f.write('[]' if first else '\n' + indent + ']')
+
+
+def _html_table(f: TextIO, title: str, columns: List[str], rows: Iterable[Iterable[Any]]) -> None:
+    f.write(f'<h2>{escape(title)}</h2>\n<table>\n<tr>')
+    f.write(''.join(f'<th>{escape(c)}</th>' for c in columns))
+    f.write('</tr>\n')
+    for row in rows:
+        f.write('<tr>' + ''.join(f'<td>{escape(str(v))}</td>' for v in row) + '</tr>\n')
+    f.write('</table>\n')
+
+
+def _html_data_table(f: TextIO, key: str, title: str, columns: List[str],
+                     rows: Iterable[List[Any]]) -> None:
+    # данные — в <script type="application/json">, по строке за раз;
+    # "</" экранируется, чтобы значение не закрыло тег
+    f.write(f'<h2>{escape(title)}</h2>\n')
+    f.write(f'<div class="paged" data-source="data-{key}" '
+            f'data-columns="{escape(json.dumps(columns))}"></div>\n')
+    f.write(f'<script type="application/json" id="data-{key}">[')
+    for n, row in enumerate(rows):
+        if n:
+            f.write(',\n')
+        f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':'),
+                           default=_json_default).replace('</', '<\\/'))
+    f.write(']</script>\n')
+
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+  <meta charset="utf-8" />
+  <title>Security Code Analysis Report</title>
+  <style>
+    body { font-family: Arial, sans-serif; padding: 20px; }
+    h1, h2, h3 { color: #333; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }
+    th, td { border: 1px solid #ccc; padding: 8px; text-align: left; }
+    th { background-color: #f5f5f5; }
+    .pager { margin: 6px 0; }
+    .pager button, .pager input { margin-right: 6px; }
+  </style>
+</head>
+<body>
+"""
+
+_HTML_SCRIPT = """<script>
+(function () {
+  var PAGE = 100;
+  document.querySelectorAll('.paged').forEach(function (box) {
+    var rows = JSON.parse(document.getElementById(box.dataset.source).textContent);
+    var columns = JSON.parse(box.dataset.columns);
+    var shown = rows, page = 0;
+
+    var pager = document.createElement('div');
+    pager.className = 'pager';
+    var filter = document.createElement('input');
+    filter.placeholder = 'Filter';
+    var prev = document.createElement('button');
+    prev.textContent = '<';
+    var next = document.createElement('button');
+    next.textContent = '>';
+    var info = document.createElement('span');
+    pager.append(filter, prev, next, info);
+
+    var table = document.createElement('table');
+    var head = table.insertRow();
+    columns.forEach(function (c) {
+      var th = document.createElement('th');
+      th.textContent = c;
+      head.appendChild(th);
+    });
+    var body = table.createTBody();
+    box.append(pager, table);
+
+    function cell(v) {
+      if (v === null || v === undefined) return '';
+      return typeof v === 'object' ? JSON.stringify(v) : String(v);
+    }
+    function render() {
+      var pages = Math.max(1, Math.ceil(shown.length / PAGE));
+      page = Math.min(Math.max(page, 0), pages - 1);
+      body.textContent = '';
+      shown.slice(page * PAGE, (page + 1) * PAGE).forEach(function (row) {
+        var tr = body.insertRow();
+        row.forEach(function (v) { tr.insertCell().textContent = cell(v); });
+      });
+      info.textContent = shown.length + ' rows, page ' + (page + 1) + ' / ' + pages;
+    }
+    prev.onclick = function () { page--; render(); };
+    next.onclick = function () { page++; render(); };
+    filter.oninput = function () {
+      var q = filter.value.toLowerCase();
+      shown = q ? rows.filter(function (row) {
+        return row.some(function (v) { return cell(v).toLowerCase().indexOf(q) >= 0; });
+      }) : rows;
+      page = 0;
+      render();
+    };
+    render();
+  });
+})();
+</script>
+"""
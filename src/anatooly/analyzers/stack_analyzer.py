@@ -1,23 +1,28 @@
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set, Tuple
 import os
 import re
 from ..patterns import TECHNOLOGY_DETECTORS, TECHNOLOGIES_BY_LANG, JS_TECH_DETECTION
+from ..detectors.base import FileVisitor
 from ..detectors.file_detector import FileDetector
-from ..detectors.code_detector import CodeDetector
+from ..detectors.code_detector import MultiCodeDetector
+from ..pipeline import FilePipeline
+from ..source import SourceFile
 
-class StackAnalyzer:
-    def __init__(self, directory: str, main_lang: str):
+class StackAnalyzer(FileVisitor):
+    stage = 'stack'
+
+    def __init__(self, directory: str, main_lang: str, pipeline: Optional[FilePipeline] = None):
         self.directory = directory
         self.main_lang = main_lang
+        self.pipeline = pipeline or FilePipeline(directory)
         self.detectors = []
+        self.code = MultiCodeDetector(directory, [], self.pipeline)
+        self._fed = False
 
     def prepare_detectors(self):
+        # os.walk начинает с корня, так что первым найденным package.json
+        # всегда оказывается корневой — отдельный обход не нужен
         pkg_json_path = os.path.join(self.directory, "package.json")
-        if os.path.isfile(pkg_json_path):
-            for root, _, files in os.walk(self.directory):
-                if 'package.json' in files:
-                    pkg_json_path = os.path.join(root, 'package.json')
-                    break
         if pkg_json_path:
             for tech, info in JS_TECH_DETECTION.items():
                 cat = {"frontend":"frontend","backend":"backend"}.get(info["type"], "database")
@@ -26,23 +31,62 @@ class StackAnalyzer:
                     "path":    os.path.relpath(pkg_json_path, self.directory),
                     "content": r"['\"](?:%s)['\"]" % "|".join(info["packages"])
                 }
-                self.detectors.append((cat, tech, [FileDetector(self.directory, [cfg])]))
+                self.detectors.append((cat, tech, [FileDetector(self.directory, [cfg], self.pipeline)]))
 
+        # кодовые правила всех технологий проверяются одним пакетным сканером
+        code_rules = []
         for category_key, tech_list in TECHNOLOGIES_BY_LANG.get(self.main_lang, {})\
                                         .items():
             for tech in tech_list:
                 configs = TECHNOLOGY_DETECTORS.get(tech, [])
                 instances = []
+                has_code = False
                 for cfg in configs:
                     t = cfg.get("type")
                     if t in ("file", "dir"):
-                        instances.append(FileDetector(self.directory, [cfg]))
+                        instances.append(FileDetector(self.directory, [cfg], self.pipeline, tech))
                     elif t == "code":
-                        instances.append(CodeDetector(self.directory, cfg["pattern"]))
-                if instances:
+                        has_code = True
+                        if (tech, cfg["pattern"]) not in code_rules:
+                            code_rules.append((tech, cfg["pattern"]))
+                if instances or has_code:
                     self.detectors.append((category_key, tech, instances))
+        self.code = MultiCodeDetector(self.directory, code_rules, self.pipeline)
+
+    def start(self) -> None:
+        self.code.start()
+        self._fed = True
+
+    def wants(self, path: str, rel: str) -> bool:
+        return self.code.wants(path, rel)
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> Tuple[List[str], List[str]]:
+        return self.code.scan(path, rel, source)
+
+    def merge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> None:
+        self.code.merge(path, rel, partial)
+
+    def unmerge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> bool:
+        return self.code.unmerge(path, rel, partial)
+
+    def reopened(self) -> bool:
+        return self.code.reopened()
+
+    def cache_key(self) -> Optional[str]:
+        return self.code.cache_key()
+
+    def prime(self, stored: Tuple[List[str], List[str]]) -> None:
+        self.code.prime(stored)
+
+    def from_cache(self, stored: Tuple[List[str], List[str]]) -> Tuple[bool, Tuple[List[str], List[str]]]:
+        return self.code.from_cache(stored)
+
+    def finalize(self) -> Dict[str, Set[str]]:
+        return self.analyze_stack()
 
     def analyze_stack(self) -> Dict[str, Set[str]]:
+        if not self._fed:
+            self.pipeline.run([self])
         result = {
             "backend":     set(),
             "frontend":    set(),
@@ -60,8 +104,12 @@ class StackAnalyzer:
             "devops":          "devops",
         }
 
+        confirmed = self.code.finalize()
         for category_key, tech, instances in self.detectors:
             mapped = category_map.get(category_key, category_key)
+            if tech in confirmed:
+                result[mapped].add(tech)
+                continue
             for det in instances:
                 try:
                     detected = det.detect()
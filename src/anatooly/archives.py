@@ -0,0 +1,246 @@
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
+
+# разделитель пути архива и пути внутри него (как в jar:file:...!/):
+# lib/app.war!/WEB-INF/lib/core.jar!/pom.xml
+SEP = '!/'
+
+ZIP_EXTENSIONS = ('.zip', '.jar', '.war', '.ear', '.whl', '.aar', '.apk', '.nupkg')
+# .tar читается вразнобой, сжатые — потоком (см. _TarStream)
+TAR_EXTENSIONS = ('.tar',)
+TAR_STREAM_EXTENSIONS = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# вложенность архивов по умолчанию: 1 — только архивы из дерева
+MAX_DEPTH = 2
+# члены крупнее не читаются (и защита от «zip-бомб»: размер из заголовка)
+MAX_MEMBER_BYTES = 64 * 1024 * 1024
+# сколько содержимого сжатого tar запоминать при его описи (см. _TarStream)
+STREAM_CACHE_BYTES = 64 * 1024 * 1024
+# сколько открытых архивов держать в процессе
+_KEEP_OPEN = 8
+
+_ERRORS = (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError, ValueError, KeyError,
+           RuntimeError, NotImplementedError)
+
+
+def kind(name: str) -> Optional[str]:
+    name = name.lower()
+    if name.endswith(ZIP_EXTENSIONS):
+        return 'zip'
+    if name.endswith(TAR_EXTENSIONS):
+        return 'tar'
+    if name.endswith(TAR_STREAM_EXTENSIONS):
+        return 'tar-stream'
+    return None
+
+
+def is_member(path: str) -> bool:
+    return SEP in path
+
+
+def outer(path: str) -> str:
+    # файл архива на диске, в котором лежит член (для stat и кэша)
+    return path.split(SEP, 1)[0]
+
+
+def _tar_name(name: str) -> str:
+    return name[2:] if name.startswith('./') else name
+
+
+class _Zip:
+    closed = False
+
+    def __init__(self, fileobj: IO[bytes]):
+        self.zf = zipfile.ZipFile(fileobj)
+
+    def list(self) -> List[Tuple[str, int]]:
+        return [(i.filename, i.file_size) for i in self.zf.infolist()
+                if not i.is_dir() and i.file_size <= MAX_MEMBER_BYTES]
+
+    def read(self, name: str) -> bytes:
+        return self.zf.read(name)
+
+    def close(self) -> None:
+        self.closed = True
+        self.zf.close()
+
+
+class _Tar:
+    closed = False
+
+    def __init__(self, fileobj: IO[bytes]):
+        self.tf = tarfile.open(fileobj=fileobj, mode='r:')
+        self.by_name = {_tar_name(i.name): i for i in self.tf.getmembers() if i.isfile()}
+
+    def list(self) -> List[Tuple[str, int]]:
+        return [(name, i.size) for name, i in self.by_name.items() if i.size <= MAX_MEMBER_BYTES]
+
+    def read(self, name: str) -> bytes:
+        return self.tf.extractfile(self.by_name[name]).read()
+
+    def close(self) -> None:
+        self.closed = True
+        self.tf.close()
+
+
+class _TarStream:
+    """Сжатый tar: распаковка только вперёд, без возврата к началу.
+
+    Опись (``list``) — это полная распаковка, поэтому содержимое членов
+    запоминается тут же, в пределах STREAM_CACHE_BYTES на архив, и ``read``
+    отдаёт его без второй распаковки (каждый член — один раз: за проход
+    файл читается однажды). Запомненное достаётся и рабочим процессам,
+    запущенным после описи (fork, см. _after_fork). Чего в запомненном нет,
+    читается из потока: члены запрашиваются в порядке описи, поэтому поток
+    идёт вперёд, а если нужный член уже позади — открывается заново.
+    """
+    closed = False
+
+    def __init__(self, opener: Callable[[], IO[bytes]]):
+        self.opener = opener
+        self.tf: Optional[tarfile.TarFile] = None
+        self.data: Dict[str, bytes] = {}
+
+    def _restart(self) -> None:
+        self._stop()
+        self.tf = tarfile.open(fileobj=self.opener(), mode='r|*')
+
+    def list(self) -> List[Tuple[str, int]]:
+        self._restart()
+        out = []
+        room = STREAM_CACHE_BYTES
+        for info in self.tf:
+            if not info.isfile() or info.size > MAX_MEMBER_BYTES:
+                continue
+            name = _tar_name(info.name)
+            out.append((name, info.size))
+            if info.size <= room:
+                self.data[name] = self.tf.extractfile(info).read()
+                room -= info.size
+        self._stop()
+        return out
+
+    def read(self, name: str) -> bytes:
+        data = self.data.pop(name, None)
+        if data is not None:
+            return data
+        for attempt in range(2):
+            if self.tf is None or attempt:
+                self._restart()
+            while True:
+                info = self.tf.next()
+                if info is None:
+                    break
+                if info.isfile() and _tar_name(info.name) == name:
+                    return self.tf.extractfile(info).read()
+        raise KeyError(name)
+
+    def _stop(self) -> None:
+        if self.tf is not None:
+            self.tf.fileobj.close()
+            self.tf.close()
+            self.tf = None
+
+    def close(self) -> None:
+        self.closed = True
+        self.data = {}
+        self._stop()
+
+
+_lock = threading.Lock()
+# путь архива (в том числе вложенного) -> (архив, его блокировка)
+_open: 'OrderedDict[str, Tuple[object, threading.Lock]]' = OrderedDict()
+
+
+def _fileobj(path: str) -> IO[bytes]:
+    if is_member(path):
+        return io.BytesIO(read_member(path))
+    return open(path, 'rb')
+
+
+def _archive(path: str) -> Tuple[object, threading.Lock]:
+    with _lock:
+        if path in _open:
+            _open.move_to_end(path)
+            return _open[path]
+    kind_ = kind(path.rsplit(SEP, 1)[-1])
+    if kind_ == 'tar-stream':
+        archive = _TarStream(lambda: _fileobj(path))
+    else:
+        f = _fileobj(path)
+        try:
+            archive = _Zip(f) if kind_ == 'zip' else _Tar(f)
+        except BaseException:
+            f.close()
+            raise
+    with _lock:
+        _open[path] = entry = archive, threading.Lock()
+        evicted = [_open.popitem(last=False)[1] for _ in range(len(_open) - _KEEP_OPEN)]
+    # закрываем вне общей блокировки: чтение вложенного архива само её берёт
+    for old, old_lock in evicted:
+        with old_lock:
+            old.close()
+    return entry
+
+
+def read_member(path: str) -> bytes:
+    """Содержимое члена архива по виртуальному пути ``архив!/член``."""
+    container, name = path.rsplit(SEP, 1)
+    while True:
+        archive, lock = _archive(container)
+        with lock:
+            # архив могли вытеснить из кэша, пока ждали блокировку
+            if not archive.closed:
+                return archive.read(name)
+
+
+def members(path: str, depth: int = MAX_DEPTH) -> Iterator[Tuple[str, int]]:
+    """(путь внутри архива, размер) всех файлов архива ``path``.
+
+    Вложенные архивы раскрываются, пока ``depth`` больше 1: их члены идут
+    сразу после самого архива, с путями вида ``lib/core.jar!/pom.xml``.
+    Битый или неподдерживаемый архив просто не даёт членов.
+    """
+    try:
+        while True:
+            archive, lock = _archive(path)
+            with lock:
+                if not archive.closed:
+                    listing = archive.list()
+                    break
+    except _ERRORS:
+        return
+    for name, size in listing:
+        yield name, size
+        if depth > 1 and kind(name):
+            for inner, inner_size in members(path + SEP + name, depth - 1):
+                yield name + SEP + inner, inner_size
+
+
+def close_all() -> None:
+    with _lock:
+        for archive, _ in _open.values():
+            archive.close()
+        _open.clear()
+
+
+def _after_fork() -> None:
+    # открытые архивы и блокировки не наследуются: у дочернего процесса свои.
+    # Остаются только сжатые tar между чтениями: у них нет открытых файлов,
+    # а запомненные при описи члены избавляют рабочего от распаковки
+    global _lock
+    _lock = threading.Lock()
+    kept = [(path, archive) for path, (archive, _) in _open.items()
+            if isinstance(archive, _TarStream) and archive.tf is None and not archive.closed]
+    _open.clear()
+    for path, archive in kept:
+        _open[path] = archive, threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from . import __version__, patterns
+
+# меняется, когда меняется формат частичных результатов визитёров
+CACHE_FORMAT = 2
+
+
+def _canonical(value: Any) -> Any:
+    # скомпилированное и ещё не скомпилированное правило дают один отпечаток
+    if isinstance(value, (re.Pattern, patterns.Regex)):
+        return ('re', value.pattern, value.flags & ~re.UNICODE)
+    if isinstance(value, patterns.LazyTable):
+        return _canonical(value.raw)
+    if isinstance(value, dict):
+        return ('dict', [(_canonical(k), _canonical(v)) for k, v in value.items()])
+    if isinstance(value, (list, tuple)):
+        return ('list', [_canonical(v) for v in value])
+    if isinstance(value, (set, frozenset)):
+        return ('set', sorted((_canonical(v) for v in value), key=repr))
+    return value
+
+
+def fingerprint(value: Any) -> str:
+    return hashlib.sha256(repr(_canonical(value)).encode('utf-8')).hexdigest()[:16]
+
+
+def rules_fingerprint() -> str:
+    # все таблицы правил из patterns.py: любая правка в них сбрасывает кэш
+    tables = {name: value for name, value in vars(patterns).items()
+              if name.isupper() and name not in patterns._DEFERRED}
+    tables.update(patterns._DEFERRED)
+    return fingerprint((__version__, CACHE_FORMAT, tables))
+
+
+def content_digest(data) -> str:
+    # хеш сырых байтов (bytes или mmap) — без декодирования
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ScanCache:
+    """Результаты визитёров по отдельным файлам между запусками.
+
+    Запись подходит, если у файла те же размер и mtime — тогда он не читается
+    вовсе; если изменился только mtime, а хеш содержимого прежний, файл
+    читается, но не сканируется. Записи — по абсолютному пути: ``anatooly .``
+    из разных каталогов не смешивает и не теряет их.
+    """
+
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'scan-cache.sqlite3'))
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' path TEXT, visitor TEXT, size INTEGER, mtime INTEGER,'
+            ' digest TEXT, result BLOB, PRIMARY KEY (path, visitor))'
+        )
+        self.rules = rules_fingerprint()
+        self._pending = []
+
+    def key(self, visitor) -> Optional[str]:
+        key = visitor.cache_key()
+        return None if key is None else '%s:%s' % (self.rules, key)
+
+    def lookup(self, path: str) -> Dict[str, Tuple[int, int, str, Any]]:
+        rows = self.db.execute(
+            'SELECT visitor, size, mtime, digest, result FROM entries WHERE path = ?',
+            (os.path.abspath(path),)
+        )
+        return {visitor: (size, mtime, digest, result) for visitor, size, mtime, digest, result in rows}
+
+    @staticmethod
+    def loads(blob: bytes) -> Any:
+        return pickle.loads(blob)
+
+    def store(self, path: str, key: str, st: os.stat_result, digest: str, stored: Any) -> None:
+        self._pending.append((os.path.abspath(path), key, st.st_size, st.st_mtime_ns, digest,
+                              pickle.dumps(stored, protocol=pickle.HIGHEST_PROTOCOL)))
+        if len(self._pending) >= 1000:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self.db.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)', self._pending)
+            self.db.commit()
+            self._pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+
+class MemoryCache:
+    """То же, что ScanCache, но в памяти процесса — для --watch.
+
+    Между пересканированиями здесь живут результаты визитёров по каждому
+    файлу; ``forget`` выбрасывает записи файлов, о чьих изменениях
+    сообщил наблюдатель, чтобы они точно были прочитаны заново. Записи
+    хранятся как есть, без pickle: визитёры не меняют частичные
+    результаты после merge.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Tuple[int, int, str, Any]]] = {}
+
+    def key(self, visitor) -> Optional[str]:
+        return visitor.cache_key()
+
+    def lookup(self, path: str) -> Dict[str, Tuple[int, int, str, Any]]:
+        return self.entries.get(path, {})
+
+    @staticmethod
+    def loads(stored: Any) -> Any:
+        return stored
+
+    def store(self, path: str, key: str, st: os.stat_result, digest: str, stored: Any) -> None:
+        self.entries.setdefault(path, {})[key] = (st.st_size, st.st_mtime_ns, digest, stored)
+
+    def forget(self, paths: Iterable[str]) -> None:
+        for path in paths:
+            self.entries.pop(path, None)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
@@ -1,92 +1,426 @@
 import argparse
-from .analyzers.language_analyzer    import LanguageAnalyzer
-from .analyzers.stack_analyzer       import StackAnalyzer
-from .analyzers.dependency_analyzer  import DependencyAnalyzer
-from .analyzers.secret_analyzer       import SecretAnalyzer
-from .analyzers.report_generator      import ReportGenerator
-from .detectors.endpoint_detector     import EndpointDetector
-from .detectors.config_detector       import ConfigDetector
-from .detectors.header_detector       import HeaderDetector
+import json
+import os
+import sys
+from .                                import stages
+from .ignore                          import IgnoreEngine
 from .patterns                        import CONFIG_PATTERNS, ENDPOINT_PATTERNS, JS_TECH_DETECTION
 
+# бюджет времени на правила одного файла, секунды, — по умолчанию у
+# scan-many и serve: они и так сканируют в рабочих, которых можно убить.
+# Обычный запуск включает бюджет только по --regex-timeout, иначе файлы
+# сканируются на месте (-j1) или пачками в пуле процессов
+REGEX_TIMEOUT = 10.0
+# упреждающее чтение по умолчанию: потоков чтения и МБ прочитанного наперёд
+READ_AHEAD = 8
+READ_AHEAD_MB = 64
+# вложенность архивов, в которые заглядывает обход (архив в архиве — 2)
+ARCHIVE_DEPTH = 2
+
+# аналитики, детекторы, конвейер и отчёт импортируются уже после разбора
+# аргументов: --help и ошибки в аргументах не ждут их загрузки
+
+def make_ignore(args) -> IgnoreEngine:
+    if args.no_ignore:
+        return IgnoreEngine(args.path, rules=(), ignore_files=())
+    return IgnoreEngine(args.path)
+
+
+def make_read_ahead(args):
+    from .prefetch import ReadAhead
+    if args.read_ahead <= 0:
+        return None
+    return ReadAhead(threads=args.read_ahead, depth=4 * args.read_ahead,
+                     max_bytes=int(args.read_ahead_mb * 1024 * 1024))
+
+
+def scan_changes(args, cache) -> dict:
+    # --since: сканируются только файлы, изменившиеся с ревизии, и результат
+    # вливается в прежний JSON-отчёт (--previous)
+    from .analyzers.language_analyzer    import LanguageAnalyzer
+    from .detectors.endpoint_detector     import EndpointDetector
+    from .detectors.config_detector       import ConfigDetector
+    from .detectors.header_detector       import HeaderDetector
+    from .pipeline                        import FilePipeline
+    from .incremental                     import changed_files, merge_report
+    from .analyzers.secret_analyzer       import SecretAnalyzer
+    from .findings                        import expand
+
+    changes = changed_files(args.path, args.since)
+    previous = {}
+    if args.previous:
+        with open(args.previous, encoding='utf-8') as f:
+            previous = expand(json.load(f))
+
+    pipeline = FilePipeline(args.path, jobs=args.jobs, cache=cache, paths=changes.changed,
+                            ignore=make_ignore(args), regex_timeout=args.regex_timeout,
+                            read_ahead=make_read_ahead(args), archive_depth=args.archive_depth)
+    distro = previous.get('languages') or LanguageAnalyzer(args.path, pipeline).detect_languages()
+    active_langs = [lang for lang in distro.keys() if lang in ENDPOINT_PATTERNS]
+
+    ep_detector = EndpointDetector(args.path, active_langs, pipeline)
+    hdr_detector = HeaderDetector(args.path, active_langs, pipeline)
+    config_detector = ConfigDetector(args.path, CONFIG_PATTERNS, pipeline)
+    secret_analyzer = SecretAnalyzer(args.path, pipeline)
+    pipeline.run([secret_analyzer, ep_detector, hdr_detector, config_detector])
+
+    ep_res = ep_detector.finalize()
+    delta = {
+        "secrets":        secret_analyzer.finalize(),
+        "endpoints":      ep_res.get('endpoints', []),
+        "ajax":           ep_res.get('ajax', []),
+        "headers":        hdr_detector.finalize(),
+        "configs":        config_detector.finalize(),
+        "config_secrets": config_detector.secrets,
+        "timeouts":       pipeline.timeouts,
+    }
+    return merge_report(previous, delta, changes.touched, args.path)
+
+
 def main():
-    parser = argparse.ArgumentParser(description="Анализатор безопасности исходного кода")
+    # anatooly scan-many <каталог|список> — много репозиториев за один запуск
+    if sys.argv[1:2] == ['scan-many']:
+        from .fleet import main as scan_many
+        return scan_many(sys.argv[2:])
+    # anatooly serve — служба с очередью заданий и тёплыми рабочими
+    if sys.argv[1:2] == ['serve']:
+        from .serve import main as serve
+        return serve(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="Анализатор безопасности исходного кода",
+                                     epilog="Много репозиториев за раз: anatooly scan-many --help; "
+                                            "служба с JSON API: anatooly serve --help")
     parser.add_argument('path', help='Путь к корню проекта')
     parser.add_argument(
         '--format',
-        choices=['console', 'json', 'html'],
+        choices=['console', 'json', 'jsonl', 'html'],
         default='console',
-        help='Формат вывода отчёта'
+        help='Формат вывода отчёта (jsonl — находки потоком, по записи на строку)'
+    )
+    parser.add_argument(
+        '--output', '-o',
+        metavar='PATH',
+        help='Файл для отчёта (json/jsonl — по умолчанию stdout, html — report.html)'
+    )
+    parser.add_argument(
+        '--compress',
+        choices=['gzip', 'xz'],
+        help='Сжатие jsonl-вывода (по умолчанию — по расширению .gz/.xz у --output)'
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='json: находки столбцами с общей таблицей путей — отчёт в разы меньше'
+    )
+    parser.add_argument(
+        '--lang-bytes',
+        action='store_true',
+        help='Дополнительно считать распределение языков по объёму файлов'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Число рабочих процессов для сканирования (по умолчанию — все ядра)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        help='Каталог для кэша результатов по файлам между запусками'
+    )
+    parser.add_argument(
+        '--since',
+        metavar='REV',
+        help='Сканировать только файлы, изменённые относительно git-ревизии REV'
+    )
+    parser.add_argument(
+        '--previous',
+        metavar='REPORT',
+        help='Прежний JSON-отчёт, в который вливаются результаты --since'
+    )
+    parser.add_argument(
+        '--no-ignore',
+        action='store_true',
+        help='Не пропускать ничего: ни встроенные каталоги, ни .gitignore/.anatooly-ignore'
+    )
+    parser.add_argument(
+        '--regex-timeout',
+        type=float,
+        default=0.0,
+        metavar='SECONDS',
+        help='Бюджет времени на правила одного файла: дольше — файл сканируется построчно, '
+             'а случай попадает в отчёт. Файлы тогда идут через рабочие процессы, которые '
+             'можно убить, по одному (по умолчанию 0 — без ограничения; '
+             'для чужого кода стоит задать, например %s)' % REGEX_TIMEOUT
+    )
+    parser.add_argument(
+        '--read-ahead',
+        type=int,
+        default=READ_AHEAD,
+        metavar='N',
+        help='Сколько файлов читать одновременно наперёд, пока идёт анализ предыдущих '
+             '(помогает на NFS и других медленных ФС; 0 — читать по месту; по умолчанию %(default)s)'
+    )
+    parser.add_argument(
+        '--read-ahead-mb',
+        type=float,
+        default=READ_AHEAD_MB,
+        metavar='MB',
+        help='Сколько прочитанного наперёд может ждать анализа, МБ (по умолчанию %(default)s)'
+    )
+    parser.add_argument(
+        '--archive-depth',
+        type=int,
+        default=ARCHIVE_DEPTH,
+        metavar='N',
+        help='Сканировать файлы внутри zip/jar/war/whl/tar(.gz) без распаковки, с архивами '
+             'внутри архивов до вложенности N (0 — архивы не открывать; по умолчанию %(default)s). '
+             'Члены архивов идут во все разделы, в том числе в распределение языков и SLOC'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Время и счётчики по стадиям и правилам: в отчёт (json/jsonl) и сводкой в stderr'
+    )
+    parser.add_argument(
+        '--only',
+        type=stages.parse,
+        metavar='STAGES',
+        help='Только эти стадии через запятую (%s); то, от чего они зависят, '
+             'считается, но в отчёт не попадает' % ','.join(stages.STAGES)
+    )
+    parser.add_argument(
+        '--skip',
+        type=stages.parse,
+        default=[],
+        metavar='STAGES',
+        help='Пропустить эти стадии (считаются, только если нужны выбранным)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Следить за деревом и обновлять отчёт после изменений: заново читаются '
+             'только изменённые файлы (Ctrl+C — выход)'
     )
     args = parser.parse_args()
 
-    # 1) Языки и SLOC
-    lang_analyzer = LanguageAnalyzer(args.path)
-    distro = lang_analyzer.detect_languages()     
-    sloc_by_lang, total_sloc = lang_analyzer.count_sloc()
+    if args.since and (args.only or args.skip):
+        parser.error('--only/--skip не сочетаются с --since')
+    if args.watch:
+        if args.since or args.profile:
+            parser.error('--watch не сочетается с --since и --profile')
+        from .watch import watch
+        return watch(args)
 
-    non_other = {l: p for l, p in distro.items() if l != "Other"}
-    main_lang = max(non_other, key=non_other.get) if non_other else None
-    # 2) Первичный стек по структурам и коду
-    stack_analyzer = StackAnalyzer(args.path, main_lang or "")
-    stack_analyzer.prepare_detectors()
-    tech_stack = stack_analyzer.analyze_stack()
+    from .analyzers.report_generator      import ReportGenerator, JsonLinesWriter
+    from .pipeline                        import FilePipeline
+    from .cache                           import ScanCache
+    from .                                import profiling
 
-    # 3) Зависимости (из package.json, pom.xml и т.д.)
-    dep_analyzer = DependencyAnalyzer(args.path, main_lang)
-    deps = dep_analyzer.analyze()
+    profile = profiling.enable() if args.profile else None
+    cache = ScanCache(args.cache_dir) if args.cache_dir else None
+    if args.since:
+        results = scan_changes(args, cache)
+        if cache:
+            cache.close()
+        if profile is not None:
+            results["profile"] = profile.report()
+        with profiling.stage('report'):
+            ReportGenerator(args.format, args.output, compact=args.compact, root=args.path).generate(results)
+        if profile is not None:
+            sys.stderr.write(profile.summary())
+        return
 
-    # 4) Общие секреты
-    secret_analyzer = SecretAnalyzer(args.path)
-    secrets = secret_analyzer.find_secrets()
+    # jsonl: находки пишутся сразу по мере слияния и в памяти не копятся
+    writer = JsonLinesWriter(args.output, args.compress) if args.format == 'jsonl' else None
 
-    # 5) Эндпоинты и AJAX
-    active_langs = [lang for lang in distro.keys() if lang in ENDPOINT_PATTERNS]
-    ep_detector = EndpointDetector(args.path, active_langs)
-    ep_res      = ep_detector.detect()
-    endpoints   = ep_res.get('endpoints', [])
-    ajax_calls  = ep_res.get('ajax', [])
-
-    # 6) HTTP-заголовки
-    hdr_detector = HeaderDetector(args.path, active_langs)
-    headers_info = hdr_detector.detect()
-    # 7) Конфиги и секреты в них
-    config_detector = ConfigDetector(args.path, CONFIG_PATTERNS)
-    configs         = config_detector.detect()
-    config_secrets  = config_detector.secrets
-
-    # 8) Сливаем зависимостями и конфига в единый tech_stack
-    for cat, items in deps.items():
-        if items:
-            tech_stack.setdefault(cat, set()).update(items)
-
-    for tech in configs:
-        if tech in {"MySQL", "PostgreSQL", "Redis"}:
-            cat = "database"
-        elif tech in JS_TECH_DETECTION:
-            cat = JS_TECH_DETECTION[tech]["type"]
-        else:
-            cat = "backend"
-        tech_stack.setdefault(cat, set()).add(tech)
-
-    # 9) Собираем окончательные результаты
-    results = {
-        "languages":      distro,
-        "sloc":           {"by_lang": sloc_by_lang, "total": total_sloc},
-        "stack":          tech_stack,
-        "dependencies":   deps,
-        "secrets":        secrets,
-        "endpoints":      endpoints,
-        "ajax":           ajax_calls,
-        "headers":        headers_info,
-        "configs":        configs,
-        "config_secrets": config_secrets,
-    }
+    # Один обход дерева и одно чтение каждого файла на все стадии
+    pipeline = FilePipeline(args.path, jobs=args.jobs, cache=cache, ignore=make_ignore(args),
+                            regex_timeout=args.regex_timeout, read_ahead=make_read_ahead(args),
+                            archive_depth=args.archive_depth)
+    analysis = Analysis(args.path, pipeline, args.lang_bytes, writer,
+                        stages.plan(args.only, args.skip))
+    with profiling.stage('scan'):
+        pipeline.run(analysis.visitors)
+    if cache:
+        cache.close()
+    results = analysis.results()
+
+    # в отчёт профиль попадает без стадии report — она ещё не закончилась
+    if profile is not None:
+        results["profile"] = profile.report()
 
     # 10) Генерация отчёта
-    report = ReportGenerator(args.format)
-    report.generate(results)
+    report = ReportGenerator(args.format, args.output, writer, args.compact, args.path)
+    with profiling.stage('report'):
+        report.generate(results)
+    if writer is not None:
+        writer.close()
+    if profile is not None:
+        sys.stderr.write(profile.summary())
+
+
+class Analysis:
+    """Выбранные стадии анализа одного репозитория поверх его конвейера.
+
+    Стадии и их зависимости — граф из stages: ``plan`` говорит, что
+    считать и что отдавать в отчёт (по умолчанию — всё). Волны графа
+    выполняются так: walk (языки по именам файлов) — в конструкторе, вместе
+    с прочим, что не требует чтения файлов; все остальные стадии друг от
+    друга по файлам не зависят и идут одним общим проходом — ``visitors``,
+    по одному чтению файла на все. ``results`` доводит стадии в порядке
+    графа и собирает отчёт из выбранных разделов. Так же устроены
+    scan-many, serve и --watch.
+    """
+
+    def __init__(self, path: str, pipeline, lang_bytes: bool = False, writer=None, plan=None):
+        from .analyzers.language_analyzer    import LanguageAnalyzer
+        from .analyzers.stack_analyzer       import StackAnalyzer
+        from .analyzers.dependency_analyzer  import DependencyAnalyzer
+        from .analyzers.secret_analyzer       import SecretAnalyzer
+        from .detectors.endpoint_detector     import EndpointDetector
+        from .detectors.config_detector       import ConfigDetector
+        from .detectors.header_detector       import HeaderDetector
+        from .findings                        import ResultStore
+        from .                                import profiling, stages
+
+        self.pipeline = pipeline
+        self.plan = plan or stages.FULL
+        run = set(self.plan.run)
+        self.lang_analyzer = self.stack_analyzer = self.dep_analyzer = None
+        self.ep_detector = self.hdr_detector = self.config_detector = None
+        self.secret_analyzer = None
+        self.distro = self.distro_bytes = self.main_lang = None
+
+        # 1) Языки — по именам файлов, SLOC считается в общем проходе
+        if 'walk' in run:
+            self.lang_analyzer = LanguageAnalyzer(path, pipeline)
+            with profiling.stage('walk'):
+                self.distro = self.lang_analyzer.detect_languages()
+            if lang_bytes and 'languages' in self.plan.emit:
+                self.distro_bytes = self.lang_analyzer.detect_languages(by_bytes=True)
+            non_other = {l: p for l, p in self.distro.items() if l != "Other"}
+            self.main_lang = max(non_other, key=non_other.get) if non_other else None
+        # 2) Первичный стек по структурам и коду
+        if 'stack' in run:
+            self.stack_analyzer = StackAnalyzer(path, self.main_lang or "", pipeline)
+            with profiling.stage('stack'):
+                self.stack_analyzer.prepare_detectors()
+
+        # 3) Зависимости (из package.json, pom.xml и т.д.)
+        if 'dependencies' in run:
+            self.dep_analyzer = DependencyAnalyzer(path, self.main_lang, pipeline)
+
+        # 4) Секреты во всех текстовых файлах
+        if 'secrets' in run:
+            self.secret_analyzer = SecretAnalyzer(path, pipeline)
+
+        # 5) Эндпоинты и AJAX
+        active_langs = [lang for lang in self.distro.keys() if lang in ENDPOINT_PATTERNS] if self.distro else []
+        if 'endpoints' in run:
+            self.ep_detector = EndpointDetector(path, active_langs, pipeline)
+
+        # 6) HTTP-заголовки
+        if 'headers' in run:
+            self.hdr_detector = HeaderDetector(path, active_langs, pipeline)
+        # 7) Конфиги и секреты в них
+        if 'configs' in run:
+            self.config_detector = ConfigDetector(path, CONFIG_PATTERNS, pipeline)
+
+        # находки эндпоинтов и заголовков — столбцами с общей таблицей путей
+        store = ResultStore()
+        for detector in (self.ep_detector, self.hdr_detector):
+            if detector is not None:
+                detector.store = store
+
+        if writer is not None:
+            # потоком пишутся только находки стадий, которые попадут в отчёт
+            for stage, detector in (('secrets', self.secret_analyzer), ('endpoints', self.ep_detector),
+                                    ('headers', self.hdr_detector), ('configs', self.config_detector)):
+                if detector is not None and stage in self.plan.emit:
+                    detector.sink = profiling.counted(detector.stage, writer.write)
+
+    @property
+    def visitors(self) -> list:
+        # анализатор языков нужен общему проходу, только если нужен SLOC
+        lang = self.lang_analyzer if 'languages' in self.plan.run else None
+        return [v for v in (lang, self.stack_analyzer, self.dep_analyzer, self.secret_analyzer,
+                            self.ep_detector, self.hdr_detector, self.config_detector)
+                if v is not None]
+
+    def results(self) -> dict:
+        from .                                import profiling, stages
+
+        emit = self.plan.emit
+        results = {}
+        # finalize — тоже часть стадии: файловые правила стека проверяются здесь
+        if self.lang_analyzer is not None and 'languages' in self.plan.run:
+            with profiling.stage('languages'):
+                sloc_by_lang, total_sloc = self.lang_analyzer.finalize()
+            profiling.results('languages', len(sloc_by_lang))
+            results["languages"] = self.distro
+            results["sloc"] = {"by_lang": sloc_by_lang, "total": total_sloc}
+            if self.distro_bytes is not None:
+                results["languages_bytes"] = self.distro_bytes
+        deps = configs = None
+        if self.dep_analyzer is not None:
+            with profiling.stage('dependencies'):
+                deps = self.dep_analyzer.finalize()
+            profiling.results('dependencies', sum(len(items) for items in deps.values()))
+            results["dependencies"] = deps
+        if self.config_detector is not None:
+            with profiling.stage('configs'):
+                configs = self.config_detector.finalize()
+            config_secrets = self.config_detector.secrets
+            profiling.results('configs', len(configs) + len(config_secrets))
+            results["configs"] = configs
+            results["config_secrets"] = config_secrets
+        if self.stack_analyzer is not None:
+            with profiling.stage('stack'):
+                tech_stack = self.stack_analyzer.finalize()
+            profiling.results('stack', sum(len(items) for items in tech_stack.values()))
+            results["stack"] = self._merge_stack(tech_stack, deps, configs)
+        if self.secret_analyzer is not None:
+            with profiling.stage('secrets'):
+                results["secrets"] = self.secret_analyzer.finalize()
+            profiling.results('secrets', len(results["secrets"]))
+        if self.ep_detector is not None:
+            with profiling.stage('endpoints'):
+                ep_res = self.ep_detector.finalize()
+            results["endpoints"] = ep_res.get('endpoints', [])
+            results["ajax"] = ep_res.get('ajax', [])
+            profiling.results('endpoints', len(results["endpoints"]) + len(results["ajax"]))
+        if self.hdr_detector is not None:
+            with profiling.stage('headers'):
+                results["headers"] = self.hdr_detector.finalize()
+            profiling.results('headers', len(results["headers"]))
+
+        # Собираем окончательные результаты — в привычном порядке разделов
+        wanted = {key for stage in emit for key in stages.SECTIONS[stage]}
+        order = ("languages", "sloc", "stack", "dependencies", "secrets", "endpoints", "ajax",
+                 "headers", "configs", "config_secrets")
+        report = {key: results[key] for key in order if key in wanted and key in results}
+        # файлы, на которых правила не уложились в --regex-timeout
+        report["timeouts"] = self.pipeline.timeouts
+        if "languages_bytes" in wanted and "languages_bytes" in results:
+            report["languages_bytes"] = results["languages_bytes"]
+        return report
+
+    @staticmethod
+    def _merge_stack(tech_stack: dict, deps, configs) -> dict:
+        # Сливаем зависимости и конфиги в единый tech_stack
+        for cat, items in (deps or {}).items():
+            if items:
+                tech_stack.setdefault(cat, set()).update(items)
 
+        for tech in configs or ():
+            if tech in {"MySQL", "PostgreSQL", "Redis"}:
+                cat = "database"
+            elif tech in JS_TECH_DETECTION:
+                cat = JS_TECH_DETECTION[tech]["type"]
+            else:
+                cat = "backend"
+            tech_stack.setdefault(cat, set()).add(tech)
+        return tech_stack
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,14 +1,22 @@
 """Набор детекторов для анализа кода"""
-from .base import Detector
-from .file_detector import FileDetector
-from .code_detector import CodeDetector
-from .config_detector import ConfigDetector
-from .endpoint_detector import EndpointDetector
-
-__all__ = [
-    "Detector",
-    "FileDetector",
-    "CodeDetector",
-    "ConfigDetector",
-    "EndpointDetector",
-]
\ No newline at end of file
+from importlib import import_module
+
+# модуль каждого детектора импортируется при первом обращении к нему
+_MODULES = {
+    "Detector": ".base",
+    "FileVisitor": ".base",
+    "FileDetector": ".file_detector",
+    "CodeDetector": ".code_detector",
+    "MultiCodeDetector": ".code_detector",
+    "ConfigDetector": ".config_detector",
+    "EndpointDetector": ".endpoint_detector",
+}
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = globals()[name] = getattr(import_module(_MODULES[name], __name__), name)
+    return value
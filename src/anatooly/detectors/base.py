@@ -1,13 +1,94 @@
 from abc import ABC, abstractmethod
-from typing import Any, Tuple
+from typing import Any, Optional, Tuple
+from ..source import SourceFile
 
-class Detector(ABC):
-    def __init__(self, directory: str):
+
+class FileVisitor:
+    """Участник общего прохода по файлам (см. pipeline.FilePipeline).
+
+    Конвейер один раз обходит дерево, один раз читает каждый файл и
+    раздаёт его всем визитёрам, которым файл нужен. ``scan`` не должен
+    менять состояние визитёра — при ``--jobs`` он выполняется в рабочем
+    процессе, а его результат возвращается в ``merge`` основного процесса
+    в порядке обхода.
+    """
+    # нужно ли визитёру содержимое файла или достаточно пути
+    needs_content = True
+    # имя стадии в --profile (по умолчанию — имя класса)
+    stage: Optional[str] = None
+    # если задан, находки отдаются сюда по мере слияния, а не копятся
+    # до finalize: sink(тип записи, запись)
+    sink = None
+    # общие таблицы путей и строк для находок (findings.ResultStore)
+    store = None
+
+    def start(self) -> None:
+        pass
+
+    def wants(self, path: str, rel: str) -> bool:
+        return True
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> Any:
+        return None
+
+    def merge(self, path: str, rel: str, partial: Any) -> None:
+        pass
+
+    def finalize(self) -> Any:
+        return None
+
+    # --- кэш между запусками (см. cache.ScanCache) ---
+
+    def cache_key(self) -> Optional[str]:
+        # None — результаты визитёра не кэшируются
+        return None
+
+    def to_cache(self, partial: Any) -> Any:
+        return partial
+
+    def prime(self, stored: Any) -> None:
+        # вызывается до сканирования для каждой записи по неизменённому файлу
+        pass
+
+    def from_cache(self, stored: Any) -> Tuple[bool, Any]:
+        # (годится ли запись, частичный результат для merge)
+        return True, stored
+
+    # --- пересканирование изменённых файлов (см. watch.WatchSession) ---
+
+    def unmerge(self, path: str, rel: str, partial: Any) -> bool:
+        """Убирает вклад файла, отданный раньше в ``merge`` с этим ``partial``.
+
+        После него ``finalize`` должен давать то же, что и проход без этого
+        файла, и вызываться повторно — --watch вызывает его каждый раунд.
+        False — визитёр так не умеет: --watch тогда строит анализ заново.
+        """
+        return False
+
+    def reopened(self) -> bool:
+        # после unmerge прежние результаты других файлов могли устареть
+        # (см. MultiCodeDetector): их надо сверить через from_cache
+        return False
+
+    def __getstate__(self):
+        # в рабочие процессы уходят только правила, без списка файлов
+        # конвейера и без приёмника потоковых записей
+        state = self.__dict__.copy()
+        state.pop('pipeline', None)
+        state.pop('sink', None)
+        return state
+
+
+class Detector(FileVisitor, ABC):
+    def __init__(self, directory: str, pipeline=None):
         self.directory = directory
+        self.pipeline = pipeline
 
-    @abstractmethod
     def detect(self) -> Tuple[bool, Any]:
-        pass
+        from ..pipeline import FilePipeline
+        pipeline = self.pipeline or FilePipeline(self.directory)
+        pipeline.run([self])
+        return self.finalize()
 
     @abstractmethod
     def confidence(self) -> float:
@@ -1,39 +1,200 @@
-import os
 import re
-from typing import List, Tuple
+import time
+from collections import Counter
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
 from .base import Detector
+from ..source import SourceFile
+from ..cache import fingerprint
+from ..literals import RuleSet
+from ..pipeline import FilePipeline
+from .. import profiling
+
+CODE_EXTENSIONS = ('.py', '.js', '.ts', '.java', '.php', '.cs', '.json')
 
 class CodeDetector(Detector):
-    def __init__(self, directory: str, pattern: str):
-        super().__init__(directory)
+    def __init__(self, directory: str, pattern: str, pipeline=None):
+        super().__init__(directory, pipeline)
         if isinstance(pattern, re.Pattern):
             self.pattern = pattern
         else:
             self.pattern = re.compile(pattern, re.IGNORECASE)
         self._matches: List[Tuple[str, int, str]] = []
 
-    def detect(self) -> List[Tuple[str, int, str]]:
+    def start(self) -> None:
         self._matches.clear()
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                if not fname.endswith(('.py', '.js', '.ts', '.java', '.php', '.cs', '.json')):
-                    continue
-                path = os.path.join(root, fname)
-                try:
-                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                        for lineno, line in enumerate(f, start=1):
-                            m = self.pattern.search(line)
-                            if m:
-                                self._matches.append((path, lineno, m.group(0)))
-                except Exception:
-                    continue
+
+    def wants(self, path: str, rel: str) -> bool:
+        return path.endswith(CODE_EXTENSIONS)
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> List[Tuple[int, str]]:
+        found = []
+        for lineno, line in enumerate(source.text.split('\n'), start=1):
+            m = self.pattern.search(line)
+            if m:
+                found.append((lineno, m.group(0)))
+        return found
+
+    def merge(self, path: str, rel: str, partial: List[Tuple[int, str]]) -> None:
+        self._matches.extend((path, lineno, text) for lineno, text in partial)
+
+    def cache_key(self) -> Optional[str]:
+        return 'code-lines:' + fingerprint(self.pattern)
+
+    def finalize(self) -> List[Tuple[str, int, str]]:
         return self._matches
 
     def confidence(self) -> float:
         total = 0
         seen_files = set(path for path, _, _ in self._matches)
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                if fname.endswith(('.py', '.js', '.ts', '.java', '.php', '.cs','json')):
-                    total += 1
-        return (len(seen_files) / total) if total > 0 else 0.0
\ No newline at end of file
+        for path, _ in (self.pipeline or FilePipeline(self.directory)).files:
+            if path.endswith(('.py', '.js', '.ts', '.java', '.php', '.cs','json')):
+                total += 1
+        return (len(seen_files) / total) if total > 0 else 0.0
+
+
+class MultiCodeDetector(Detector):
+    """Проверяет все кодовые правила технологий за одно чтение файла.
+
+    Нужен только факт срабатывания, поэтому технология выбывает из активного
+    набора сразу после первого совпадения, а когда подтверждено всё —
+    файлы больше не читаются. Выбывание монотонно, так что каждый рабочий
+    процесс сужает свой набор независимо, а итог от этого не зависит.
+    Правила, чьих обязательных литералов в файле нет, отсеиваются до
+    запуска регулярок.
+    """
+
+    def __init__(self, directory: str, rules: List[Tuple[str, Any]], pipeline=None):
+        super().__init__(directory, pipeline)
+        self.rules: List[Tuple[str, re.Pattern]] = [
+            (tech, p if isinstance(p, re.Pattern) else re.compile(p, re.IGNORECASE))
+            for tech, p in rules
+        ]
+        self.techs: Set[str] = {tech for tech, _ in self.rules}
+        self.confirmed: Set[str] = set()
+        # в скольких слитых файлах нашлась технология: по нулю она снова
+        # не подтверждена (unmerge в --watch)
+        self._found_in: Counter = Counter()
+        self._reopened = False
+        self.prefilter = RuleSet([p for _, p in self.rules])
+        self._combined: Dict[FrozenSet[int], Optional[re.Pattern]] = {}
+
+    def pending(self) -> List[Tuple[str, re.Pattern]]:
+        return [(tech, p) for tech, p in self.rules if tech not in self.confirmed]
+
+    def _matcher(self, pending: List[int]) -> Optional[re.Pattern]:
+        # одна альтернация из правил-кандидатов (индексы в self.rules);
+        # наборов немного, поэтому собранные альтернации запоминаются
+        key = frozenset(pending)
+        if key not in self._combined:
+            if len(self._combined) >= 256:
+                self._combined.clear()
+            parts = []
+            for i, rule in enumerate(pending):
+                p = self.rules[rule][1]
+                flags = '?i:' if p.flags & re.IGNORECASE else '?:'
+                parts.append('(?P<r%d>(%s%s))' % (i, flags, p.pattern))
+            combined = '|'.join(parts)
+            try:
+                # правила из patterns.py — ASCII, их альтернация идёт по байтам
+                self._combined[key] = re.compile(combined.encode('ascii') if combined.isascii() else combined)
+            except re.error:
+                self._combined[key] = None
+        return self._combined[key]
+
+    def start(self) -> None:
+        self.confirmed = set()
+        self._found_in = Counter()
+        self._reopened = False
+
+    def wants(self, path: str, rel: str) -> bool:
+        return path.endswith(CODE_EXTENSIONS) and len(self.confirmed) < len(self.techs)
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> Tuple[List[str], List[str]]:
+        found: List[str] = []
+        pos = 0
+        searched = None
+        evaluated = sorted({tech for tech, _ in self.pending()})
+        maybe = self.prefilter.candidates(source.data) if evaluated else []
+        pending = self._candidates(maybe)
+        while pending:
+            # в построчном режиме (после превышения бюджета) — по одному правилу
+            combined = None if source.bounded else self._matcher(pending)
+            if combined is None:
+                found.extend({self.rules[i][0] for i in pending if self._contains(source, i)})
+                break
+            content = source.data if isinstance(combined.pattern, bytes) else source.text
+            if content is not searched:
+                # смещения в байтах и в символах не совместимы — ищем сначала
+                searched, pos = content, 0
+            start = time.perf_counter()
+            m = combined.search(content, pos)
+            if profiling.ACTIVE is not None:
+                self._profile(pending, m, time.perf_counter() - start)
+            if m is None:
+                break
+            for name, value in m.groupdict().items():
+                if value is not None:
+                    found.append(self.rules[pending[int(name[1:])]][0])
+            self.confirmed.update(found)
+            # на той же позиции могли совпасть и другие правила — ищем с неё же
+            pos = m.start()
+            pending = self._candidates(maybe)
+        # кроме найденного запоминаем, что вообще проверялось в этом файле —
+        # для кэша это разница между «не найдено» и «не искали»
+        return evaluated, found
+
+    def _contains(self, source: SourceFile, rule: int) -> bool:
+        tech, regex = self.rules[rule]
+        start = time.perf_counter()
+        hit = source.contains(regex)
+        profiling.rule('TECHNOLOGY_DETECTORS', tech, regex, time.perf_counter() - start, int(hit))
+        return hit
+
+    def _profile(self, pending: List[int], m: Optional[re.Match], seconds: float) -> None:
+        # правила ищутся одной альтернацией: её время делится поровну
+        # между всеми правилами, которые в неё вошли
+        share = seconds / len(pending)
+        for i, rule in enumerate(pending):
+            tech, regex = self.rules[rule]
+            hit = m is not None and m.group('r%d' % i) is not None
+            profiling.rule('TECHNOLOGY_DETECTORS', tech, regex, share, int(hit))
+
+    def _candidates(self, maybe: List[bool]) -> List[int]:
+        return [i for i, (tech, _) in enumerate(self.rules)
+                if tech not in self.confirmed and maybe[i]]
+
+    def merge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> None:
+        self.confirmed.update(partial[1])
+        self._found_in.update(partial[1])
+
+    def unmerge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> bool:
+        self._found_in.subtract(partial[1])
+        for tech in partial[1]:
+            if self._found_in[tech] <= 0 and tech in self.confirmed:
+                # технологию подтверждал только этот файл: другие файлы её
+                # могли не проверять — они выбыли из поиска раньше
+                self.confirmed.discard(tech)
+                self._reopened = True
+        return True
+
+    def reopened(self) -> bool:
+        reopened, self._reopened = self._reopened, False
+        return reopened
+
+    def cache_key(self) -> Optional[str]:
+        return 'code:' + fingerprint(self.rules)
+
+    def prime(self, stored: Tuple[List[str], List[str]]) -> None:
+        # найденное в неизменённом файле подтвердится и в этом запуске
+        self.confirmed.update(stored[1])
+
+    def from_cache(self, stored: Tuple[List[str], List[str]]) -> Tuple[bool, Tuple[List[str], List[str]]]:
+        evaluated, _ = stored
+        pending = {tech for tech, _ in self.pending()}
+        return pending.issubset(evaluated), stored
+
+    def finalize(self) -> Set[str]:
+        return self.confirmed
+
+    def confidence(self) -> float:
+        return (len(self.confirmed) / len(self.techs)) if self.techs else 0.0
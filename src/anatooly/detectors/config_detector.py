@@ -1,36 +1,87 @@
 import os
-from typing import Dict, List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from .base import Detector
-from ..patterns import CONFIG_PATTERNS, PASSWORD_PATTERN  
+from ..source import SourceFile, as_bytes, decode
+from ..cache import fingerprint
+from ..literals import LiteralMatcher, RuleSet
+from .. import patterns
+from ..patterns import CONFIG_PATTERNS
+
+
+@lru_cache(maxsize=None)
+def _password() -> RuleSet:
+    return RuleSet([patterns.PASSWORD_PATTERN])
+
 
 class ConfigDetector(Detector):
-    def __init__(self, directory: str, config_patterns: Dict[str, Dict[str, str]] = None):
-        super().__init__(directory)
-        self.config_patterns = config_patterns or CONFIG_PATTERNS  
+    stage = 'configs'
+
+    def __init__(self, directory: str, config_patterns: Dict[str, Dict[str, str]] = None, pipeline=None):
+        super().__init__(directory, pipeline)
+        self.config_patterns = config_patterns or CONFIG_PATTERNS
         self.detected: Dict[str, List[str]] = {}
         self.secrets: List[Tuple[str, List[str]]] = []
+        # результат по каждому файлу в порядке обхода: из него finalize
+        # собирает detected и secrets. Файл, пересканированный в --watch,
+        # остаётся на своём месте
+        self._files: Dict[str, Tuple[List[str], List[str]]] = {}
+        # строки-признаки каждого имени файла ищутся одним проходом
+        self.matchers = {name: LiteralMatcher(tech_map) for name, tech_map in self.config_patterns.items()}
+
+    def start(self) -> None:
+        self.detected = {}
+        self.secrets = []
+        self._files = {}
+
+    def wants(self, path: str, rel: str) -> bool:
+        return os.path.basename(path) in self.config_patterns
+
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> Tuple[List[str], List[str]]:
+        data = source.data
+        tech_map = self.config_patterns[os.path.basename(path)]
+        hits = self.matchers[os.path.basename(path)].hits(data)
+        techs = [tech for pattern, tech in tech_map.items() if not pattern or pattern in hits]
+        values = []
+        password = _password()
+        if password.candidates(data)[0]:
+            values = [decode(match[1]) for match in as_bytes(password.regexes[0]).findall(data)]
+        return techs, values
+
+    def merge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> None:
+        techs, values = partial
+        if self.sink is None:
+            self._files[path] = partial
+            return
+        for tech in techs:
+            self.detected.setdefault(tech, []).append(path)
+        for value in values:
+            self.sink('config_secret', {'file': rel, 'value': value})
+
+    def unmerge(self, path: str, rel: str, partial: Tuple[List[str], List[str]]) -> bool:
+        # место файла в порядке обхода сохраняется до следующего merge;
+        # с потоковой записью (sink) отправленное уже не вернуть
+        if self.sink is not None:
+            return False
+        if path in self._files:
+            self._files[path] = ([], [])
+        return True
+
+    def cache_key(self) -> Optional[str]:
+        return 'configs:' + fingerprint(self.config_patterns)
 
-    def detect(self) -> Dict[str, List[str]]:
-        for root, _, files in os.walk(self.directory):
-            for cfg_file, tech_map in self.config_patterns.items():
-                if cfg_file not in files:
-                    continue
-                path = os.path.join(root, cfg_file)
-                try:
-                    content = open(path, 'r', encoding='utf-8', errors='ignore').read()
-                except Exception:
-                    continue
-
-                for pattern, tech in tech_map.items():
-                    if pattern in content:
-                        self.detected.setdefault(tech, []).append(path)
-                secrets = PASSWORD_PATTERN.findall(content)
-                if secrets:
-                    values = [match[1] for match in secrets]
-                    self.secrets.append((path, values))
+    def finalize(self) -> Dict[str, List[str]]:
+        if self.sink is not None:
+            return self.detected
+        self.detected, self.secrets = {}, []
+        for path, (techs, values) in self._files.items():
+            for tech in techs:
+                self.detected.setdefault(tech, []).append(path)
+            if values:
+                self.secrets.append((path, values))
         return self.detected
 
     def confidence(self) -> float:
         total_patterns = sum(len(p) for p in self.config_patterns.values())
         found = sum(len(paths) for paths in self.detected.values())
-        return (found / total_patterns) if total_patterns else 0.0
\ No newline at end of file
+        return (found / total_patterns) if total_patterns else 0.0
@@ -1,12 +1,14 @@
 import os
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from .base import Detector
-from ..patterns import (
-    ENDPOINT_PATTERNS,
-    AJAX_PATTERN_EXT,
-    ENDPOINT_IGNORE_FILE_PATTERNS
-)
+from ..source import SourceFile
+from ..ignore import combine
+from ..literals import RuleSet
+from .. import patterns, profiling
+from ..findings import INT, PATH, STR, FindingTable, ResultStore
+from ..patterns import ENDPOINT_PATTERNS
 
 EXTENSION_LANG_MAP = {
     '.js':   'JavaScript',
@@ -21,77 +23,116 @@ EXTENSION_LANG_MAP = {
     '.kt':   'Kotlin',
 }
 
+ENDPOINT_COLUMNS = (('file', PATH), ('line', INT), ('framework', STR), ('method', STR), ('endpoint', STR))
+AJAX_COLUMNS = (('file', PATH), ('line', INT), ('call', STR))
+
+
+@lru_cache(maxsize=None)
+def endpoint_ignore() -> 're.Pattern[str]':
+    # все правила пропуска файлов одной регуляркой вместо поиска по каждой;
+    # собирается при первом вызове, а не при импорте
+    return combine(patterns.ENDPOINT_IGNORE_FILE_PATTERNS)
+
+
+@lru_cache(maxsize=None)
+def _rules(lang: str) -> RuleSet:
+    # правила языка и AJAX (последним) с общим префильтром по литералам
+    return RuleSet([regex for regex, _ in ENDPOINT_PATTERNS.get(lang, [])] + [patterns.AJAX_PATTERN_EXT])
+
+
 class EndpointDetector(Detector):
-    def __init__(self, directory: str, langs: List[str]):
-        super().__init__(directory)
+    stage = 'endpoints'
+
+    def __init__(self, directory: str, langs: List[str], pipeline=None):
+        super().__init__(directory, pipeline)
         self.langs = langs
+        self.start()
+
+    def start(self) -> None:
+        # находки копятся столбцами (findings.FindingTable); store может
+        # быть общим с другими детекторами — тогда и таблица путей общая
+        store = self.store or ResultStore()
+        self._records = store.table(ENDPOINT_COLUMNS)
+        self._ajax_calls = store.table(AJAX_COLUMNS)
+
+    def wants(self, path: str, rel: str) -> bool:
+        if endpoint_ignore().search(path):
+            return False
+        ext = os.path.splitext(path)[1].lower()
+        return EXTENSION_LANG_MAP.get(ext) in self.langs
 
-    def detect(self) -> Dict[str, List[Dict[str, Any]]]:
-        
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> Tuple[List[tuple], List[tuple]]:
         records: List[tuple] = []
-        ajax_calls = set()
-
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                fpath = os.path.join(root, fname)
-
-                if any(pat.search(fpath) for pat in ENDPOINT_IGNORE_FILE_PATTERNS):
-                    continue
-
-            
-                ext = os.path.splitext(fname)[1].lower()
-                if ext not in EXTENSION_LANG_MAP:
-                    continue
-
-                try:
-                    text = open(fpath, 'r', encoding='utf-8', errors='ignore').read()
-                except Exception:
-                    continue
-
-                rel = os.path.relpath(fpath, start=self.directory)
-
-                lang_for_file = EXTENSION_LANG_MAP[ext]
-                if lang_for_file not in self.langs:
-                    continue
-
-                for regex, framework in ENDPOINT_PATTERNS.get(lang_for_file, []):
-                    for m in regex.finditer(text):
-                        if regex.groups >= 2:
-                            ann = m.group(1)
-                            if framework == "Spring MVC":
-                                ann_lower = ann.lower()
-                                if ann_lower.endswith("mapping"):
-                                    method = ann_lower[:-7].upper()  
-                                else:
-                                    method = "ALL"
-                            else:
-                                method = ann.upper()
-                            route = m.group(2)
+        ajax_calls: List[tuple] = []
+        lang_for_file = EXTENSION_LANG_MAP[os.path.splitext(path)[1].lower()]
+        # регулярки запускаются только там, где есть их обязательные литералы
+        rules = _rules(lang_for_file)
+        maybe = rules.candidates(source.data)
+
+        for (regex, framework), possible in zip(ENDPOINT_PATTERNS.get(lang_for_file, []), maybe):
+            if not possible:
+                continue
+            rule = '%s: %s' % (lang_for_file, framework)
+            for line_no, groups, _ in profiling.matches(source, regex, 'ENDPOINT_PATTERNS', rule):
+                if regex.groups >= 2:
+                    ann = groups[0]
+                    if framework == "Spring MVC":
+                        ann_lower = ann.lower()
+                        if ann_lower.endswith("mapping"):
+                            method = ann_lower[:-7].upper()  
                         else:
                             method = "ALL"
-                            route = m.group(1)
-
-                        line_no = text[:m.start()].count('\n') + 1
-                        records.append((rel, line_no, framework, method, route))
-
-                for match in AJAX_PATTERN_EXT.finditer(text):
-                    url = next((g for g in match.groups() if g), None)
-                    if not url:
-                        continue
-                    line_no = text[:match.start()].count('\n') + 1
-                    ajax_calls.add((rel, line_no, url))
-
-        records.sort(key=lambda x: (x[0], x[1]))
-        endpoint_list: List[Dict[str, Any]] = [
-            {'file': f, 'line': ln, 'framework': fw, 'method': meth, 'endpoint': ep}
-            for f, ln, fw, meth, ep in records
-        ]
-        ajax_list = [
-            {'file': fp, 'line': ln, 'call': url}
-            for fp, ln, url in sorted(ajax_calls)
-        ]
-
-        return {'endpoints': endpoint_list, 'ajax': ajax_list}
+                    else:
+                        method = ann.upper()
+                    route = groups[1]
+                else:
+                    method = "ALL"
+                    route = groups[0]
+
+                records.append((rel, line_no, framework, method, route))
+
+        ajax_matches = profiling.matches(source, rules.regexes[-1], 'AJAX_PATTERN_EXT', lang_for_file) \
+            if maybe[-1] else ()
+        for line_no, groups, _ in ajax_matches:
+            url = next((g for g in groups if g), None)
+            if not url:
+                continue
+            ajax_calls.append((rel, line_no, url))
+
+        return records, ajax_calls
+
+    def merge(self, path: str, rel: str, partial: Tuple[List[tuple], List[tuple]]) -> None:
+        records, ajax_calls = partial
+        if self.sink is None:
+            self._records.extend(records)
+            # все AJAX-вызовы файла приходят разом: дубли убираются здесь
+            self._ajax_calls.extend(sorted(set(ajax_calls)))
+            return
+        # все находки файла приходят одним merge, поэтому сортировка и
+        # удаление дублей в пределах файла дают тот же порядок строк
+        for f, ln, fw, meth, ep in sorted(records, key=lambda x: x[1]):
+            self.sink('endpoint', {'file': f, 'line': ln, 'framework': fw, 'method': meth, 'endpoint': ep})
+        for fp, ln, url in sorted(set(ajax_calls)):
+            self.sink('ajax', {'file': fp, 'line': ln, 'call': url})
+
+    def unmerge(self, path: str, rel: str, partial: Tuple[List[tuple], List[tuple]]) -> bool:
+        if self.sink is not None:
+            return False
+        records, ajax_calls = partial
+        if records:
+            self._records.discard('file', rel)
+        if ajax_calls:
+            self._ajax_calls.discard('file', rel)
+        return True
+
+    def cache_key(self) -> Optional[str]:
+        return 'endpoints'
+
+    def finalize(self) -> Dict[str, FindingTable]:
+        # строки-словари собираются только при чтении таблицы
+        self._records.sort('file', 'line')
+        self._ajax_calls.sort('file', 'line', 'call')
+        return {'endpoints': self._records, 'ajax': self._ajax_calls}
 
     def confidence(self) -> float:
         res = self.detect()
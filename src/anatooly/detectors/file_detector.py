@@ -1,50 +1,57 @@
-import os
-import glob
-from typing import List, Dict, Any, Tuple
+import re
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from .base import Detector
+from ..pipeline import FilePipeline
+from .. import profiling
+from ..source import read_text
 
 class FileDetector(Detector):
-    def __init__(self, directory: str, configs: List[Dict[str, Any]]):
-        super().__init__(directory)
+    def __init__(self, directory: str, configs: List[Dict[str, Any]], pipeline=None,
+                 name: Optional[str] = None):
+        super().__init__(directory, pipeline)
         self.configs = configs
+        # технология, которую ищут правила (для --profile)
+        self.name = name
         self._matches: List[Tuple[str, Any]] = []
 
     def detect(self) -> Tuple[bool, List[Tuple[str, Any]]]:
         self._matches.clear()
-    
+        # правила проверяются по описи файлов конвейера, а не по диску
+        inventory = (self.pipeline or FilePipeline(self.directory)).inventory
+
         for cfg in self.configs:
             expected_type = cfg.get('type', 'file')
             if isinstance(cfg.get('pattern'), re.Pattern):
                 pat: re.Pattern = cfg['pattern']
-                for root, _, files in os.walk(self.directory):
-                    for fname in files:
-                        if pat.search(fname):
-                            full = os.path.join(root, fname)
-                            if expected_type == 'dir' and os.path.isdir(full):
-                                self._matches.append((full, None))
-                            elif expected_type == 'file' and os.path.isfile(full):
-                                if 'content' in cfg:
-                                    text = open(full, 'r', encoding='utf-8', errors='ignore').read()
-                                    if cfg['content'] in text:
-                                        self._matches.append((full, cfg['content']))
-                                else:
-                                    self._matches.append((full, None))
+                # по уникальным именам файлов, а не по каждому файлу
+                if expected_type != 'file':
+                    continue
+                start = time.perf_counter()
+                names = [name for name in inventory.by_name if pat.search(name)]
+                profiling.rule('TECHNOLOGY_DETECTORS', self.name or expected_type, pat,
+                               time.perf_counter() - start, len(names), len(inventory.by_name))
+                for name in names:
+                    for entry in inventory.by_name[name]:
+                        self._check_file(entry.path, cfg)
                 continue
 
-            pattern_str = cfg.get('path', '')
-            for full in glob.glob(os.path.join(self.directory, pattern_str), recursive=True):
-                if expected_type == 'dir' and os.path.isdir(full):
+            for full, is_dir in inventory.glob(cfg.get('path', '')):
+                if expected_type == 'dir' and is_dir:
                     self._matches.append((full, None))
-                elif expected_type == 'file' and os.path.isfile(full):
-                    if 'content' in cfg:
-                        text = open(full, 'r', encoding='utf-8', errors='ignore').read()
-                        if cfg['content'] in text:
-                            self._matches.append((full, cfg['content']))
-                    else:
-                        self._matches.append((full, None))
+                elif expected_type == 'file' and not is_dir:
+                    self._check_file(full, cfg)
     
         return (bool(self._matches), self._matches)
 
+    def _check_file(self, full: str, cfg: Dict[str, Any]) -> None:
+        if 'content' in cfg:
+            text = read_text(full)
+            if cfg['content'] in text:
+                self._matches.append((full, cfg['content']))
+        else:
+            self._matches.append((full, None))
+
     def confidence(self) -> float:
         total = len(self.configs)
-        return (len(self._matches) / total) if total > 0 else 0.0
\ No newline at end of file
+        return (len(self._matches) / total) if total > 0 else 0.0
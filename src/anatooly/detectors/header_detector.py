@@ -1,54 +1,89 @@
 import os, re
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 from .base import Detector
-from ..patterns import HEADER_PATTERNS, ENDPOINT_IGNORE_FILE_PATTERNS
+from ..source import SourceFile
+from .endpoint_detector import endpoint_ignore
+from ..literals import RuleSet
+from .. import profiling
+from ..findings import INT, OBJ, PATH, STR, FindingTable, ResultStore
+from ..patterns import HEADER_PATTERNS
+
+HEADER_EXTENSION_LANG_MAP = {'.js':'JavaScript', '.py':'Python', '.go':'Go', '.java':'Java'}
+HEADER_COLUMNS = (('file', PATH), ('line', INT), ('framework', STR), ('method', STR),
+                  ('endpoint', STR), ('headers', OBJ))
+
+@lru_cache(maxsize=None)
+def _rules(lang: str) -> RuleSet:
+    return RuleSet([regex for regex, _ in HEADER_PATTERNS.get(lang, [])])
+
 
 class HeaderDetector(Detector):
-    def __init__(self, directory: str, langs: List[str]):
-        super().__init__(directory)
+    stage = 'headers'
+
+    def __init__(self, directory: str, langs: List[str], pipeline=None):
+        super().__init__(directory, pipeline)
         self.langs = langs
+        self.start()
+
+    def start(self) -> None:
+        self._results = (self.store or ResultStore()).table(HEADER_COLUMNS)
+
+    def wants(self, path: str, rel: str) -> bool:
+        if endpoint_ignore().search(path):
+            return False
+        ext = os.path.splitext(path)[1].lower()
+        return HEADER_EXTENSION_LANG_MAP.get(ext) in self.langs
 
-    def detect(self) -> List[Dict[str, Any]]:
+    def scan(self, path: str, rel: str, source: Optional[SourceFile]) -> List[Dict[str, Any]]:
         results: List[Dict[str, Any]] = []
+        lang = HEADER_EXTENSION_LANG_MAP[os.path.splitext(path)[1].lower()]
 
-        for root, _, files in os.walk(self.directory):
-            for fname in files:
-                fpath = os.path.join(root, fname)
-                if any(pat.search(fpath) for pat in ENDPOINT_IGNORE_FILE_PATTERNS):
-                    continue
-
-                ext = os.path.splitext(fname)[1].lower()
-                lang = {'.js':'JavaScript', '.py':'Python', '.go':'Go', '.java':'Java'}.get(ext)
-                if lang not in self.langs:
-                    continue
-
-                fpath = os.path.join(root, fname)
-                try:
-                    text = open(fpath, encoding='utf-8', errors='ignore').read()
-                except:
-                    continue
-                rel = os.path.relpath(fpath, self.directory)
-
-                for regex, framework in HEADER_PATTERNS.get(lang, []):
-                    for m in regex.finditer(text):
-                        gd = m.groupdict()
-                        ln = text[:m.start()].count('\n') + 1
-                        hdrs = gd.get('headers')
-                        if not hdrs and gd.get('headerName'):
-                            hdrs = {gd['headerName']: gd.get('headerValue')}
-                        if isinstance(hdrs, dict):
-                            hdrs = {k.lower(): v for k, v in hdrs.items()}
-
-                        results.append({
-                            'file':      rel,
-                            'line':      ln,
-                            'framework': framework,
-                            'method':    gd.get('method'),
-                            'endpoint':  gd.get('url'),
-                            'headers':   hdrs,
-                        })
+        maybe = _rules(lang).candidates(source.data)
 
+        for (regex, framework), possible in zip(HEADER_PATTERNS.get(lang, []), maybe):
+            if not possible:
+                continue
+            rule = '%s: %s' % (lang, framework)
+            for ln, _, gd in profiling.matches(source, regex, 'HEADER_PATTERNS', rule):
+                hdrs = gd.get('headers')
+                if not hdrs and gd.get('headerName'):
+                    hdrs = {gd['headerName']: gd.get('headerValue')}
+                if isinstance(hdrs, dict):
+                    hdrs = {k.lower(): v for k, v in hdrs.items()}
+
+                results.append({
+                    'file':      rel,
+                    'line':      ln,
+                    'framework': framework,
+                    'method':    gd.get('method'),
+                    'endpoint':  gd.get('url'),
+                    'headers':   hdrs,
+                })
         return results
 
+    def merge(self, path: str, rel: str, partial: List[Dict[str, Any]]) -> None:
+        if self.sink is None:
+            self._results.extend([row[name] for name, _ in HEADER_COLUMNS] for row in partial)
+            return
+        # как у эндпоинтов: находки файла — по номеру строки
+        for row in sorted(partial, key=lambda r: r['line']):
+            self.sink('header', row)
+
+    def unmerge(self, path: str, rel: str, partial: List[Dict[str, Any]]) -> bool:
+        if self.sink is not None:
+            return False
+        if partial:
+            self._results.discard('file', rel)
+        return True
+
+    def cache_key(self) -> Optional[str]:
+        return 'headers'
+
+    def finalize(self) -> FindingTable:
+        # порядок не зависит от порядка обхода — тот же, что у слияния --since
+        self._results.sort('file', 'line')
+        return self._results
+
     def confidence(self) -> float:
         return 1.0 if self.detect() else 0.0
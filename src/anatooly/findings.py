@@ -0,0 +1,200 @@
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# виды столбцов: путь (номер в общей таблице путей), целое, строка из общей
+# таблицы строк, произвольное значение (например, словарь заголовков)
+PATH, INT, STR, OBJ = 'path', 'int', 'str', 'obj'
+
+
+class _Ids(dict):
+    # строка -> номер; новая строка получает номер при первом обращении,
+    # поэтому map(ids.__getitem__, ...) нумерует столбец без цикла на Python
+    def __init__(self, values: List[Optional[str]]):
+        super().__init__({None: 0})
+        self.values = values
+
+    def __missing__(self, value: str) -> int:
+        n = self[value] = len(self.values)
+        self.values.append(value)
+        return n
+
+
+class Interner:
+    """Таблица строк: каждая хранится один раз, в столбцах — её номер.
+
+    Номер 0 — None.
+    """
+
+    def __init__(self):
+        self.values: List[Optional[str]] = [None]
+        self.ids: Dict[Optional[str], int] = _Ids(self.values)
+
+    def id(self, value: Optional[str]) -> int:
+        return self.ids[value]
+
+    def __getitem__(self, n: int) -> Optional[str]:
+        return self.values[n]
+
+    def __len__(self) -> int:
+        return len(self.values) - 1
+
+    def ranks(self) -> array:
+        # номер строки -> её место в сортировке: сравнение номеров вместо строк
+        order = sorted(range(1, len(self.values)), key=self.values.__getitem__)
+        out = array('I', bytes(4 * len(self.values)))
+        for place, n in enumerate(order, 1):
+            out[n] = place
+        return out
+
+
+class ResultStore:
+    """Общие для всех таблиц находок одного анализа пути и строки."""
+
+    def __init__(self):
+        self.paths = Interner()
+        self.strings = Interner()
+
+    def table(self, columns: Sequence[Tuple[str, str]]) -> 'FindingTable':
+        return FindingTable(columns, self)
+
+
+class FindingTable(Sequence):
+    """Находки одного вида по столбцам.
+
+    Путь файла хранится номером из общей таблицы путей, повторяющиеся
+    строки (фреймворк, метод, маршрут) — номерами из общей таблицы строк,
+    номера и строки файла — в массивах ``array``. Снаружи это по-прежнему
+    последовательность словарей ``{'file': ..., 'line': ..., ...}``:
+    строка-словарь собирается при обращении и нигде не хранится.
+    """
+
+    def __init__(self, columns: Sequence[Tuple[str, str]], store: Optional[ResultStore] = None):
+        self.store = store or ResultStore()
+        self.names = tuple(name for name, _ in columns)
+        self.kinds = tuple(kind for _, kind in columns)
+        self.data: List[Any] = [array('q') if kind == INT else array('I') if kind in (PATH, STR) else []
+                                for kind in self.kinds]
+
+    def _tables(self) -> List[Optional[Interner]]:
+        return [self.store.paths if kind == PATH else self.store.strings if kind == STR else None
+                for kind in self.kinds]
+
+    def append(self, row: Sequence[Any]) -> None:
+        """Добавляет находку; значения — в порядке столбцов."""
+        for column, table, value in zip(self.data, self._tables(), row):
+            column.append(table.ids[value] if table is not None else value)
+
+    def extend(self, rows: Iterable[Sequence[Any]]) -> None:
+        # по столбцу за раз: находки одного файла приходят пачкой
+        rows = list(rows)
+        if not rows:
+            return
+        for column, table, values in zip(self.data, self._tables(), zip(*rows)):
+            column.extend(values if table is None else map(table.ids.__getitem__, values))
+
+    def __len__(self) -> int:
+        return len(self.data[0])
+
+    def row(self, i: int) -> Tuple[Any, ...]:
+        return tuple(table[column[i]] if table is not None else column[i]
+                     for column, table in zip(self.data, self._tables()))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return dict(zip(self.names, self.row(i)))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        names = self.names
+        for row in self._rows():
+            yield dict(zip(names, row))
+
+    def _rows(self) -> Iterator[Tuple[Any, ...]]:
+        # строки таблицы кортежами: столбцы номеров — через map по таблице строк
+        columns = [column if table is None else map(table.values.__getitem__, column)
+                   for column, table in zip(self.data, self._tables())]
+        return zip(*columns)
+
+    def discard(self, name: str, value: Any) -> None:
+        """Убирает находки, у которых в столбце ``name`` — ``value`` (например, файл)."""
+        n = self.names.index(name)
+        table = self._tables()[n]
+        if table is not None:
+            value = table.ids.get(value)
+            if value is None:
+                return
+        column = self.data[n]
+        keep = [i for i, v in enumerate(column) if v != value]
+        if len(keep) == len(column):
+            return
+        self.data = [array(column.typecode, map(column.__getitem__, keep)) if isinstance(column, array)
+                     else list(map(column.__getitem__, keep)) for column in self.data]
+
+    def sort(self, *names: str) -> None:
+        """Упорядочивает находки по столбцам ``names`` (устойчиво, как sorted)."""
+        keys = []
+        for name in names:
+            n = self.names.index(name)
+            column, kind = self.data[n], self.kinds[n]
+            if kind in (PATH, STR):
+                ranks = (self.store.paths if kind == PATH else self.store.strings).ranks()
+                keys.append(list(map(ranks.__getitem__, column)))
+            else:
+                keys.append(column)
+        rows = list(zip(*keys))
+        order = sorted(range(len(self)), key=rows.__getitem__)
+        del rows, keys
+        self.data = [array(column.typecode, map(column.__getitem__, order)) if isinstance(column, array)
+                     else list(map(column.__getitem__, order)) for column in self.data]
+
+    def encoded(self, remap: Sequence[int]) -> Iterator[List[Any]]:
+        # строки для компактного JSON: путь — номером remap[свой номер]
+        columns = [map(remap.__getitem__, column) if kind == PATH
+                   else column if table is None else map(table.values.__getitem__, column)
+                   for column, kind, table in zip(self.data, self.kinds, self._tables())]
+        return map(list, zip(*columns))
+
+
+# разделы отчёта, которые хранятся таблицами находок
+SECTIONS = ('endpoints', 'ajax', 'headers')
+
+
+def compact(results: Dict[str, Any]) -> Tuple[List[str], Dict[str, Tuple[List[str], Iterator[List[Any]]]]]:
+    """Находки для --compact: общая таблица путей и по разделу (столбцы, строки).
+
+    В строках путь — номер в таблице путей (с нуля); строки отдаются
+    по одной, не собираясь в память.
+    """
+    paths = Interner()
+    sections: Dict[str, Tuple[List[str], Iterator[List[Any]]]] = {}
+    for key in SECTIONS:
+        value = results.get(key)
+        if isinstance(value, FindingTable):
+            remap = [-1] + [paths.id(p) - 1 for p in value.store.paths.values[1:]]
+            sections[key] = list(value.names), value.encoded(remap)
+        elif value is not None:
+            # обычный список словарей (например, после слияния --since)
+            names = list(value[0]) if value else []
+            rows = [[paths.id(row[name]) - 1 if name == 'file' else row.get(name) for name in names]
+                    for row in value]
+            sections[key] = names, iter(rows)
+    return paths.values[1:], sections
+
+
+def expand(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Обратно к строкам-словарям: прежний отчёт для --previous мог быть
+    записан с --compact (находки столбцами, в ``file`` — номер в ``paths``).
+    """
+    paths = report.get('paths')
+    if paths is None:
+        return report
+    out = {key: value for key, value in report.items() if key != 'paths'}
+    for key in SECTIONS:
+        section = out.get(key)
+        if isinstance(section, dict) and 'columns' in section:
+            names = section['columns']
+            out[key] = [{name: paths[value] if name == 'file' else value
+                         for name, value in zip(names, row)} for row in section['rows']]
+    return out
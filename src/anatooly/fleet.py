@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+# расширения отчётов по формату
+EXTENSIONS = {'json': '.json', 'jsonl': '.jsonl', 'html': '.html'}
+SUMMARY_NAME = 'fleet.json'
+
+
+def discover(target: str) -> List[str]:
+    """Репозитории для scan-many: подкаталоги ``target`` или строки списка.
+
+    В файле-списке — по пути на строку, пустые строки и ``#``-комментарии
+    пропускаются, относительные пути считаются от каталога списка.
+    """
+    if os.path.isdir(target):
+        return [os.path.join(target, name) for name in sorted(os.listdir(target))
+                if not name.startswith('.') and os.path.isdir(os.path.join(target, name))]
+    base = os.path.dirname(os.path.abspath(target))
+    repos = []
+    with open(target, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                repos.append(os.path.normpath(os.path.join(base, os.path.expanduser(line))))
+    return repos
+
+
+def report_names(repos: List[str]) -> List[str]:
+    # имя отчёта — имя каталога; одноимённые получают суффикс -2, -3, ...
+    seen: Counter = Counter()
+    names = []
+    for repo in repos:
+        name = os.path.basename(os.path.normpath(repo)) or 'repo'
+        seen[name] += 1
+        names.append(name if seen[name] == 1 else '%s-%d' % (name, seen[name]))
+    return names
+
+
+def repo_summary(name: str, repo: str, report: Optional[str], files: int,
+                 results: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка сводки по репозиторию из его отчёта."""
+    languages = {l: p for l, p in results['languages'].items() if l != 'Other'}
+    return {
+        'name': name,
+        'path': repo,
+        'report': report,
+        'files': files,
+        'sloc': results['sloc']['total'],
+        'main_language': max(languages, key=languages.get) if languages else None,
+        'languages': results['languages'],
+        'stack': {cat: sorted(items) for cat, items in results['stack'].items() if items},
+        'endpoints': len(results['endpoints']),
+        'ajax': len(results['ajax']),
+        'headers': len(results['headers']),
+        'secrets': len(results['secrets']),
+        'config_secrets': sum(len(values) for _, values in results['config_secrets']),
+        'timeouts': len(results['timeouts']),
+    }
+
+
+def fleet_summary(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводка по всем репозиториям: языки, стек и число эндпоинтов."""
+    ok = [r for r in rows if 'error' not in r]
+    languages: Dict[str, Dict[str, int]] = {}
+    stack: Dict[str, Counter] = {}
+    for row in ok:
+        for lang in row['languages']:
+            if lang != 'Other':
+                languages.setdefault(lang, {'repos': 0, 'main': 0})['repos'] += 1
+        if row['main_language']:
+            languages.setdefault(row['main_language'], {'repos': 0, 'main': 0})['main'] += 1
+        for cat, items in row['stack'].items():
+            stack.setdefault(cat, Counter()).update(items)
+    return {
+        'totals': {
+            'repos': len(rows),
+            'failed': len(rows) - len(ok),
+            'files': sum(r['files'] for r in ok),
+            'sloc': sum(r['sloc'] for r in ok),
+            'endpoints': sum(r['endpoints'] for r in ok),
+            'ajax': sum(r['ajax'] for r in ok),
+            'secrets': sum(r['secrets'] for r in ok),
+            'timeouts': sum(r['timeouts'] for r in ok),
+        },
+        # у скольких репозиториев есть язык и у скольких он основной
+        'languages': dict(sorted(languages.items(), key=lambda kv: (-kv[1]['repos'], kv[0]))),
+        # в скольких репозиториях найдена технология
+        'stack': {cat: dict(sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+                  for cat, counts in sorted(stack.items())},
+        'repos': rows,
+    }
+
+
+def _print_summary(summary: Dict[str, Any], out) -> None:
+    totals = summary['totals']
+    out.write('%-30s %8s %9s %-12s %9s\n' % ('репозиторий', 'файлов', 'SLOC', 'язык', 'эндпоинтов'))
+    for row in summary['repos']:
+        if 'error' in row:
+            out.write('%-30s ошибка: %s\n' % (row['name'][:30], row['error']))
+            continue
+        out.write('%-30s %8d %9d %-12s %9d\n' % (row['name'][:30], row['files'], row['sloc'],
+                                                 (row['main_language'] or '-')[:12], row['endpoints']))
+    out.write('\nвсего: %d репозиториев (ошибок: %d), %d файлов, %d SLOC, %d эндпоинтов\n' % (
+        totals['repos'], totals['failed'], totals['files'], totals['sloc'], totals['endpoints']))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .cli import ARCHIVE_DEPTH, READ_AHEAD, READ_AHEAD_MB, REGEX_TIMEOUT
+
+    parser = argparse.ArgumentParser(
+        prog='anatooly scan-many',
+        description='Анализ многих репозиториев за один запуск общим пулом рабочих процессов')
+    parser.add_argument('target', help='Каталог с репозиториями или файл со списком путей')
+    parser.add_argument(
+        '--output-dir', '-o',
+        default='anatooly-reports',
+        help='Куда писать отчёты по репозиториям и сводку %s (по умолчанию %%(default)s)' % SUMMARY_NAME
+    )
+    parser.add_argument(
+        '--format',
+        choices=sorted(EXTENSIONS),
+        default='json',
+        help='Формат отчёта по каждому репозиторию'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Число рабочих процессов на все репозитории (по умолчанию — все ядра)'
+    )
+    parser.add_argument('--cache-dir', help='Каталог для кэша результатов по файлам между запусками')
+    parser.add_argument('--no-ignore', action='store_true',
+                        help='Не пропускать ничего: ни встроенные каталоги, ни .gitignore/.anatooly-ignore')
+    parser.add_argument('--regex-timeout', type=float, default=REGEX_TIMEOUT, metavar='SECONDS',
+                        help='Бюджет времени на правила одного файла (0 — без ограничения)')
+    parser.add_argument('--read-ahead', type=int, default=READ_AHEAD, metavar='N',
+                        help='Сколько файлов читать одновременно наперёд (0 — читать по месту)')
+    parser.add_argument('--read-ahead-mb', type=float, default=READ_AHEAD_MB, metavar='MB',
+                        help='Сколько прочитанного наперёд может ждать анализа, МБ')
+    parser.add_argument('--archive-depth', type=int, default=ARCHIVE_DEPTH, metavar='N',
+                        help='Вложенность архивов, файлы которых сканируются без распаковки (0 — не открывать)')
+    args = parser.parse_args(argv)
+
+    from .analyzers.report_generator import ReportGenerator, _json_default
+    from .cache import ScanCache
+    from .cli import Analysis, make_read_ahead
+    from .ignore import IgnoreEngine
+    from .pipeline import FilePipeline
+    from .watchdog import GuardedScanner
+
+    try:
+        repos = discover(args.target)
+    except OSError as exc:
+        parser.error(str(exc))
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = ScanCache(args.cache_dir) if args.cache_dir else None
+    read_ahead = make_read_ahead(args)
+    rows: Dict[int, Dict[str, Any]] = {}
+    # начатые проходы: ScanPass -> (номер репозитория, Analysis)
+    started: Dict[Any, tuple] = {}
+
+    def finish(n: int, scan, analysis) -> None:
+        scan.finish()
+        results = analysis.results()
+        report = names[n] + EXTENSIONS[args.format]
+        ReportGenerator(args.format, os.path.join(args.output_dir, report),
+                        root=repos[n]).generate(results)
+        rows[n] = repo_summary(names[n], repos[n], report,
+                               len(analysis.pipeline.inventory.entries), results)
+
+    def fail(n: int, exc: Exception) -> None:
+        rows[n] = {'name': names[n], 'path': repos[n], 'error': '%s: %s' % (type(exc).__name__, exc)}
+
+    def passes() -> Iterator:
+        # репозитории готовятся по одному, когда рабочим нужны новые задачи
+        for n, repo in enumerate(repos):
+            try:
+                if not os.path.isdir(repo):
+                    raise FileNotFoundError('нет каталога %s' % repo)
+                ignore = IgnoreEngine(repo, rules=(), ignore_files=()) if args.no_ignore else IgnoreEngine(repo)
+                pipeline = FilePipeline(repo, jobs=args.jobs, cache=cache, ignore=ignore,
+                                        regex_timeout=args.regex_timeout, read_ahead=read_ahead,
+                                        archive_depth=args.archive_depth)
+                analysis = Analysis(repo, pipeline)
+                scan = pipeline.begin(analysis.visitors)
+                if not scan.tasks:
+                    finish(n, scan, analysis)
+                    continue
+            except Exception as exc:
+                fail(n, exc)
+                continue
+            started[scan] = n, analysis
+            yield scan
+
+    names = report_names(repos)
+    # без бюджета рабочие просто не ограничены по времени: пул всё равно общий
+    guard = GuardedScanner(args.jobs, args.regex_timeout or None, read_ahead)
+    for scan, result in guard.scan(passes()):
+        if scan not in started:
+            continue
+        n, analysis = started[scan]
+        if isinstance(result, Exception):
+            # упал визитёр на файле этого репозитория — остальные сканируются дальше
+            del started[scan]
+            fail(n, result)
+            continue
+        try:
+            scan.feed(result)
+            if not scan.pending:
+                del started[scan]
+                finish(n, scan, analysis)
+        except Exception as exc:
+            del started[scan]
+            fail(n, exc)
+    if cache:
+        cache.close()
+
+    summary = fleet_summary([rows[n] for n in sorted(rows)])
+    with open(os.path.join(args.output_dir, SUMMARY_NAME), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False, default=_json_default)
+        f.write('\n')
+    _print_summary(summary, sys.stdout)
+    return 1 if summary['totals']['failed'] else 0
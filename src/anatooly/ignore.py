@@ -0,0 +1,196 @@
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .patterns import DEFAULT_IGNORE
+
+# файлы с правилами в синтаксисе .gitignore, читаются в каждом каталоге
+IGNORE_FILES = ('.gitignore', '.anatooly-ignore')
+
+
+def _translate(glob: str) -> str:
+    # glob из .gitignore -> регулярка по пути с разделителем '/'
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        elif c == '[':
+            end = glob.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append('[%s]' % body)
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_rule(line: str, base: str = '') -> Optional[Tuple[str, bool, bool]]:
+    """Строка .gitignore -> (регулярка по пути от корня, отрицание, только каталоги).
+
+    ``base`` — каталог файла с правилами относительно корня сканирования.
+    """
+    line = line.rstrip('\n').rstrip('\r')
+    if not line.strip() or line.startswith('#'):
+        return None
+    # пробелы в конце значимы, только если экранированы
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    negate = line.startswith('!')
+    if negate:
+        line = line[1:]
+    elif line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+
+    prefix = re.escape(base + '/') if base else ''
+    if '/' in line:
+        # со слешем в начале или середине — путь от каталога файла правил
+        regex = prefix + _translate(line.lstrip('/'))
+    else:
+        regex = prefix + '(?:.*/)?' + _translate(line)
+    return regex, negate, dir_only
+
+
+def combine(patterns: Iterable['re.Pattern[str]']) -> 're.Pattern[str]':
+    """Список регулярок -> одна альтернация (search совпадает, если совпало любое)."""
+    parts = []
+    for p in patterns:
+        flags = ''.join(f for f, bit in (('i', re.IGNORECASE), ('m', re.MULTILINE),
+                                         ('s', re.DOTALL), ('x', re.VERBOSE)) if p.flags & bit)
+        parts.append('(?%s:%s)' % (flags, p.pattern))
+    return re.compile('|'.join(parts) or '(?!)')
+
+
+class _RuleFile:
+    # правила одного файла (или встроенные): одна альтернация в обратном
+    # порядке, первая совпавшая группа — последнее правило в файле
+    def __init__(self):
+        self.rules: List[Tuple[str, bool, bool]] = []
+        self._any = self._files = None
+        self._negate: List[bool] = []
+
+    def add(self, rules: List[Tuple[str, bool, bool]]) -> None:
+        self.rules.extend(rules)
+        ordered = self.rules[::-1]
+        # для каталогов годятся все правила, для файлов — без завершающего '/'
+        self._any = re.compile('|'.join('(%s)' % r for r, _, _ in ordered))
+        self._files = re.compile('|'.join('(%s)' % (r if not d else '(?!)') for r, _, d in ordered))
+        self._negate = [neg for _, neg, _ in ordered]
+
+    def match(self, rel: str, is_dir: bool) -> Optional[bool]:
+        # None — ни одно правило не совпало, иначе пропускать ли путь
+        m = (self._any if is_dir else self._files).fullmatch(rel)
+        return None if m is None else not self._negate[m.lastindex - 1]
+
+
+class IgnoreEngine:
+    """Какие пути пропускаются всеми стадиями сканирования.
+
+    Правила — встроенные (``DEFAULT_IGNORE``) и из ``.gitignore`` /
+    ``.anatooly-ignore`` в любом каталоге дерева. Правила каждого каталога
+    собраны в свою альтернацию и компилируются один раз, когда обход
+    доходит до каталога. Путь проверяется, как в git, по цепочке
+    каталогов-предков от ближайшего: решает первый файл правил, где
+    что-то совпало (в нём — последнее совпавшее правило, ``!`` возвращает
+    путь обратно), встроенные правила — последними. Каталоги отсекаются
+    целиком ещё при обходе (см. inventory.FileInventory), в них конвейер
+    не спускается.
+    """
+
+    def __init__(self, directory: str, rules: Iterable[str] = DEFAULT_IGNORE,
+                 ignore_files: Iterable[str] = IGNORE_FILES):
+        self.directory = directory
+        self.ignore_files = tuple(ignore_files)
+        self._defaults = _RuleFile()
+        # каталог относительно корня -> правила его файлов
+        self._by_dir: Dict[str, _RuleFile] = {}
+        self._loaded = set()
+        self._dirs: Dict[str, bool] = {}
+        defaults = [r for r in map(parse_rule, rules) if r]
+        if defaults:
+            self._defaults.add(defaults)
+
+    def add(self, lines: Iterable[str], base: str = '') -> None:
+        """Правила файла из каталога ``base`` (относительно корня)."""
+        rules = [r for r in (parse_rule(line, base) for line in lines) if r]
+        if rules:
+            rule_file = self._by_dir.get(base)
+            if rule_file is None:
+                rule_file = self._by_dir[base] = _RuleFile()
+            rule_file.add(rules)
+            self._dirs.clear()
+
+    def load(self, rel_dir: str) -> None:
+        # правила каталога читаются один раз, до проверки его содержимого
+        rel_dir = '' if rel_dir in ('', '.') else rel_dir.replace(os.sep, '/')
+        if rel_dir in self._loaded:
+            return
+        self._loaded.add(rel_dir)
+        for name in self.ignore_files:
+            path = os.path.join(self.directory, rel_dir, name)
+            try:
+                with open(path, encoding='utf-8', errors='ignore') as f:
+                    self.add(f.read().splitlines(), rel_dir)
+            except OSError:
+                continue
+
+    def ignored(self, rel: str, is_dir: bool = False) -> bool:
+        # решение только по самому пути; каталоги выше отсекает обход
+        # (FileInventory.scan) или inside_ignored
+        rel = rel.replace(os.sep, '/')
+        by_dir = self._by_dir
+        if by_dir:
+            # предки от ближайшего: 'a/b/c' -> 'a/b', 'a', ''
+            cut = len(rel)
+            while cut > 0:
+                cut = rel.rfind('/', 0, cut)
+                rule_file = by_dir.get(rel[:cut] if cut > 0 else '')
+                if rule_file is not None:
+                    hidden = rule_file.match(rel, is_dir)
+                    if hidden is not None:
+                        return hidden
+        if not self._defaults.rules:
+            return False
+        return bool(self._defaults.match(rel, is_dir))
+
+    def inside_ignored(self, rel: str) -> bool:
+        # лежит ли путь внутри пропускаемого каталога (для путей не из обхода)
+        parts = rel.replace(os.sep, '/').split('/')[:-1]
+        self.load('')
+        for i in range(1, len(parts) + 1):
+            rel_dir = '/'.join(parts[:i])
+            hidden = self._dirs.get(rel_dir)
+            if hidden is None:
+                hidden = self._dirs[rel_dir] = self.ignored(rel_dir, True)
+            if hidden:
+                return True
+            self.load(rel_dir)
+        return False
+
+    def excludes(self, rel: str, is_dir: bool = False) -> bool:
+        return self.inside_ignored(rel) or self.ignored(rel, is_dir)
+
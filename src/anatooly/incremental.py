@@ -0,0 +1,110 @@
+import os
+import subprocess
+from typing import Any, Dict, List, NamedTuple, Set
+
+
+class ChangeSet(NamedTuple):
+    changed: List[str]   # добавленные, изменённые и новые имена переименованных
+    deleted: List[str]   # удалённые и старые имена переименованных
+
+    @property
+    def touched(self) -> Set[str]:
+        return set(self.changed) | set(self.deleted)
+
+
+def _git(directory: str, *args: str) -> str:
+    out = subprocess.run(
+        ['git', '-C', directory] + list(args),
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    return out.stdout.decode('utf-8', errors='surrogateescape')
+
+
+def changed_files(directory: str, rev: str) -> ChangeSet:
+    """Файлы, изменившиеся в рабочем дереве относительно ревизии ``rev``.
+
+    Пути — относительно ``directory``, как ``rel`` в отчёте.
+    """
+    changed: List[str] = []
+    deleted: List[str] = []
+    diff = _git(directory, 'diff', '--name-status', '-M', '--relative', '-z', rev, '--')
+    fields = diff.split('\0')
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        if status[0] in 'RC':
+            old, new = fields[i + 1], fields[i + 2]
+            if status[0] == 'R':
+                deleted.append(old)
+            changed.append(new)
+            i += 3
+            continue
+        path = fields[i + 1]
+        (deleted if status[0] == 'D' else changed).append(path)
+        i += 2
+
+    untracked = _git(directory, 'ls-files', '--others', '--exclude-standard', '-z')
+    changed.extend(p for p in untracked.split('\0') if p)
+    return ChangeSet([os.path.normpath(p) for p in changed],
+                     [os.path.normpath(p) for p in deleted])
+
+
+def merge_report(previous: Dict[str, Any], delta: Dict[str, Any],
+                 touched: Set[str], directory: str) -> Dict[str, Any]:
+    """Вливает результаты по изменённым файлам в прежний отчёт.
+
+    Находки из затронутых файлов (изменённых, удалённых, переименованных)
+    убираются из прежнего отчёта и заменяются свежими. Сводные разделы
+    (языки, SLOC, стек, зависимости) по дельте не пересчитать — они берутся
+    из прежнего отчёта.
+    """
+    def is_touched(path: str) -> bool:
+        if os.path.isabs(path):
+            path = os.path.relpath(path, start=directory)
+        return os.path.normpath(path) in touched
+
+    merged = dict(previous)
+
+    endpoints = [r for r in previous.get('endpoints', []) if not is_touched(r['file'])]
+    endpoints.extend(delta.get('endpoints', []))
+    merged['endpoints'] = sorted(endpoints, key=lambda r: (r['file'], r['line']))
+
+    ajax = {(r['file'], r['line'], r['call']) for r in previous.get('ajax', [])
+            if not is_touched(r['file'])}
+    ajax.update((r['file'], r['line'], r['call']) for r in delta.get('ajax', []))
+    merged['ajax'] = [{'file': f, 'line': ln, 'call': url} for f, ln, url in sorted(ajax)]
+
+    headers = [r for r in previous.get('headers', []) if not is_touched(r['file'])]
+    headers.extend(delta.get('headers', []))
+    # ключ тот же, что у HeaderDetector.finalize
+    merged['headers'] = sorted(headers, key=lambda r: (r['file'], r['line']))
+
+    configs: Dict[str, List[str]] = {}
+    for tech, paths in previous.get('configs', {}).items():
+        keep = [p for p in paths if not is_touched(p)]
+        if keep:
+            configs[tech] = keep
+    for tech, paths in delta.get('configs', {}).items():
+        configs.setdefault(tech, []).extend(paths)
+    merged['configs'] = configs
+
+    merged['timeouts'] = [r for r in previous.get('timeouts', []) if not is_touched(r['file'])]
+    merged['timeouts'].extend(delta.get('timeouts', []))
+
+    # секреты сведены по отпечатку: разворачиваем их по местам, места в
+    # затронутых файлах выбрасываем и сводим заново вместе с дельтой
+    from .analyzers.secret_analyzer import group_places
+
+    def places(rows: List[Dict[str, Any]], keep: Any) -> List[Any]:
+        return [(path, line, row['rule'], row['value'], row['entropy'], row['fingerprint'])
+                for row in rows
+                for path, line in [(row['file'], row['line'])] + [tuple(d) for d in row['duplicates']]
+                if keep(path)]
+
+    merged['secrets'] = group_places(places(previous.get('secrets') or [], lambda path: not is_touched(path))
+                                     + places(delta.get('secrets', []), lambda path: True))
+
+    merged['config_secrets'] = [
+        list(item) for item in previous.get('config_secrets', []) if not is_touched(item[0])
+    ] + [list(item) for item in delta.get('config_secrets', [])]
+    return merged
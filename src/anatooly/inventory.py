@@ -0,0 +1,185 @@
+import fnmatch
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from . import archives
+from .ignore import IgnoreEngine
+from .patterns import LANG_EXTENSIONS
+
+# расширение/имя файла -> (порядок языка в LANG_EXTENSIONS, язык);
+# при совпадении и по расширению, и по имени побеждает язык, описанный раньше
+LANG_INDEX: Dict[str, Tuple[int, str]] = {}
+for _rank, (_language, _exts) in enumerate(LANG_EXTENSIONS.items()):
+    for _ext in _exts:
+        LANG_INDEX.setdefault(_ext.lower(), (_rank, _language))
+
+_OTHER = (len(LANG_EXTENSIONS), "Other")
+
+_MAGIC = re.compile(r'[*?[]')
+
+
+def classify(path: str) -> str:
+    filename = os.path.basename(path).lower()
+    ext = os.path.splitext(filename)[1]
+    by_ext = LANG_INDEX.get(ext, _OTHER) if ext else _OTHER
+    by_name = LANG_INDEX.get(filename, _OTHER)
+    return min(by_ext, by_name)[1]
+
+
+class FileEntry(NamedTuple):
+    path: str            # полный путь
+    rel: str             # путь от корня, как в отчёте
+    name: str
+    ext: str             # в нижнем регистре, с точкой
+    size: Optional[int]  # None, если stat не удался
+    lang: str
+
+
+def _entry(path: str, rel: str, size: Optional[int]) -> FileEntry:
+    name = os.path.basename(rel)
+    return FileEntry(path, rel, name, os.path.splitext(name)[1].lower(), size, classify(name))
+
+
+def _members(path: str, rel: str, ignore: IgnoreEngine, depth: int) -> Iterator[FileEntry]:
+    # члены архива — виртуальные файлы «архив!/член» сразу после него самого
+    if depth <= 0 or not archives.kind(path):
+        return
+    for inner, size in archives.members(path, depth):
+        member_rel = rel + archives.SEP + inner
+        if not ignore.excludes(member_rel):
+            yield _entry(path + archives.SEP + inner, member_rel, size)
+
+
+def _segment(pattern: str) -> 're.Pattern[str]':
+    # как у glob: '*' и '?' не подхватывают скрытые имена
+    regex = fnmatch.translate(pattern)
+    return re.compile(regex if pattern.startswith('.') else '(?!\\.)' + regex)
+
+
+def _match(parts: List[str], segs: List[str]) -> bool:
+    if not segs:
+        return not parts
+    if segs[0] == '**':
+        # ноль или больше каталогов (recursive=True у glob)
+        return any(_match(parts[i:], segs[1:]) for i in range(len(parts) + 1)
+                   if all(not p.startswith('.') for p in parts[:i]))
+    return bool(parts) and _segment(segs[0]).match(parts[0]) is not None \
+        and _match(parts[1:], segs[1:])
+
+
+class FileInventory:
+    """Все файлы дерева после одного обхода: путь, имя, расширение, размер, язык.
+
+    Индексы по имени, расширению и каталогу превращают файловые правила из
+    ``TECHNOLOGY_DETECTORS`` и ``CONFIG_PATTERNS`` в поиск по словарю вместо
+    glob и повторных обходов. Каталоги запоминаются все, включая отсечённые
+    правилами пропуска: их содержимое не смотрим, но само их наличие — факт.
+    С ``archive_depth`` больше 0 в опись попадают и файлы внутри архивов
+    (см. archives): читаются они прямо из архива, без распаковки на диск.
+    """
+
+    def __init__(self, directory: str, entries: List[FileEntry], dirs: Iterable[str]):
+        self.directory = directory
+        self.entries = entries
+        self.dirs: Set[str] = set(dirs)
+        self.by_rel: Dict[str, FileEntry] = {}
+        self.by_name: Dict[str, List[FileEntry]] = defaultdict(list)
+        self.by_ext: Dict[str, List[FileEntry]] = defaultdict(list)
+        self.by_dir: Dict[str, List[FileEntry]] = defaultdict(list)
+        self.subdirs: Dict[str, List[str]] = defaultdict(list)
+        for e in entries:
+            self.by_rel[e.rel] = e
+            self.by_name[e.name].append(e)
+            self.by_ext[e.ext].append(e)
+            self.by_dir[os.path.dirname(e.rel)].append(e)
+        for d in self.dirs:
+            self.subdirs[os.path.dirname(d)].append(d)
+
+    @classmethod
+    def scan(cls, directory: str, ignore: IgnoreEngine, archive_depth: int = 0) -> 'FileInventory':
+        # тот же порядок, что у os.walk (сверху вниз, без перехода по ссылкам
+        # на каталоги), но размер берётся из той же записи scandir
+        entries: List[FileEntry] = []
+        dirs: List[str] = []
+        stack = [('', directory)]
+        while stack:
+            rel_root, root = stack.pop()
+            ignore.load(rel_root)
+            try:
+                with os.scandir(root) as it:
+                    listing = list(it)
+            except OSError:
+                continue
+            walk_into = []
+            for item in listing:
+                rel = os.path.join(rel_root, item.name)
+                try:
+                    is_dir = item.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(rel)
+                    if not ignore.ignored(rel, True) and not item.is_symlink():
+                        walk_into.append((rel, item.path))
+                elif not ignore.ignored(rel):
+                    try:
+                        size = item.stat().st_size
+                    except OSError:
+                        size = None
+                    entries.append(_entry(item.path, rel, size))
+                    entries.extend(_members(item.path, rel, ignore, archive_depth))
+            stack.extend(reversed(walk_into))
+        return cls(directory, entries, dirs)
+
+    @classmethod
+    def from_paths(cls, directory: str, rels: Iterable[str], ignore: IgnoreEngine,
+                   archive_depth: int = 0) -> 'FileInventory':
+        entries: List[FileEntry] = []
+        dirs: Set[str] = set()
+        for rel in rels:
+            path = os.path.join(directory, rel)
+            if not os.path.isfile(path) or ignore.excludes(rel):
+                continue
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                size = None
+            entries.append(_entry(path, rel, size))
+            entries.extend(_members(path, rel, ignore, archive_depth))
+            parent = os.path.dirname(rel)
+            while parent:
+                dirs.add(parent)
+                parent = os.path.dirname(parent)
+        return cls(directory, entries, dirs)
+
+    def find_first(self, name: str) -> Optional[FileEntry]:
+        found = self.by_name.get(name)
+        return found[0] if found else None
+
+    def glob(self, pattern: str) -> List[Tuple[str, bool]]:
+        """(полный путь, каталог ли) для путей, подходящих под glob от корня."""
+        pattern = pattern.replace(os.sep, '/').strip('/')
+        if not _MAGIC.search(pattern):
+            rel = os.path.normpath(pattern)
+            if rel in self.by_rel:
+                return [(self.by_rel[rel].path, False)]
+            if rel in self.dirs:
+                return [(os.path.join(self.directory, rel), True)]
+            return []
+
+        segs = pattern.split('/')
+        if '**' not in segs and not any(_MAGIC.search(s) for s in segs[:-1]):
+            # магия только в последнем сегменте — смотрим один каталог
+            parent = os.path.join(*segs[:-1]) if len(segs) > 1 else ''
+            name = _segment(segs[-1])
+            found = [(e.path, False) for e in self.by_dir.get(parent, ()) if name.match(e.name)]
+            found += [(os.path.join(self.directory, d), True) for d in self.subdirs.get(parent, ())
+                      if name.match(os.path.basename(d))]
+            return found
+
+        found = [(e.path, False) for e in self.entries if _match(e.rel.split(os.sep), segs)]
+        found += [(os.path.join(self.directory, d), True) for d in self.dirs
+                  if _match(d.split(os.sep), segs)]
+        return found
@@ -0,0 +1,146 @@
+import re
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Set
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+try:
+    import ahocorasick  # pyahocorasick необязателен
+except ImportError:
+    ahocorasick = None
+
+# литералы короче этого почти в каждом файле — фильтр из них бесполезен
+MIN_LITERAL = 3
+# без учёта регистра буфер просматривается кусками такого размера
+CHUNK = 1024 * 1024
+
+_LITERAL = sre_constants.LITERAL
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_REPEATS.add(getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT))
+_ATOMIC = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+
+def _better(a: Optional[FrozenSet[str]], b: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    # лучше тот набор, у которого самый короткий литерал длиннее
+    if not b:
+        return a
+    if not a:
+        return b
+    key = lambda s: (min(map(len, s)), -len(s))
+    return b if key(b) > key(a) else a
+
+
+def _required(seq) -> Optional[FrozenSet[str]]:
+    best = None
+    run: List[str] = []
+    for op, av in list(seq) + [(None, None)]:
+        if op is _LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            best = _better(best, frozenset([''.join(run)]))
+            run = []
+        candidate = None
+        if op is _SUBPATTERN:
+            candidate = _required(av[-1])
+        elif _ATOMIC is not None and op is _ATOMIC:
+            candidate = _required(av)
+        elif op is _BRANCH:
+            alternatives = [_required(branch) for branch in av[1]]
+            if all(alternatives):
+                candidate = frozenset().union(*alternatives)
+        elif op in _REPEATS and av[0] >= 1:
+            candidate = _required(av[2])
+        best = _better(best, candidate)
+    return best
+
+
+def required_literals(regex: 're.Pattern') -> Optional[FrozenSet[str]]:
+    """Литералы, хотя бы один из которых есть в любом совпадении ``regex``.
+
+    Без учёта регистра (так фильтр остаётся надмножеством и для правил с
+    (?i)). None — такого набора нет или он слишком короткий, чтобы отсеивать.
+    """
+    pattern = regex.pattern
+    if isinstance(pattern, bytes):
+        pattern = pattern.decode('latin-1')
+    try:
+        found = _required(sre_parse.parse(pattern, regex.flags & ~re.UNICODE & ~re.ASCII))
+    except Exception:
+        return None
+    if not found or min(map(len, found)) < MIN_LITERAL or not all(s.isascii() for s in found):
+        return None
+    return frozenset(s.lower() for s in found)
+
+
+class LiteralMatcher:
+    """Какие из литералов встречаются в буфере — за один проход.
+
+    С pyahocorasick — автомат Ахо–Корасик, один проход по буферу. Без него
+    каждый литерал ищется через bytes.find: в CPython это быстрее и
+    регулярки-альтернации, и поиска с re.IGNORECASE. Без учёта регистра
+    буфер приводится к нижнему регистру кусками, с перекрытием на длину
+    литерала, так что mmap целиком в память не копируется.
+    """
+
+    def __init__(self, literals: Iterable[str], nocase: bool = False):
+        # nocase — только для ASCII-литералов (регистр сравнивается по байтам)
+        self.nocase = nocase
+        self.literals: List[str] = sorted({s.lower() if nocase else s for s in literals if s},
+                                          key=lambda s: (-len(s), s))
+        self._needles = [(s, s.encode('utf-8')) for s in self.literals]
+        self._overlap = max((len(b) for _, b in self._needles), default=1) - 1
+        self._automaton = None
+        if self.literals and ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for s in self.literals:
+                self._automaton.add_word(s.encode('utf-8').decode('latin-1'), s)
+            self._automaton.make_automaton()
+
+    def hits(self, data) -> Set[str]:
+        found: Set[str] = set()
+        if not self.literals:
+            return found
+        total = len(self.literals)
+        if self._automaton is not None:
+            # latin-1 — байт в символ без ошибок декодирования
+            haystack = str(data, 'latin-1')
+            if self.nocase:
+                haystack = haystack.lower()
+            for _, s in self._automaton.iter(haystack):
+                found.add(s)
+                if len(found) == total:
+                    break
+            return found
+
+        if not self.nocase:
+            return {s for s, needle in self._needles if data.find(needle) != -1}
+        missing = self._needles
+        for start in range(0, max(len(data), 1), CHUNK):
+            chunk = data[start:start + CHUNK + self._overlap].lower()
+            missing = [(s, needle) for s, needle in missing if chunk.find(needle) == -1]
+            if not missing:
+                break
+        return {s for s, _ in self._needles} - {s for s, _ in missing}
+
+
+class RuleSet:
+    """Набор регулярок с общим префильтром по их обязательным литералам.
+
+    Правило без подходящих литералов выполняется всегда; остальные — только
+    если в файле нашёлся хотя бы один их литерал.
+    """
+
+    def __init__(self, regexes: Sequence['re.Pattern']):
+        self.regexes = list(regexes)
+        self.required = [required_literals(r) for r in self.regexes]
+        self.matcher = LiteralMatcher(set().union(*(r for r in self.required if r)), nocase=True)
+
+    def candidates(self, data) -> List[bool]:
+        hits = self.matcher.hits(data)
+        return [need is None or not need.isdisjoint(hits) for need in self.required]
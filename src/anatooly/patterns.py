@@ -1,284 +1,350 @@
 # Здесь определяются все шаблоны и регулярные выражения
 import re
+from typing import Any, Dict, Iterator, Mapping, NamedTuple
+
+
+class Regex(NamedTuple):
+    """Правило, которое ещё не скомпилировано (см. compile_rules)."""
+    pattern: str
+    flags: int = 0
+
+
+def compile_rules(value: Any) -> Any:
+    # та же структура, но вместо Regex — скомпилированные регулярки
+    if isinstance(value, Regex):
+        return re.compile(value.pattern, value.flags)
+    if isinstance(value, dict):
+        return {k: compile_rules(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value)(compile_rules(v) for v in value)
+    return value
+
+
+class LazyTable(Mapping):
+    """Таблица правил, в которой правила ключа компилируются при первом обращении к нему.
+
+    Проверка ``key in table`` и перебор ключей ничего не компилируют, так что
+    импорт модуля дешёвый, а при сканировании компилируются правила только
+    тех языков и технологий, которые действительно понадобились.
+    """
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = dict(raw)
+        self._compiled: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self._compiled[key]
+        except KeyError:
+            value = self._compiled[key] = compile_rules(self.raw[key])
+            return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.raw
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.raw)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def update(self, raw: Dict[str, Any]) -> None:
+        self.raw.update(raw)
+        for key in raw:
+            self._compiled.pop(key, None)
+
+
+# каталоги, в которые обход не спускается ни для одной стадии (синтаксис
+# .gitignore); дополняются .gitignore и .anatooly-ignore из самого проекта.
+# dist/ и vendor/ здесь нет намеренно: это обычные имена и для исходников
+# (vendor/ в Go, собранный dist/ — иногда единственный JS в репозитории),
+# а языки, стек, конфиги и секреты их всегда читали. Эндпоинты и заголовки
+# в них по-прежнему не ищутся — см. ENDPOINT_IGNORE_FILE_PATTERNS
+DEFAULT_IGNORE = [
+    '.git/', '.hg/', '.svn/',
+    'node_modules/', 'bower_components/',
+    '__pycache__/', '.mypy_cache/', '.pytest_cache/', '.tox/',
+    '.next/', '.nuxt/',
+]
 
 ENDPOINT_IGNORE_FILE_PATTERNS = [
-    re.compile(r'\b__tests__\b', re.IGNORECASE),
-    re.compile(r'\b__mocks__\b', re.IGNORECASE),
-    re.compile(r'\btest(s|ing)?\b', re.IGNORECASE),
-    re.compile(r'\.test\.(js|ts)x?$', re.IGNORECASE),
-    re.compile(r'\.(spec|e2e)\.(js|ts)x?$', re.IGNORECASE),
-    re.compile(r'\bnode_modules\b'),
-    re.compile(r'\bvendor\b'),
-    re.compile(r'\bdist\b'),
-    re.compile(r'\bbuild\b'),
-    re.compile(r'\bcoverage\b'),
-    re.compile(r'\b\.git\b'),
-    re.compile(r'\b\.next\b'),
-    re.compile(r'\b\.nuxt\b'),
-    re.compile(r'\bpublic\b'),
-    re.compile(r'\bfixtures?\b'),
-    re.compile(r'\bconfig\b'),
-    re.compile(r'\bconfigs?\b'),
-    re.compile(r'\b\.circleci\b'),
-    re.compile(r'\bjenkins\b', re.IGNORECASE),
-    re.compile(r'_test\.go$', re.IGNORECASE),       
-    re.compile(r'Tests?\.cs$', re.IGNORECASE),      
-    re.compile(r'.*Test\.java$', re.IGNORECASE),   
-    re.compile(r'\.Tag\.Get\('), 
-    re.compile(r'\.min\.js$', re.IGNORECASE),                   
+    Regex(r'\b__tests__\b', re.IGNORECASE),
+    Regex(r'\b__mocks__\b', re.IGNORECASE),
+    Regex(r'\btest(s|ing)?\b', re.IGNORECASE),
+    Regex(r'\.test\.(js|ts)x?$', re.IGNORECASE),
+    Regex(r'\.(spec|e2e)\.(js|ts)x?$', re.IGNORECASE),
+    Regex(r'\bnode_modules\b'),
+    Regex(r'\bvendor\b'),
+    Regex(r'\bdist\b'),
+    Regex(r'\bbuild\b'),
+    Regex(r'\bcoverage\b'),
+    Regex(r'\b\.git\b'),
+    Regex(r'\b\.next\b'),
+    Regex(r'\b\.nuxt\b'),
+    Regex(r'\bpublic\b'),
+    Regex(r'\bfixtures?\b'),
+    Regex(r'\bconfig\b'),
+    Regex(r'\bconfigs?\b'),
+    Regex(r'\b\.circleci\b'),
+    Regex(r'\bjenkins\b', re.IGNORECASE),
+    Regex(r'_test\.go$', re.IGNORECASE),       
+    Regex(r'Tests?\.cs$', re.IGNORECASE),      
+    Regex(r'.*Test\.java$', re.IGNORECASE),   
+    Regex(r'\.Tag\.Get\('), 
+    Regex(r'\.min\.js$', re.IGNORECASE),                   
 ]
 
-ENDPOINT_PATTERNS = {
+ENDPOINT_PATTERNS = LazyTable({
     "Java": [
         # Spring MVC / Spring Boot / Kotlin — группа 1=аннотация, 2=путь
-        (re.compile(
+        (Regex(
             r'@(?P<ann>RequestMapping|GetMapping|PostMapping|PutMapping|DeleteMapping|PatchMapping)'
             r'\s*\(\s*(?:path\s*=\s*|value\s*=\s*)?["\']([^"\']+)["\']'
             r'(?:\s*,[^\)]*)?\)'
         ), "Spring MVC"),
     
         # JAX-RS @Path
-        (re.compile(r'@Path\s*\(\s*["\']([^"\']+)["\']\s*\)'), "JAX-RS"),
+        (Regex(r'@Path\s*\(\s*["\']([^"\']+)["\']\s*\)'), "JAX-RS"),
     
         # Vaadin @Route(path = "…")
-        (re.compile(
+        (Regex(
             r'@Route\s*\(\s*path\s*=\s*["\']([^"\']+)["\']\s*\)'
         ), "Vaadin"),
     ],
 
     "C#": [
     # ASP.NET Core атрибуты [HttpGet("/…")]
-        (re.compile(
+        (Regex(
             r'\[(?:HttpGet|HttpPost|HttpPut|HttpDelete|HttpPatch|Route)'
             r'\s*\(\s*["\']([^"\']+)["\']\s*\)\]'
         ), "ASP.NET Core"),
 
         # ASP.NET Core Minimal API MapGet("/…", …)
-        (re.compile(
+        (Regex(
             r'Map(?:Get|Post|Put|Delete|Patch)\s*\(\s*["\']([^"\']+)["\']\s*,'
         ), "ASP.NET Core Minimal"),
 
         # Classic ASP.NET [Route("…")]
-        (re.compile(
+        (Regex(
             r'\[Route\s*\(\s*["\']([^"\']+)["\']\s*\)\]'
         ), "ASP.NET Route"),
     ],
     "Rust": [
         # Actix-Web / Rocket атрибуты #[get("/…")]
-        (re.compile(r'#\[(?:get|post|put|delete|patch)\s*\(\s*["\']([^"\']+)["\']\s*\)\]'), "Rust HTTP"),
+        (Regex(r'#\[(?:get|post|put|delete|patch)\s*\(\s*["\']([^"\']+)["\']\s*\)\]'), "Rust HTTP"),
     ], 
     "Kotlin": [
         # Ktor DSL внутри routing { get("…") }
-        (re.compile(
+        (Regex(
             r'\brouting\s*\{[^\}]*?get\s*\(\s*["\']([^"\']+)["\']'
         ), "Ktor routing"),
     ],
     "Python": [
         # Flask / FastAPI декораторы @app.route("/…")
-        (re.compile(
+        (Regex(
             r'@(?:app|bp|api|router)\.(?P<method>get|post|put|delete|patch)'
             r'\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Flask/FastAPI"),
     
         # Django path(...) — метод по умолчанию GET
-        (re.compile(
+        (Regex(
             r'\bpath\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Django path"),
 
-        (re.compile(r'\burl\s*\(\s*r?["\']([^"\']+)["\']'), "Django url"),
+        (Regex(r'\burl\s*\(\s*r?["\']([^"\']+)["\']'), "Django url"),
         # Django url()/re_path() — тоже GET
-        (re.compile(
+        (Regex(
             r'\burl\s*\(\s*r?["\'](?P<path>[^"\']+)["\']'
         ), "Django url"),
     ],
     "JavaScript": [
         # Express: app.get("/…") / router.post("/…")
-        (re.compile(
+        (Regex(
             r'\b(?:app|router)\.(?P<method>get|post|put|delete|patch|all)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Express"),
 
         # Express-цепочки router.route("/…").get(…)…
-        (re.compile(
+        (Regex(
             r'router\.route\s*\(\s*["\']([^"\']+)["\']\)\s*'
             r'(?:\.\s*(?:get|post|put|delete|patch)\s*\()'
         ), "Express"),
 
         # NestJS декораторы @Controller / @Get() / @Post() …
-        (re.compile(
+        (Regex(
             r'@(?:Controller|Get|Post|Put|Delete|Patch)\(\s*["\']([^"\']*)["\']\s*\)'
         ), "NestJS"),
 
         # jQuery AJAX: $.ajax({url: "…"})
-        (re.compile(
+        (Regex(
             r'\b(?:\$\.ajax|jQuery\.ajax)\s*\(\s*{[^}]*url\s*:\s*["\']([^"\']+)["\']'
         ), "jQuery AJAX"),
-        (re.compile(
+        (Regex(
             r'\b\$(?:\s*\.\s*)?(?P<method>get|post|ajax)\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "jQuery AJAX"),
 
         # Axios: метод + URL
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?axios\.(?P<method>get|post|put|delete|patch)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Axios"),
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?fetch\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Fetch API"),
         # XMLHttpRequest: xhr.open("METHOD", "/…", …)
-        (re.compile(
+        (Regex(
             r'\bxhr\.open\(\s*["\'](?P<method>GET|POST|PUT|DELETE|PATCH)["\']\s*,\s*["\'](?P<path>[^"\']+)["\']'
         ), "XMLHttpRequest"),
         # AngularJS ($http)
-        (re.compile(
+        (Regex(
             r"\b\$http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "AngularJS"),
 
         # Modern Angular (HttpClient)
-        (re.compile(
+        (Regex(
             r"\bthis\.http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "Angular HttpClient"),
     ],
     "TypeScript": [
         # Express: app.get("/…") / router.post("/…")
-        (re.compile(
+        (Regex(
             r'\b(?:app|router)\.(?P<method>get|post|put|delete|patch|all)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Express"),
 
         # Express-цепочки router.route("/…").get(…)…
-        (re.compile(
+        (Regex(
             r'router\.route\s*\(\s*["\']([^"\']+)["\']\)\s*'
             r'(?:\.\s*(?:get|post|put|delete|patch)\s*\()'
         ), "Express"),
 
         # NestJS декораторы @Controller / @Get() / @Post() …
-        (re.compile(
+        (Regex(
             r'@(?:Controller|Get|Post|Put|Delete|Patch)\(\s*["\']([^"\']*)["\']\s*\)'
         ), "NestJS"),
 
         # jQuery AJAX: $.ajax({url: "…"})
-        (re.compile(
+        (Regex(
             r'\b(?:\$\.ajax|jQuery\.ajax)\s*\(\s*{[^}]*url\s*:\s*["\']([^"\']+)["\']'
         ), "jQuery AJAX"),
-        (re.compile(
+        (Regex(
             r'\b\$(?:\s*\.\s*)?(?P<method>get|post|ajax)\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "jQuery AJAX"),
 
         # Axios: метод + URL
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?axios\.(?P<method>get|post|put|delete|patch)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Axios"),
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?fetch\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Fetch API"),
         # XMLHttpRequest: xhr.open("METHOD", "/…", …)
-        (re.compile(
+        (Regex(
             r'\bxhr\.open\(\s*["\'](?P<method>GET|POST|PUT|DELETE|PATCH)["\']\s*,\s*["\'](?P<path>[^"\']+)["\']'
         ), "XMLHttpRequest"),
         # AngularJS ($http)
-        (re.compile(
+        (Regex(
             r"\b\$http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "AngularJS"),
 
         # Modern Angular (HttpClient)
-        (re.compile(
+        (Regex(
             r"\bthis\.http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "Angular HttpClient"),
     ],
     "JavaScript/TypeScript": [
         # Express: app.get("/…") / router.post("/…")
-        (re.compile(
+        (Regex(
             r'\b(?:app|router)\.(?P<method>get|post|put|delete|patch|all)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Express"),
 
         # Express-цепочки router.route("/…").get(…)…
-        (re.compile(
+        (Regex(
             r'router\.route\s*\(\s*["\']([^"\']+)["\']\)\s*'
             r'(?:\.\s*(?:get|post|put|delete|patch)\s*\()'
         ), "Express"),
 
         # NestJS декораторы @Controller / @Get() / @Post() …
-        (re.compile(
+        (Regex(
             r'@(?:Controller|Get|Post|Put|Delete|Patch)\(\s*["\']([^"\']*)["\']\s*\)'
         ), "NestJS"),
 
         # jQuery AJAX: $.ajax({url: "…"})
-        (re.compile(
+        (Regex(
             r'\b(?:\$\.ajax|jQuery\.ajax)\s*\(\s*{[^}]*url\s*:\s*["\']([^"\']+)["\']'
         ), "jQuery AJAX"),
-        (re.compile(
+        (Regex(
             r'\b\$(?:\s*\.\s*)?(?P<method>get|post|ajax)\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "jQuery AJAX"),
 
         # Axios: метод + URL
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?axios\.(?P<method>get|post|put|delete|patch)'
             r'\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Axios"),
-        (re.compile(
+        (Regex(
             r'\b(?:await\s+)?fetch\s*\(\s*["\'](?P<path>[^"\']+)["\']'
         ), "Fetch API"),
         # XMLHttpRequest: xhr.open("METHOD", "/…", …)
-        (re.compile(
+        (Regex(
             r'\bxhr\.open\(\s*["\'](?P<method>GET|POST|PUT|DELETE|PATCH)["\']\s*,\s*["\'](?P<path>[^"\']+)["\']'
         ), "XMLHttpRequest"),
         # AngularJS ($http)
-        (re.compile(
+        (Regex(
             r"\b\$http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "AngularJS"),
 
         # Modern Angular (HttpClient)
-        (re.compile(
+        (Regex(
             r"\bthis\.http\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]"
         ), "Angular HttpClient"),
     ],
 
     "Ruby": [
         # Rails DSL в config/routes.rb
-        (re.compile(r'\b(get|post|put|delete|patch|match)\s+["\']([^"\']+)["\']', re.IGNORECASE), "Rails"),
+        (Regex(r'\b(get|post|put|delete|patch|match)\s+["\']([^"\']+)["\']', re.IGNORECASE), "Rails"),
         # Sinatra
-        (re.compile(r'\b(?:get|post|put|delete|patch)\s+["\']([^"\']+)["\']'), "Sinatra"),
+        (Regex(r'\b(?:get|post|put|delete|patch)\s+["\']([^"\']+)["\']'), "Sinatra"),
     ],
 
     "PHP": [
         # Laravel Route::get/post/…
-        (re.compile(r'Route::(?:get|post|put|delete|patch|any)\s*\(\s*["\']([^"\']+)["\']'), "Laravel"),
+        (Regex(r'Route::(?:get|post|put|delete|patch|any)\s*\(\s*["\']([^"\']+)["\']'), "Laravel"),
         # Laravel группы prefix/middleware/namespace -> group
-        (re.compile(
+        (Regex(
             r'Route::(?:prefix|middleware|namespace)\s*\(\s*["\']([^"\']+)["\']\)\s*->\s*group\s*\('
         ), "Laravel group"),
         # Laravel resource
-        (re.compile(r'Route::resource\s*\(\s*["\']([^"\']+)["\']\)'), "Laravel resource"),
+        (Regex(r'Route::resource\s*\(\s*["\']([^"\']+)["\']\)'), "Laravel resource"),
         # Symfony аннотация @Route("/…")
-        (re.compile(r'@Route\s*\(\s*["\']([^"\']+)["\']\s*\)'), "Symfony"),
+        (Regex(r'@Route\s*\(\s*["\']([^"\']+)["\']\s*\)'), "Symfony"),
     ],
 
     # Go (net/http, Gorilla Mux и Gin)
     "Go": [
         # Gin: router.GET("/…")
-        (re.compile(
+        (Regex(
             r'\b(?:router|engine)\.(GET|POST|PUT|PATCH|DELETE|OPTIONS|HEAD)'
             r'\s*\(\s*["\']([^"\']+)["\']'
         ), "Gin"),
 
         # net/http.HandleFunc("/…") и Handle("/…")
-        (re.compile(r'\bhttp\.(?:HandleFunc|Handle)\(\s*["\']([^"\']+)["\']'), "net/http"),
+        (Regex(r'\bhttp\.(?:HandleFunc|Handle)\(\s*["\']([^"\']+)["\']'), "net/http"),
 
         # Gorilla Mux: router.HandleFunc("/…")
-        (re.compile(
+        (Regex(
             r'\brouter\.(?:HandleFunc|GET|POST|PUT|DELETE|PATCH)\s*\(\s*["\']([^"\']+)["\']'
         ), "Gorilla Mux"),
     ],
-}
-AJAX_PATTERN = re.compile(
+})
+AJAX_PATTERN = Regex(
     r"(?:XMLHttpRequest|fetch|\$\.ajax)\([^)]+['\"]([^'\"]+)['\"]\)"
     r"|\." 
     r"ajax\([^)]+['\"]([^'\"]+)['\"]\)"
 )
-AJAX_PATTERN_EXT = re.compile(
+AJAX_PATTERN_EXT = Regex(
     r"(?:\b(?:await\s+)?fetch\(\s*['\"]([^'\"]+)['\"]\s*\))"
     # Axios (axios.get/post/… и универсальный axios({ url: … }))
     r"|(?:\b(?:await\s+)?axios\.(?:get|post|put|delete|patch)\(\s*['\"]([^'\"]+)['\"](?:\s*,[^)]*)?\))"
@@ -295,14 +361,62 @@ AJAX_PATTERN_EXT = re.compile(
     # Modern Angular HttpClient:
     r"|(?:\bthis\.http\.(?:get|post|put|delete|patch)\(\s*['\"]([^'\"]+)['\"](?:\s*,[^)]*)?\))"
 )
-PASSWORD_PATTERN = re.compile(r"(password|secret|token|apikey|access_key|client_secret)\s*[:=]\s*['\"]?([a-zA-Z0-9_!@#$%^&*()]+)['\"]?")
+PASSWORD_PATTERN = Regex(r"(password|secret|token|apikey|access_key|client_secret)\s*[:=]\s*['\"]?([a-zA-Z0-9_!@#$%^&*()]+)['\"]?")
+
+# Токены сервисов по их формату (см. analyzers.secret_analyzer): первая
+# группа — сам секрет. У правил есть обязательный литерал (префикс токена),
+# по нему правило отсеивается до запуска. Граница слова проверяется после
+# префикса — (?<=\bSK), а не \bSK: тогда re ищет совпадение по литералу,
+# а не пробует каждую позицию файла (на порядок быстрее)
+SECRET_PATTERNS = LazyTable({
+    "aws-access-key-id":      Regex(r"(A(?<=\bA)(?:KIA|SIA|BIA|CCA)[0-9A-Z]{16})\b"),
+    "aws-secret-access-key":  Regex(r"aws_?secret_?(?:access_?)?key\w*['\"]?\s*[:=][=>]?\s*['\"]?([A-Za-z0-9/+]{40})(?![A-Za-z0-9/+])",
+                                    re.IGNORECASE),
+    "github-token":           Regex(r"(gh[pousr]_(?<=\bgh._)[0-9A-Za-z]{36})\b"),
+    "github-fine-grained-pat": Regex(r"(github_pat_(?<=\bgithub_pat_)[0-9A-Za-z_]{82})\b"),
+    "gitlab-token":           Regex(r"(gl(?<=\bgl)(?:pat|dt|ptt|rt)-[0-9A-Za-z_\-]{20,})\b"),
+    "slack-token":            Regex(r"(xox(?<=\bxox)[abposr]-[0-9A-Za-z\-]{10,})"),
+    "slack-webhook":          Regex(r"(https://hooks\.slack\.com/(?:services|workflows)/[A-Za-z0-9+/]{40,})"),
+    # префиксы целиком: иначе обязательный литерал — «test», он есть везде
+    "stripe-key":             Regex(r"\b((?:sk_live|sk_test|rk_live|rk_test)_[0-9A-Za-z]{24,})\b"),
+    "google-api-key":         Regex(r"(AIza(?<=\bAIza)[0-9A-Za-z_\-]{35})(?![0-9A-Za-z_\-])"),
+    "openai-api-key":         Regex(r"(sk-(?<=\bsk-)(?:proj-|svcacct-|admin-)?[A-Za-z0-9_\-]{20,}T3BlbkFJ[A-Za-z0-9_\-]{20,})"),
+    "anthropic-api-key":      Regex(r"(sk-ant-(?<=\bsk-ant-)(?:api|admin)\d\d-[A-Za-z0-9_\-]{80,})"),
+    "npm-token":              Regex(r"(npm_(?<=\bnpm_)[A-Za-z0-9]{36})\b"),
+    "pypi-token":             Regex(r"(pypi-AgEIcHlwaS5vcmc[A-Za-z0-9_\-]{50,})"),
+    "sendgrid-api-key":       Regex(r"(SG\.(?<=\bSG\.)[A-Za-z0-9_\-]{22}\.[A-Za-z0-9_\-]{43})(?![A-Za-z0-9_\-])"),
+    "twilio-api-key":         Regex(r"(SK(?<=\bSK)[0-9a-f]{32})\b"),
+    "mailgun-api-key":        Regex(r"(key-(?<=\bkey-)[0-9a-f]{32})\b"),
+    "shopify-token":          Regex(r"(shp(?<=\bshp)(?:at|ca|pa|ss)_[0-9a-fA-F]{32})\b"),
+    "digitalocean-token":     Regex(r"(do(?<=\bdo)[opr]_v1_[0-9a-f]{64})\b"),
+    "telegram-bot-token":     Regex(r"\b(\d{8,10}:AA[0-9A-Za-z_\-]{33})(?![0-9A-Za-z_\-])"),
+    "azure-storage-key":      Regex(r"AccountKey=([A-Za-z0-9+/]{86}==)"),
+    "jwt":                    Regex(r"(eyJ(?<=\beyJ)[A-Za-z0-9_\-]{10,}\.eyJ[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,})"),
+    "private-key":            Regex(r"(-----BEGIN (?:[A-Z]+ )*PRIVATE KEY(?: BLOCK)?-----[A-Za-z0-9+/=\s:,\-]{32,}?-----END (?:[A-Z]+ )*PRIVATE KEY(?: BLOCK)?-----)"),
+    # схема://пользователь:пароль@хост — поиск от «://»
+    "url-credentials":        Regex(r"://[^\s:@/'\"`]{1,64}:([^\s:@/'\"`]{3,128})@[\w.\-]+"),
+})
+# Общее правило: длинное значение после присваивания («=», «:», «:=», «=>»).
+# Это только кандидат: в отчёт он попадает, если слева от него в той же
+# строке есть «секретное» имя (SECRET_NAME_PATTERN) и у значения высокая
+# энтропия. Поиск от знака присваивания, а не от имени — без учёта
+# регистра re пробовал бы каждую позицию файла
+GENERIC_SECRET_PATTERN = Regex(r"[:=][=>]?\s*['\"`]?([A-Za-z0-9+/=_\-~]{16,256})(?![A-Za-z0-9+/=_\-~])")
+SECRET_NAME_PATTERN = Regex(
+    r"secret|token|passw(?:or)?d|pwd|api_?key|access_?key|private_?key|auth|credential",
+    re.IGNORECASE,
+)
+# ...но не хеш: sha256=..., "integrity": "...", checksum: ... (манифесты
+# колёс, lock-файлы, описи артефактов)
+DIGEST_NAME_PATTERN = Regex(r"(?:sha\d*|md5|hash|digest|integrity|checksum)['\"]?\s*[:=][=>]?\s*['\"`]?$",
+                            re.IGNORECASE)
 
-HEADER_PATTERNS = {
+HEADER_PATTERNS = LazyTable({
     # JavaScript / TypeScript
     "JavaScript": [
         # Fetch API: fetch(url, { method: 'POST', headers: { 'X-Auth': '…' } })
         (
-            re.compile(
+            Regex(
                 r"""
                 \bfetch\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -315,7 +429,7 @@ HEADER_PATTERNS = {
         ),
         # Axios: axios.post(url, data, { headers: { 'X-Auth': '…' } })
         (
-            re.compile(
+            Regex(
                 r"""
                 \baxios\.(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -328,7 +442,7 @@ HEADER_PATTERNS = {
         ),
         # jQuery AJAX: $.ajax({ url: '…', type: 'PUT', headers: { … } })
         (
-            re.compile(
+            Regex(
                 r"""
                 \b(?:\$|jQuery)\.ajax\(\s*
                     \{\s*[^}]*?url\s*:\s*(?P<url>['"][^'"]+['"])[^}]*?
@@ -341,7 +455,7 @@ HEADER_PATTERNS = {
         ),
         # AngularJS $http: $http.post(url, data, { headers: { … } })
         (
-            re.compile(
+            Regex(
                 r"""
                 \b\$http\.(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -354,7 +468,7 @@ HEADER_PATTERNS = {
         ),
         # Angular HttpClient: this.http.post(url, body, { headers: new HttpHeaders({ … }) })
         (
-            re.compile(
+            Regex(
                 r"""
                 \bthis\.http\.(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -371,7 +485,7 @@ HEADER_PATTERNS = {
     "Python": [
         # requests: requests.get(url, headers={'X-Auth': '…'})
         (
-            re.compile(
+            Regex(
                 r"""
                 \brequests\.(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -383,7 +497,7 @@ HEADER_PATTERNS = {
         ),
         # aiohttp: await session.get(url, headers={…})
         (
-            re.compile(
+            Regex(
                 r"""
                 \bawait\s+[\w_]+\.?(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -395,7 +509,7 @@ HEADER_PATTERNS = {
         ),
         # Flask test client: app.test_client().get(..., headers={…})
         (
-            re.compile(
+            Regex(
                 r"""
                 \bapp\.test_client\(\)\.(?P<method>get|post|put|delete|patch)\(\s*
                     (?P<url>['"][^'"]+['"])\s*,\s*
@@ -411,7 +525,7 @@ HEADER_PATTERNS = {
     "Go": [
         # net/http NewRequest: http.NewRequest("POST", url, …)
         (
-            re.compile(
+            Regex(
                 r"""
                 \bhttp\.NewRequest\(\s*
                     ['"](?P<method>GET|POST|PUT|DELETE|PATCH)['"]\s*,\s*
@@ -423,7 +537,7 @@ HEADER_PATTERNS = {
         ),
         # Go Headers: req.Header.Set("X-Auth", "…")
         (
-            re.compile(
+            Regex(
                 r"""
                 \.Header\.Set\(\s*
                     ['"](?P<headerName>[^'"]+)['"]\s*,\s*
@@ -440,7 +554,7 @@ HEADER_PATTERNS = {
     "Java": [
         # Spring @RequestHeader("X-Test", defaultValue = "…", required = false)
         (
-            re.compile(
+            Regex(
                 r"""
                 @RequestHeader\s*
                 \(\s*
@@ -455,7 +569,7 @@ HEADER_PATTERNS = {
         ),
         # Spring Mapping annotations with headers="X-Api-Version=1"
         (
-            re.compile(
+            Regex(
                 r"""
                 @(?:GetMapping|PostMapping|PutMapping|DeleteMapping|PatchMapping)\s*
                 \(\s*[^)]*?headers\s*=\s*["'](?P<headers>[^"']+)["']
@@ -466,7 +580,7 @@ HEADER_PATTERNS = {
         ),
         # ResponseEntity.ok().header("X-My-Header", "value")
         (
-            re.compile(
+            Regex(
                 r"""
                 \.header\(\s*
                     ["'](?P<headerName>[^"']+)["']\s*,\s*
@@ -479,7 +593,7 @@ HEADER_PATTERNS = {
         ),
         # JAX-RS @HeaderParam("X-User-Id")
         (
-            re.compile(
+            Regex(
                 r"""
                 @HeaderParam\s*
                 \(\s*["'](?P<headerName>[^"']+)["']\s*\)
@@ -494,7 +608,7 @@ HEADER_PATTERNS = {
     "C#": [
         # ASP.NET Core middleware: app.Use(async (ctx, next) => { ctx.Response.Headers.Add("X-Auth", "…"); })
         (
-            re.compile(
+            Regex(
                 r"""
                 \bapp\.Use\(\s*async\s*\(\s*context\s*,\s*next\s*\)\s*=>\s*
                 \{\s*context\.Response\.Headers\.Add\(\s*
@@ -508,7 +622,7 @@ HEADER_PATTERNS = {
         ),
         # HttpClient DefaultRequestHeaders.Add("X-Auth", "…")
         (
-            re.compile(
+            Regex(
                 r"""
                 \bDefaultRequestHeaders\.Add\(\s*
                     ["'](?P<headerName>[^"']+)["']\s*,\s*
@@ -525,7 +639,7 @@ HEADER_PATTERNS = {
     "PHP": [
         # Guzzle: $client->request('GET', $url, ['headers' => [...]])
         (
-            re.compile(
+            Regex(
                 r"""
                 \$client->request\(\s*
                     ['"](?P<method>GET|POST|PUT|DELETE|PATCH)['"]\s*,\s*
@@ -538,7 +652,7 @@ HEADER_PATTERNS = {
         ),
         # Laravel middleware: ->header('X-Auth', '…')
         (
-            re.compile(
+            Regex(
                 r"""
                 ->header\(\s*
                     ['"](?P<headerName>[^"']+)['"]\s*,\s*
@@ -551,7 +665,7 @@ HEADER_PATTERNS = {
         ),
         # Symfony annotation: @Route(..., defaults={"_format"="json"}, schemes={"https"})
         (
-            re.compile(
+            Regex(
                 r"""
                 @Route\s*\([^\)]*?defaults\s*=\s*\{[^}]+\}\s*,\s*schemes\s*=\s*\{[^}]+\}
                 """,
@@ -565,7 +679,7 @@ HEADER_PATTERNS = {
     "Ruby": [
         # Rails before_action: controller.response.set_header('X-Auth', '…')
         (
-            re.compile(
+            Regex(
                 r"""
                 before_action\s+:.*do\s*\|controller\|\s*
                 controller\.response\.set_header\(\s*
@@ -579,7 +693,7 @@ HEADER_PATTERNS = {
         ),
         # Sinatra: headers 'X-Auth' => '…'
         (
-            re.compile(
+            Regex(
                 r"""
                 headers\s+['"](?P<headerName>[^'"]+)['"]\s*=>\s*['"](?P<headerValue>[^'"]+)['"]
                 """,
@@ -593,7 +707,7 @@ HEADER_PATTERNS = {
     "Rust": [
         # Actix-Web: HttpResponse::Ok().append_header(("X-Auth", "…"))
         (
-            re.compile(
+            Regex(
                 r"""
                 \.append_header\(\(\s*
                     ['"](?P<headerName>[^'"]+)['"]\s*,\s*
@@ -606,7 +720,7 @@ HEADER_PATTERNS = {
         ),
         # Rocket: #[header(Name = "X-Auth", Value = "…")]
         (
-            re.compile(
+            Regex(
                 r"""
                 #\[\s*header\s*\(\s*Name\s*=\s*['"](?P<headerName>[^'"]+)['"]\s*,\s*Value\s*=\s*['"](?P<headerValue>[^'"]+)['"]\s*\)\]
                 """,
@@ -620,7 +734,7 @@ HEADER_PATTERNS = {
     "Kotlin": [
         # Spring MVC Kotlin: @RequestMapping(..., headers={…})
         (
-            re.compile(
+            Regex(
                 r"""
                 @RequestMapping\s*\([^)]+?headers\s*=\s*\{[^}]+\}
                 """,
@@ -630,7 +744,7 @@ HEADER_PATTERNS = {
         ),
         # Ktor: call.respondText("…", headers = headersOf("X-Auth" to "…"))
         (
-            re.compile(
+            Regex(
                 r"""
                 respond\w*\([^,]+,\s*headers\s*=\s*headersOf\(\s*['"](?P<headerName>[^'"]+)['"]\s*to\s*['"](?P<headerValue>[^'"]+)['"]\)
                 """,
@@ -639,15 +753,15 @@ HEADER_PATTERNS = {
             "Ktor headersOf"
         ),
     ],
-}
+})
 
 METHOD_PATTERNS = {
     # Spring WebClient
-    re.compile(r'\bWebClient\.create\(\)\.(get|post|put|delete|patch)\s*\(\s*["\']([^"\']+)["\']'),
+    Regex(r'\bWebClient\.create\(\)\.(get|post|put|delete|patch)\s*\(\s*["\']([^"\']+)["\']'),
     # RestTemplate.exchange
-    re.compile(r'\brestTemplate\.exchange\(\s*["\']([^"\']+)["\']\s*,\s*HttpMethod\.(GET|POST|PUT|DELETE|PATCH)'),
+    Regex(r'\brestTemplate\.exchange\(\s*["\']([^"\']+)["\']\s*,\s*HttpMethod\.(GET|POST|PUT|DELETE|PATCH)'),
     # okhttp3.Request.Builder().method("PUT", …).url("…")
-    re.compile(r'\.method\(\s*["\'](GET|POST|PUT|DELETE|PATCH)["\']\s*,[^\)]*\)\.url\(\s*["\']([^"\']+)["\']'),
+    Regex(r'\.method\(\s*["\'](GET|POST|PUT|DELETE|PATCH)["\']\s*,[^\)]*\)\.url\(\s*["\']([^"\']+)["\']'),
 }
 
 DEPENDENCY_FILES = {
@@ -836,7 +950,7 @@ TECHNOLOGIES_BY_LANG = {
         "devops": ["Docker", "Kubernetes"]
     }
 }
-TECHNOLOGY_DETECTORS = {
+TECHNOLOGY_DETECTORS = LazyTable({
     # Java
     "Spring Boot": [
         {"type": "file", "path": "pom.xml", "content": "spring-boot-starter"},
@@ -985,33 +1099,49 @@ TECHNOLOGY_DETECTORS = {
         {"type": "dir", "path": "pages"},
         {"type": "code", "pattern": "import.*from ['\"]next['\"]"}
     ]
-}
+})
 TECHNOLOGY_DETECTORS.update({
     "React": [
         # кодовые признаки
-        {"type": "code", "pattern": re.compile(r"\bimport\s+React\b")},
-        {"type": "code", "pattern": re.compile(r"\bReactDOM\.render\(")},
+        {"type": "code", "pattern": Regex(r"\bimport\s+React\b")},
+        {"type": "code", "pattern": Regex(r"\bReactDOM\.render\(")},
         # расширения файлов JSX(TSX)
-        {"type": "file", "pattern": re.compile(r"\.jsx?$", re.IGNORECASE)},
+        {"type": "file", "pattern": Regex(r"\.jsx?$", re.IGNORECASE)},
     ],
     "Next.js": [
         # конфиг Nuxt-подобных приложений
-        {"type": "file", "pattern": re.compile(r"\bnext\.config\.js$", re.IGNORECASE)},
+        {"type": "file", "pattern": Regex(r"\bnext\.config\.js$", re.IGNORECASE)},
         # импорт из `next/...`
-        {"type": "code", "pattern": re.compile(r"from\s+['\"]next(?:\/[a-zA-Z\-_]+)*['\"]")},
+        {"type": "code", "pattern": Regex(r"from\s+['\"]next(?:\/[a-zA-Z\-_]+)*['\"]")},
     ],
     "Angular": [
         # наличие angular.json
-        {"type": "file", "pattern": re.compile(r"\bangular\.json$", re.IGNORECASE)},
+        {"type": "file", "pattern": Regex(r"\bangular\.json$", re.IGNORECASE)},
         # декорации NgModule / Component
-        {"type": "code", "pattern": re.compile(r"@NgModule\s*\(")},
-        {"type": "code", "pattern": re.compile(r"@Component\s*\(")},
+        {"type": "code", "pattern": Regex(r"@NgModule\s*\(")},
+        {"type": "code", "pattern": Regex(r"@Component\s*\(")},
     ],
     "Vue": [
         # single-file компоненты
-        {"type": "file", "pattern": re.compile(r"\.vue$", re.IGNORECASE)},
+        {"type": "file", "pattern": Regex(r"\.vue$", re.IGNORECASE)},
         # import Vue
-        {"type": "code", "pattern": re.compile(r"\bimport\s+Vue\b")},
-        {"type": "code", "pattern": re.compile(r"new\s+Vue\s*\(")},
+        {"type": "code", "pattern": Regex(r"\bimport\s+Vue\b")},
+        {"type": "code", "pattern": Regex(r"new\s+Vue\s*\(")},
     ],
-})
\ No newline at end of file
+})
+
+
+# одиночные правила тоже компилируются при первом обращении к ним (PEP 562);
+# в _DEFERRED остаётся их исходный вид — по нему считается отпечаток правил
+_DEFERRED = {name: globals().pop(name) for name in (
+    'ENDPOINT_IGNORE_FILE_PATTERNS', 'AJAX_PATTERN', 'AJAX_PATTERN_EXT',
+    'PASSWORD_PATTERN', 'GENERIC_SECRET_PATTERN', 'SECRET_NAME_PATTERN', 'DIGEST_NAME_PATTERN',
+    'METHOD_PATTERNS',
+)}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _DEFERRED:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = globals()[name] = compile_rules(_DEFERRED[name])
+    return value
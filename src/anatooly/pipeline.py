@@ -0,0 +1,380 @@
+import contextlib
+import itertools
+import os
+import pickle
+import time
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from . import archives, profiling
+from .cache import content_digest
+from .ignore import IgnoreEngine
+from .inventory import FileInventory
+from .prefetch import Prefetcher, ReadAhead
+from .source import Buffer, make_source, read_data
+
+# сколько файлов уходит в рабочий процесс за одну задачу
+BATCH_SIZE = 64
+
+
+def scan_file(visitors: List, path: str, rel: str,
+              skip: Iterable[int] = (), stale: Iterable[int] = (),
+              verify: Optional[str] = None,
+              hashing: bool = False,
+              bounded: bool = False,
+              reader: Callable[[str], Buffer] = read_data) -> Tuple[Optional[str], Optional[List[Any]]]:
+    """Читает файл (если он кому-то нужен) и прогоняет его через визитёров.
+
+    ``skip`` — визитёры, чей результат уже взят из кэша. ``stale`` — визитёры
+    с записью в кэше, у которой изменился только mtime: ``verify`` — хеш
+    содержимого из этой записи; при совпадении они тоже пропускаются,
+    иначе сканируются заново. ``bounded`` — правила ищутся построчно
+    (запасной режим после превышения бюджета времени, см. watchdog).
+    ``reader`` — чем читать файл (например, Prefetcher.take).
+    Возвращает (хеш содержимого, [(сработал ли визитёр, результат scan)]).
+    """
+    skip = set(skip) | set(stale)
+    stale = set(stale)
+    active = [i not in skip and v.wants(path, rel) for i, v in enumerate(visitors)]
+    if not any(active) and verify is None:
+        return None, None
+
+    profile = profiling.ACTIVE
+    digest = None
+    source = None
+    if verify is not None or any(v.needs_content for v, on in zip(visitors, active) if on):
+        try:
+            with profiling.stage('read'):
+                data = reader(path)
+        except Exception:
+            active = [on and not v.needs_content for v, on in zip(visitors, active)]
+        else:
+            if profile is not None:
+                profile.add_stage('read', files=1, size=len(data))
+            if hashing:
+                digest = content_digest(data)
+            if verify is not None and digest != verify:
+                active = [on or (i in stale and v.wants(path, rel))
+                          for i, (v, on) in enumerate(zip(visitors, active))]
+            source = make_source(data, bounded)
+
+    try:
+        if profile is not None:
+            return digest, _scan_profiled(profile, visitors, active, path, rel, source)
+        return digest, [(True, v.scan(path, rel, source)) if on else (False, None)
+                        for v, on in zip(visitors, active)]
+    finally:
+        if source is not None:
+            source.close()
+
+
+def wants_content(visitors: List, path: str, rel: str, skip: Iterable[int] = (),
+                  stale: Iterable[int] = (), verify: Optional[str] = None) -> bool:
+    """Будет ли scan_file читать файл — по тем же условиям, что и он сам."""
+    if verify is not None:
+        return True
+    skip = set(skip) | set(stale)
+    return any(i not in skip and v.needs_content and v.wants(path, rel) for i, v in enumerate(visitors))
+
+
+def scan_tasks(visitors: List, tasks: List[tuple], hashing: bool = False,
+               read_ahead: Optional[ReadAhead] = None,
+               opener: Callable[[str], Buffer] = read_data) -> Iterator[Tuple[Optional[str], Optional[List[Any]]]]:
+    """scan_file по задачам подряд; следующие файлы тем временем читаются в потоках."""
+    if read_ahead is None or read_ahead.threads <= 0:
+        for path, rel, skip, stale, verify in tasks:
+            yield scan_file(visitors, path, rel, skip, stale, verify, hashing, reader=opener)
+        return
+    prefetch = Prefetcher(read_ahead, opener)
+    # в очередь чтения задачи ставятся не дальше depth вперёд: wants
+    # визитёров зависит от уже слитых результатов (см. MultiCodeDetector)
+    pushed = 0
+    try:
+        for i, (path, rel, skip, stale, verify) in enumerate(tasks):
+            while pushed < min(len(tasks), i + read_ahead.depth):
+                p, r, sk, st, ve = tasks[pushed]
+                if wants_content(visitors, p, r, sk, st, ve):
+                    prefetch.push(pushed, p)
+                pushed += 1
+            try:
+                yield scan_file(visitors, path, rel, skip, stale, verify, hashing,
+                                reader=lambda p, i=i: prefetch.take(i, p))
+            finally:
+                prefetch.discard(i)
+    finally:
+        prefetch.close()
+
+
+def _scan_profiled(profile, visitors: List, active: List[bool], path: str, rel: str,
+                   source) -> List[Tuple[bool, Any]]:
+    # то же, что в scan_file, но время каждого визитёра идёт в его стадию
+    size = len(source.data) if source is not None else 0
+    out = []
+    for v, on in zip(visitors, active):
+        if not on:
+            out.append((False, None))
+            continue
+        wall, cpu = time.perf_counter(), time.process_time()
+        partial = v.scan(path, rel, source)
+        profile.add_stage(v.stage or type(v).__name__, time.perf_counter() - wall,
+                          time.process_time() - cpu, 1, size if v.needs_content else 0)
+        out.append((True, partial))
+    return out
+
+
+# визитёры, уже распакованные в этом рабочем процессе: правила
+# компилируются один раз на процесс, а не на каждую задачу
+_WORKER_VISITORS: Dict[int, List] = {}
+
+
+def _scan_batch(task: Tuple[int, bytes, bool, bool, Optional[ReadAhead], Callable, List[tuple]]
+                ) -> Tuple[List[tuple], Optional[tuple]]:
+    # вместе с результатами пачки возвращается её профиль (при --profile)
+    key, blob, hashing, profile, read_ahead, opener, batch = task
+    visitors = _WORKER_VISITORS.get(key)
+    if visitors is None:
+        visitors = _WORKER_VISITORS[key] = pickle.loads(blob)
+    local = profiling.enable() if profile else None
+    try:
+        rows = list(scan_tasks(visitors, batch, hashing, read_ahead, opener))
+    finally:
+        profiling.disable()
+    return rows, local.state() if local is not None else None
+
+
+def _unguarded(scanned: Iterator[Tuple[Any, Any]]) -> Iterator[Tuple[Optional[str], Optional[List[Any]]]]:
+    # результаты GuardedScanner для одного прохода: ошибка визитёра прерывает
+    # анализ, как и без watchdog, а рабочие процессы закрываются сразу
+    with contextlib.closing(scanned):
+        for _, result in scanned:
+            if isinstance(result, Exception):
+                raise result
+            yield result
+
+
+class FilePipeline:
+    """Один обход дерева и одно чтение каждого файла на все анализаторы."""
+
+    _run_ids = itertools.count()
+
+    def __init__(self, directory: str, jobs: int = 1, cache=None,
+                 paths: Optional[List[str]] = None, ignore: Optional[IgnoreEngine] = None,
+                 regex_timeout: Optional[float] = None,
+                 read_ahead: Optional[ReadAhead] = None,
+                 opener: Callable[[str], Buffer] = read_data,
+                 archive_depth: int = 0, inventory: Optional[FileInventory] = None):
+        self.directory = directory
+        self.jobs = jobs
+        self.cache = cache
+        # бюджет времени на правила одного файла (секунды); если задан,
+        # файлы сканируются в процессах, которые можно убить (см. watchdog)
+        self.regex_timeout = regex_timeout
+        # файлы, не уложившиеся в бюджет, — по записи на файл за все запуски
+        self.timeouts: List[Dict[str, Any]] = []
+        # упреждающее чтение (None — файлы читаются по месту) и функция
+        # чтения файла (SlowFilesystem — для проверки на «медленном диске»)
+        self.read_ahead = read_ahead
+        self.opener = opener
+        # до какой вложенности смотреть внутрь архивов (0 — не смотреть)
+        self.archive_depth = archive_depth
+        # заданный заранее список относительных путей вместо обхода дерева
+        self.paths = paths
+        # общие для всех стадий правила пропуска путей
+        self.ignore = ignore or IgnoreEngine(directory)
+        # готовая опись (например, от прошлого прохода в --watch) вместо обхода
+        self._inventory: Optional[FileInventory] = inventory
+        self._files: Optional[List[Tuple[str, str]]] = None
+        # если задан — слияние запоминает здесь, что каждый визитёр получил
+        # по каждому файлу: путь -> {индекс визитёра: partial} (см. --watch)
+        self.partials: Optional[Dict[str, Dict[int, Any]]] = None
+
+    @property
+    def inventory(self) -> FileInventory:
+        if self._inventory is None:
+            if self.paths is not None:
+                self._inventory = FileInventory.from_paths(self.directory, self.paths, self.ignore,
+                                                           self.archive_depth)
+            else:
+                self._inventory = FileInventory.scan(self.directory, self.ignore, self.archive_depth)
+        return self._inventory
+
+    @property
+    def files(self) -> List[Tuple[str, str]]:
+        # (полный путь, путь относительно корня) в порядке os.walk
+        if self._files is None:
+            self._files = [(e.path, e.rel) for e in self.inventory.entries]
+        return self._files
+
+    def find_first(self, basename: str) -> Optional[str]:
+        entry = self.inventory.find_first(basename)
+        return entry.path if entry else None
+
+    def run(self, visitors: Iterable) -> None:
+        self._drive(self.begin(visitors))
+
+    def rescan(self, visitors: List, plan: List[tuple]) -> None:
+        """Сканирует и сливает файлы ``plan`` в уже запущенных визитёров.
+
+        Строки ``plan`` — как у _plan; ``start`` не вызывается, так что
+        вклад прочих файлов остаётся (см. watch.WatchSession).
+        """
+        keys = [self.cache.key(v) for v in visitors] if self.cache else [None] * len(visitors)
+        self._drive(ScanPass(self, visitors, keys, any(keys), plan))
+
+    def _drive(self, scan: 'ScanPass') -> None:
+        if self.regex_timeout:
+            from .watchdog import GuardedScanner
+            guard = GuardedScanner(self.jobs, self.regex_timeout, self.read_ahead, self.opener)
+            results = _unguarded(guard.scan([scan]))
+        elif self.jobs > 1 and len(scan.tasks) > BATCH_SIZE:
+            results = self._scan_parallel(scan.visitors, scan.tasks, scan.hashing)
+        else:
+            results = scan_tasks(scan.visitors, scan.tasks, scan.hashing, self.read_ahead, self.opener)
+        for result in results:
+            scan.feed(result)
+        scan.finish()
+
+    def begin(self, visitors: Iterable) -> 'ScanPass':
+        """Готовит проход: визитёры запущены, задачи на сканирование составлены.
+
+        Сканировать задачи можно где угодно (run, общий пул scan-many),
+        лишь бы результаты пришли в ScanPass.feed в порядке задач.
+        """
+        visitors = list(visitors)
+        for v in visitors:
+            v.start()
+        keys = [self.cache.key(v) for v in visitors] if self.cache else [None] * len(visitors)
+        hashing = any(keys)
+        plan = self._plan(visitors, keys) if hashing else [
+            (path, rel, None, {}, {}, None, True) for path, rel in self.files
+        ]
+        return ScanPass(self, visitors, keys, hashing, plan)
+
+    def _plan(self, visitors: List, keys: List[Optional[str]]) -> List[tuple]:
+        # сначала все записи кэша с тем же размером и mtime: по ним визитёры
+        # могут заранее узнать то, что точно подтвердится (см. FileVisitor.prime)
+        entries = []
+        for path, rel in self.files:
+            try:
+                # у члена архива размер и mtime — самого архива: пока архив
+                # не менялся, не менялось и содержимое члена
+                st = os.stat(archives.outer(path))
+            except OSError:
+                entries.append((path, rel, None, {}, {}))
+                continue
+            fresh, stale = {}, {}
+            cached = self.cache.lookup(path)
+            for i, key in enumerate(keys):
+                if key is None or key not in cached:
+                    continue
+                size, mtime, digest, blob = cached[key]
+                stored = self.cache.loads(blob)
+                if size == st.st_size and mtime == st.st_mtime_ns:
+                    fresh[i] = stored
+                    visitors[i].prime(stored)
+                else:
+                    stale[i] = (digest, stored)
+            entries.append((path, rel, st, fresh, stale))
+
+        plan = []
+        for path, rel, st, fresh, stale in entries:
+            wanted = [v.wants(path, rel) for v in visitors]
+            hits = self._from_cache(visitors, wanted, fresh)
+            stale_hits = self._from_cache(visitors, wanted, {i: s for i, (_, s) in stale.items()})
+            digests = {stale[i][0] for i in stale_hits}
+            verify = digests.pop() if stale_hits and len(digests) == 1 else None
+            if verify is None:
+                stale_hits = {}
+            dispatch = verify is not None or any(
+                on and i not in hits and i not in stale_hits for i, on in enumerate(wanted)
+            )
+            plan.append((path, rel, st, hits, stale_hits, verify, dispatch))
+        return plan
+
+    @staticmethod
+    def _from_cache(visitors: List, wanted: List[bool], stored: Dict[int, Any]) -> Dict[int, Any]:
+        hits = {}
+        for i, value in stored.items():
+            if wanted[i]:
+                ok, partial = visitors[i].from_cache(value)
+                if ok:
+                    hits[i] = partial
+        return hits
+
+    def _scan_parallel(self, visitors: List, tasks: List[tuple], hashing: bool) -> Iterator[tuple]:
+        key = next(self._run_ids)
+        blob = pickle.dumps(visitors)
+        profile = profiling.ACTIVE
+        batches = ((key, blob, hashing, profile is not None, self.read_ahead, self.opener,
+                    tasks[i:i + BATCH_SIZE])
+                   for i in range(0, len(tasks), BATCH_SIZE))
+        with Pool(self.jobs) as pool:
+            for batch, state in pool.imap(_scan_batch, batches):
+                if state is not None:
+                    profile.merge(state)
+                yield from batch
+
+
+class ScanPass:
+    """Один проход визитёров по файлам: задачи и слияние их результатов.
+
+    Результаты задач подаются в ``feed`` в порядке ``tasks``; слияние идёт
+    в порядке обхода, поэтому не зависит от того, где и сколькими
+    процессами они получены и что взято из кэша. ``finish`` дописывает
+    файлы после последней задачи и сбрасывает кэш. ``timeouts`` и
+    ``degraded`` заполняет тот, кто сканирует (см. watchdog.GuardedScanner).
+    """
+
+    def __init__(self, pipeline: FilePipeline, visitors: List, keys: List[Optional[str]],
+                 hashing: bool, plan: List[tuple]):
+        self.pipeline = pipeline
+        self.visitors = visitors
+        self.keys = keys
+        self.hashing = hashing
+        self.tasks = [(path, rel, list(hits), list(stale), verify)
+                      for path, rel, _, hits, stale, verify, dispatch in plan if dispatch]
+        self.timeouts: List[Dict[str, Any]] = []
+        # файлы, чей результат получен построчно или не получен вовсе:
+        # в кэш их не кладём, чтобы в следующий раз попробовать заново
+        self.degraded: Set[str] = set()
+        # сколько результатов ещё ждём; слияние — генератор, который
+        # останавливается на каждой задаче до её результата
+        self.pending = len(self.tasks)
+        self._merger = self._merge(plan)
+        next(self._merger, None)
+
+    def feed(self, result: Tuple[Optional[str], Optional[List[Any]]]) -> None:
+        self.pending -= 1
+        try:
+            self._merger.send(result)
+        except StopIteration:
+            pass
+
+    def finish(self) -> None:
+        if self.pending:
+            raise RuntimeError('не все задачи прохода получили результат')
+        cache = self.pipeline.cache
+        if cache:
+            cache.flush()
+        self.pipeline.timeouts.extend(self.timeouts)
+
+    def _merge(self, plan: List[tuple]) -> Iterator[None]:
+        visitors, keys, cache = self.visitors, self.keys, self.pipeline.cache
+        merged = self.pipeline.partials
+        for path, rel, st, hits, stale, verify, dispatch in plan:
+            digest, partials = (yield) if dispatch else (None, None)
+            unchanged = verify is not None and digest == verify
+            for i, v in enumerate(visitors):
+                if i in hits:
+                    partial = hits[i]
+                elif i in stale and unchanged:
+                    partial = stale[i]
+                    cache.store(path, keys[i], st, digest, v.to_cache(partial))
+                elif partials is not None and partials[i][0]:
+                    partial = partials[i][1]
+                    if keys[i] is not None and st is not None and path not in self.degraded:
+                        cache.store(path, keys[i], st, digest, v.to_cache(partial))
+                else:
+                    continue
+                v.merge(path, rel, partial)
+                if merged is not None:
+                    merged.setdefault(path, {})[i] = partial
@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from .source import Buffer, read_data
+
+
+class ReadAhead(NamedTuple):
+    """Настройки упреждающего чтения (см. Prefetcher)."""
+    threads: int = 8                   # одновременных чтений; 0 — читать по месту
+    depth: int = 32                    # файлов в очереди наперёд, включая читаемые
+    max_bytes: int = 64 * 1024 * 1024  # прочитано и ещё не отдано анализу, байт
+
+
+class SlowFilesystem:
+    """Чтение с искусственной задержкой — как у NFS и других сетевых ФС.
+
+    Нужен, чтобы проверить упреждающее чтение локально: задержка на каждый
+    открываемый файл, ``jitter`` — её случайный разброс (доля от ``latency``).
+    """
+
+    def __init__(self, latency: float, jitter: float = 0.0, opener: Callable[[str], Buffer] = read_data):
+        self.latency = latency
+        self.jitter = jitter
+        self.opener = opener
+
+    def __call__(self, path: str) -> Buffer:
+        delay = self.latency
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(delay, 0.0))
+        return self.opener(path)
+
+
+class Prefetcher:
+    """Файлы читаются в потоках заранее, пока анализ идёт по предыдущим.
+
+    Задачи ставятся в очередь через ``push`` в том порядке, в котором их
+    потом заберут через ``take``. Одновременно идёт не больше ``threads``
+    чтений, наперёд поставлено не больше ``depth`` файлов, а прочитанное и
+    ещё не забранное занимает не больше ``max_bytes`` (сверх лимита — разве
+    что чтения, которые уже шли; файлы от MMAP_THRESHOLD отображаются через
+    mmap и в лимит не входят). Если файла нет в очереди, ``take`` читает его
+    сам. Ошибка чтения поднимается в ``take``, как и без упреждения.
+    """
+
+    def __init__(self, config: ReadAhead = ReadAhead(), opener: Callable[[str], Buffer] = read_data):
+        self.config = config
+        self.opener = opener
+        self._queue: Deque[Tuple[Hashable, str]] = deque()
+        self._ahead: Dict[Hashable, Future] = {}
+        # байты прочитанных, но ещё не забранных файлов; растут в потоках чтения
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=config.threads) if config.threads > 0 else None
+
+    def push(self, key: Hashable, path: str) -> None:
+        if self._pool is None:
+            return
+        self._queue.append((key, path))
+        self._fill()
+
+    def _read(self, path: str) -> Tuple[Buffer, int]:
+        data = self.opener(path)
+        size = len(data) if isinstance(data, bytes) else 0
+        with self._lock:
+            self._bytes += size
+        return data, size
+
+    def _fill(self) -> None:
+        while self._queue and len(self._ahead) < self.config.depth:
+            # хотя бы один файл читается всегда, даже если лимит исчерпан
+            if self._ahead and self._bytes >= self.config.max_bytes:
+                break
+            key, path = self._queue.popleft()
+            self._ahead[key] = self._pool.submit(self._read, path)
+
+    def _release(self, future: Future) -> Optional[Buffer]:
+        try:
+            data, size = future.result()
+        except Exception:
+            return None
+        with self._lock:
+            self._bytes -= size
+        return data
+
+    def take(self, key: Hashable, path: str) -> Buffer:
+        future = self._ahead.pop(key, None)
+        if future is None:
+            self._drop(key)
+            return self.opener(path)
+        try:
+            data, size = future.result()
+            with self._lock:
+                self._bytes -= size
+            return data
+        finally:
+            self._fill()
+
+    def discard(self, key: Hashable) -> None:
+        # файл так и не понадобился (или уже забран): отпускаем прочитанное
+        future = self._ahead.pop(key, None)
+        if future is None:
+            self._drop(key)
+            return
+        if not future.cancel():
+            self._close(self._release(future))
+        self._fill()
+
+    def _drop(self, key: Hashable) -> None:
+        if self._queue and any(k == key for k, _ in self._queue):
+            self._queue = deque(item for item in self._queue if item[0] != key)
+
+    @staticmethod
+    def _close(data: Optional[Buffer]) -> None:
+        if data is not None and not isinstance(data, bytes):
+            data.close()
+
+    def close(self) -> None:
+        self._queue.clear()
+        for future in self._ahead.values():
+            if not future.cancel():
+                self._close(self._release(future))
+        self._ahead.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,147 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# включённый профиль текущего процесса (None — --profile не задан,
+# и все функции модуля ничего не делают)
+ACTIVE: Optional['Profile'] = None
+
+# порядок стадий в сводке; остальные — после них, по алфавиту
+STAGE_ORDER = ('walk', 'scan', 'read', 'languages', 'stack', 'dependencies',
+               'endpoints', 'headers', 'configs', 'report')
+
+
+class Profile:
+    """Время и счётчики по стадиям и по отдельным правилам для ``--profile``.
+
+    Стадия: [стена, CPU, файлов, байт, результатов]. Правило — ключ
+    (таблица, имя, регулярка): [запусков, секунд, совпадений]. Рабочие
+    процессы копят свой профиль и отдают его вместе с результатами пачки
+    (см. pipeline._scan_batch), основной процесс сливает их в ``merge``.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+        self.rules: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def add_stage(self, name: str, wall: float = 0.0, cpu: float = 0.0,
+                  files: int = 0, size: int = 0, results: int = 0) -> None:
+        row = self.stages.setdefault(name, [0.0, 0.0, 0, 0, 0])
+        row[0] += wall
+        row[1] += cpu
+        row[2] += files
+        row[3] += size
+        row[4] += results
+
+    def add_rule(self, table: str, name: str, pattern: str, seconds: float,
+                 hits: int, evals: int = 1) -> None:
+        row = self.rules.setdefault((table, name, pattern), [0, 0.0, 0])
+        row[0] += evals
+        row[1] += seconds
+        row[2] += hits
+
+    def state(self) -> Tuple[Dict, Dict]:
+        return self.stages, self.rules
+
+    def merge(self, state: Tuple[Dict, Dict]) -> None:
+        stages, rules = state
+        for name, (wall, cpu, files, size, results) in stages.items():
+            self.add_stage(name, wall, cpu, files, size, results)
+        for (table, name, pattern), (evals, seconds, hits) in rules.items():
+            self.add_rule(table, name, pattern, seconds, hits, evals)
+
+    def report(self) -> Dict[str, List[Dict[str, Any]]]:
+        rank = {name: i for i, name in enumerate(STAGE_ORDER)}
+        stages = [
+            {'stage': name, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+             'files': files, 'bytes': size, 'results': results}
+            for name, (wall, cpu, files, size, results)
+            in sorted(self.stages.items(), key=lambda kv: (rank.get(kv[0], len(rank)), kv[0]))
+        ]
+        rules = [
+            {'table': table, 'name': name, 'pattern': pattern,
+             'evals': evals, 'seconds': round(seconds, 6), 'hits': hits}
+            for (table, name, pattern), (evals, seconds, hits)
+            in sorted(self.rules.items(), key=lambda kv: -kv[1][1])
+        ]
+        return {'stages': stages, 'rules': rules}
+
+    def summary(self, top: int = 15) -> str:
+        data = self.report()
+        lines = ['', 'Профиль стадий:',
+                 '  %-13s %9s %9s %8s %10s %9s' % ('стадия', 'стена, с', 'CPU, с', 'файлов', 'МБ', 'найдено')]
+        for s in data['stages']:
+            lines.append('  %-13s %9.3f %9.3f %8d %10.2f %9d' % (
+                s['stage'], s['wall_s'], s['cpu_s'], s['files'], s['bytes'] / 1024 / 1024, s['results']))
+        if data['rules']:
+            lines += ['', 'Самые дорогие правила:',
+                      '  %9s %8s %7s  %s' % ('время, с', 'запусков', 'найдено', 'правило')]
+            for r in data['rules'][:top]:
+                pattern = ' '.join(r['pattern'].split())
+                if len(pattern) > 60:
+                    pattern = pattern[:57] + '...'
+                lines.append('  %9.3f %8d %7d  %s / %s: %s' % (
+                    r['seconds'], r['evals'], r['hits'], r['table'], r['name'], pattern))
+        return '\n'.join(lines) + '\n'
+
+
+def enable() -> Profile:
+    global ACTIVE
+    ACTIVE = Profile()
+    return ACTIVE
+
+
+def disable() -> None:
+    global ACTIVE
+    ACTIVE = None
+
+
+@contextmanager
+def stage(name: str, files: int = 0, size: int = 0) -> Iterator[None]:
+    # время блока кода идёт в стадию; без --profile — ничего не делает
+    profile = ACTIVE
+    if profile is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        profile.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu, files, size)
+
+
+def results(name: str, count: int) -> None:
+    if ACTIVE is not None:
+        ACTIVE.add_stage(name, results=count)
+
+
+def counted(name: str, sink: Callable[[str, Dict[str, Any]], None]) -> Callable[[str, Dict[str, Any]], None]:
+    # при потоковом выводе находки не доходят до finalize — считаем их в приёмнике
+    if ACTIVE is None:
+        return sink
+
+    def write(kind: str, record: Dict[str, Any]) -> None:
+        results(name, 1)
+        sink(kind, record)
+    return write
+
+
+def matches(source, regex: 're.Pattern', table: str, name: str) -> Iterator:
+    """``source.matches(regex)`` с учётом запуска правила в профиле."""
+    profile = ACTIVE
+    if profile is None:
+        return source.matches(regex)
+    start = time.perf_counter()
+    found = list(source.matches(regex))
+    profile.add_rule(table, name, _pattern(regex), time.perf_counter() - start, len(found))
+    return iter(found)
+
+
+def rule(table: str, name: str, regex: 're.Pattern', seconds: float, hits: int, evals: int = 1) -> None:
+    if ACTIVE is not None:
+        ACTIVE.add_rule(table, name, _pattern(regex), seconds, hits, evals)
+
+
+def _pattern(regex: 're.Pattern') -> str:
+    pattern = regex.pattern
+    return pattern.decode('latin-1') if isinstance(pattern, bytes) else pattern
@@ -0,0 +1,466 @@
+import argparse
+import json
+import os
+import re
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import stages
+
+HOST = '127.0.0.1'
+PORT = 8765
+# сколько заданий сканируется одновременно (их файлы делят общий пул)
+MAX_RUNNING = 4
+# сколько заданий может ждать в очереди; дальше — 503
+MAX_QUEUED = 1000
+# сколько завершённых заданий с результатами держать в памяти
+KEEP_FINISHED = 100
+# предел ожидания в GET /jobs/<id>/result?wait=..., с
+MAX_WAIT = 300.0
+
+# служба останавливается — новых проходов не будет
+_STOP = object()
+
+_ROUTE = re.compile(r'^/jobs/([0-9a-f]+)(/result)?$')
+
+
+class Job:
+    """Задание на сканирование одного каталога и его состояние."""
+
+    def __init__(self, job_id: str, path: str, lang_bytes: bool, no_ignore: bool,
+                 archive_depth: int, plan):
+        self.id = job_id
+        self.path = path
+        self.lang_bytes = lang_bytes
+        self.no_ignore = no_ignore
+        self.archive_depth = archive_depth
+        # какие стадии считать и отдавать (stages.Plan)
+        self.plan = plan
+        # queued -> running -> done | failed; из очереди — ещё cancelled
+        self.status = 'queued'
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.files: Optional[int] = None
+        self.error: Optional[str] = None
+        self.results: Optional[Dict[str, Any]] = None
+        self.done = threading.Event()
+
+    def state(self) -> Dict[str, Any]:
+        out = {
+            'id': self.id, 'path': self.path, 'status': self.status,
+            'stages': sorted(self.plan.emit),
+            'submitted': self.submitted, 'started': self.started, 'finished': self.finished,
+            'files': self.files,
+        }
+        if self.started is not None:
+            out['queued_s'] = round(self.started - self.submitted, 3)
+        if self.finished is not None and self.started is not None:
+            out['scan_s'] = round(self.finished - self.started, 3)
+        if self.error is not None:
+            out['error'] = self.error
+        return out
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ScanService:
+    """Очередь заданий поверх одного GuardedScanner с тёплыми рабочими.
+
+    Рабочие процессы живут всё время службы: импорт модулей, компиляция
+    правил patterns.py и запуск процессов оплачиваются один раз, а не на
+    каждое сканирование. Задания берутся из очереди, пока одновременно
+    сканируется не больше ``max_running``; файлы всех начатых заданий идут
+    в общий пул, как у scan-many. Всё, что трогает конвейеры и кэш, делает
+    один поток планировщика (``run``); HTTP-потоки только ставят задания в
+    очередь и читают их состояние.
+    """
+
+    def __init__(self, jobs: int, regex_timeout: float, read_ahead, cache_dir: Optional[str] = None,
+                 max_running: int = MAX_RUNNING, max_queued: int = MAX_QUEUED,
+                 keep_finished: int = KEEP_FINISHED):
+        from .watchdog import GuardedScanner
+        self.jobs = jobs
+        self.regex_timeout = regex_timeout
+        self.read_ahead = read_ahead
+        self.cache_dir = cache_dir
+        self.max_running = max(1, max_running)
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.guard = GuardedScanner(jobs, regex_timeout or None, read_ahead, prespawn=True)
+        self.cond = threading.Condition()
+        self.queue: Deque[Job] = deque()
+        self.jobs_by_id: 'OrderedDict[str, Job]' = OrderedDict()
+        # начатые проходы: ScanPass -> (задание, Analysis)
+        self.running: Dict[Any, Tuple[Job, Any]] = {}
+        self.stopping = False
+        self.counter = 0
+        self.cache = None
+
+    # --- вызывается из HTTP-потоков ---
+
+    def submit(self, path: str, lang_bytes: bool = False, no_ignore: bool = False,
+               archive_depth: Optional[int] = None, plan=None) -> Job:
+        from .cli import ARCHIVE_DEPTH
+        path = os.path.abspath(os.path.expanduser(path))
+        if not os.path.isdir(path):
+            raise ValueError('нет каталога %s' % path)
+        with self.cond:
+            if self.stopping:
+                raise QueueFull('служба останавливается')
+            if len(self.queue) >= self.max_queued:
+                raise QueueFull('в очереди уже %d заданий' % len(self.queue))
+            self.counter += 1
+            job = Job('%x%06x' % (int(time.time()), self.counter), path, lang_bytes, no_ignore,
+                      ARCHIVE_DEPTH if archive_depth is None else archive_depth, plan or stages.FULL)
+            self.jobs_by_id[job.id] = job
+            self.queue.append(job)
+            self.cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.cond:
+            return self.jobs_by_id.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Снимает задание из очереди или забывает завершённое; начатое не трогает."""
+        with self.cond:
+            job = self.jobs_by_id.get(job_id)
+            if job is None or job.status == 'running':
+                return job
+            if job.status == 'queued':
+                self.queue.remove(job)
+                job.status = 'cancelled'
+                job.finished = time.time()
+                job.done.set()
+            del self.jobs_by_id[job_id]
+            return job
+
+    def status(self) -> Dict[str, Any]:
+        with self.cond:
+            counts: Dict[str, int] = {}
+            for job in self.jobs_by_id.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'workers': self.guard.jobs, 'max_running': self.max_running,
+                'queued': len(self.queue), 'running': len(self.running),
+                'jobs': counts, 'stopping': self.stopping,
+            }
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self.cond:
+            return [job.state() for job in self.jobs_by_id.values()]
+
+    def stop(self) -> None:
+        # начатые задания доделываются, ждущие снимаются
+        with self.cond:
+            self.stopping = True
+            for job in self.queue:
+                job.status = 'cancelled'
+                job.finished = time.time()
+                job.done.set()
+            self.queue.clear()
+            self.cond.notify_all()
+
+    # --- поток планировщика ---
+
+    def run(self) -> None:
+        from .cache import ScanCache
+        # sqlite-соединение живёт в том потоке, где создано
+        self.cache = ScanCache(self.cache_dir) if self.cache_dir else None
+        try:
+            while not self.stopping:
+                try:
+                    for scan, result in self.guard.scan(self._passes()):
+                        self._feed(scan, result)
+                except Exception as exc:
+                    # сломался сам сканер (ошибки визитёров приходят в _feed
+                    # по своему заданию): начатые задания — в failed,
+                    # рабочие поднимутся заново
+                    with self.cond:
+                        failed = [job for job, _ in self.running.values()]
+                        self.running.clear()
+                    for job in failed:
+                        self._fail(job, exc)
+        finally:
+            if self.cache:
+                self.cache.close()
+
+    def _next(self) -> Any:
+        with self.cond:
+            while True:
+                if self.stopping:
+                    return _STOP
+                if self.queue and len(self.running) < self.max_running:
+                    job = self.queue.popleft()
+                    job.status = 'running'
+                    job.started = time.time()
+                    return job
+                if not self.guard.idle:
+                    return None
+                self.cond.wait()
+
+    def _passes(self):
+        while True:
+            job = self._next()
+            if job is _STOP:
+                return
+            if job is None:
+                # сканеру есть чем заняться — новых заданий пока не берём
+                yield None
+                continue
+            scan = self._start(job)
+            if scan is not None:
+                yield scan
+
+    def _start(self, job: Job):
+        from .cli import Analysis
+        from .ignore import IgnoreEngine
+        from .pipeline import FilePipeline
+        try:
+            ignore = (IgnoreEngine(job.path, rules=(), ignore_files=()) if job.no_ignore
+                      else IgnoreEngine(job.path))
+            pipeline = FilePipeline(job.path, jobs=self.jobs, cache=self.cache, ignore=ignore,
+                                    regex_timeout=self.regex_timeout, read_ahead=self.read_ahead,
+                                    archive_depth=job.archive_depth)
+            analysis = Analysis(job.path, pipeline, job.lang_bytes, plan=job.plan)
+            scan = pipeline.begin(analysis.visitors)
+            if not scan.tasks:
+                self._finish(job, scan, analysis)
+                return None
+        except Exception as exc:
+            self._fail(job, exc)
+            return None
+        with self.cond:
+            self.running[scan] = job, analysis
+        return scan
+
+    def _feed(self, scan, result) -> None:
+        entry = self.running.get(scan)
+        if entry is None:
+            # задание уже упало на прежнем файле — остаток его результатов
+            # сканер ещё досылает, они никому не нужны
+            return
+        job, analysis = entry
+        if isinstance(result, Exception):
+            # ошибка визитёра на файле этого задания — падает только оно
+            with self.cond:
+                del self.running[scan]
+            self._fail(job, result)
+            return
+        try:
+            scan.feed(result)
+            if not scan.pending:
+                with self.cond:
+                    del self.running[scan]
+                self._finish(job, scan, analysis)
+        except Exception as exc:
+            with self.cond:
+                self.running.pop(scan, None)
+            self._fail(job, exc)
+
+    def _finish(self, job: Job, scan, analysis) -> None:
+        scan.finish()
+        results = analysis.results()
+        with self.cond:
+            job.results = results
+            job.files = len(analysis.pipeline.inventory.entries)
+            self._close(job, 'done')
+
+    def _fail(self, job: Job, exc: Exception) -> None:
+        with self.cond:
+            job.error = '%s: %s' % (type(exc).__name__, exc)
+            self._close(job, 'failed')
+
+    def _close(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished = time.time()
+        job.done.set()
+        self.cond.notify_all()
+        # старые завершённые задания забываются вместе с результатами
+        finished = [j for j in self.jobs_by_id.values() if j.finished is not None]
+        for old in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs_by_id[old.id]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """JSON API службы.
+
+    POST /jobs {"path": ..., "lang_bytes": false, "no_ignore": false,
+    "archive_depth": 2, "only": [...], "skip": [...]} — поставить задание
+    (only/skip — стадии, как в --only/--skip); GET /jobs — все задания;
+    GET /jobs/<id> — состояние; GET /jobs/<id>/result[?wait=SECONDS] —
+    отчёт, как у --format json (с wait — дождаться его); DELETE /jobs/<id>
+    — снять из очереди или забыть; GET /status — очередь и рабочие.
+    """
+
+    server_version = 'anatooly-serve'
+    service: ScanService
+
+    def address_string(self) -> str:
+        # у Unix-сокета адреса клиента нет
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send(self, code: int, body: Any) -> None:
+        from .analyzers.report_generator import _json_default
+        data = json.dumps(body, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, message: str) -> None:
+        self._send(code, {'error': message})
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == '/status':
+            return self._send(200, self.service.status())
+        if url.path == '/jobs':
+            return self._send(200, self.service.list())
+        match = _ROUTE.match(url.path)
+        job = self.service.get(match.group(1)) if match else None
+        if job is None:
+            return self._error(404, 'нет такого задания' if match else 'нет такого адреса')
+        if not match.group(2):
+            return self._send(200, job.state())
+        try:
+            wait = float(parse_qs(url.query).get('wait', ['0'])[0])
+        except ValueError:
+            return self._error(400, 'wait — число секунд')
+        if wait > 0:
+            job.done.wait(min(wait, MAX_WAIT))
+        if job.status == 'done':
+            return self._send(200, job.results)
+        if job.status in ('failed', 'cancelled'):
+            return self._send(409, job.state())
+        # ещё не готово: состояние и 202, как у только что поставленного
+        return self._send(202, job.state())
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != '/jobs':
+            return self._error(404, 'нет такого адреса')
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict) or not isinstance(body.get('path'), str):
+                raise ValueError('нужен {"path": "..."}')
+            archive_depth = body.get('archive_depth')
+            only, skip = body.get('only'), body.get('skip') or []
+            plan = stages.plan(None if only is None else stages.parse(','.join(only)),
+                               stages.parse(','.join(skip)))
+            job = self.service.submit(body['path'], bool(body.get('lang_bytes')),
+                                      bool(body.get('no_ignore')),
+                                      None if archive_depth is None else int(archive_depth), plan)
+        except QueueFull as exc:
+            return self._error(503, str(exc))
+        except (ValueError, TypeError, argparse.ArgumentTypeError) as exc:
+            return self._error(400, str(exc))
+        self._send(202, job.state())
+
+    def do_DELETE(self) -> None:
+        match = _ROUTE.match(urlsplit(self.path).path)
+        if not match or match.group(2):
+            return self._error(404, 'нет такого адреса')
+        job = self.service.cancel(match.group(1))
+        if job is None:
+            return self._error(404, 'нет такого задания')
+        if job.status == 'running':
+            return self._error(409, 'задание уже сканируется')
+        self._send(200, job.state())
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        # остаток от прошлого запуска мешает bind
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+        os.chmod(self.server_address, 0o600)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def warm_rules() -> None:
+    # все таблицы правил компилируются до запуска рабочих: при fork они
+    # достаются рабочим уже готовыми
+    from . import patterns
+    for value in vars(patterns).values():
+        if isinstance(value, patterns.LazyTable):
+            for key in value:
+                value[key]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .cli import READ_AHEAD, READ_AHEAD_MB, REGEX_TIMEOUT
+
+    parser = argparse.ArgumentParser(
+        prog='anatooly serve',
+        description='Служба сканирования: очередь заданий и тёплые рабочие процессы, JSON API по HTTP')
+    parser.add_argument('--host', default=HOST, help='Адрес (по умолчанию %(default)s — только локально)')
+    parser.add_argument('--port', type=int, default=PORT, help='Порт (по умолчанию %(default)s)')
+    parser.add_argument('--socket', metavar='PATH', help='Слушать Unix-сокет вместо TCP')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help='Число рабочих процессов на все задания (по умолчанию — все ядра)')
+    parser.add_argument('--max-running', type=int, default=MAX_RUNNING, metavar='N',
+                        help='Сколько заданий сканируется одновременно (по умолчанию %(default)s)')
+    parser.add_argument('--max-queued', type=int, default=MAX_QUEUED, metavar='N',
+                        help='Сколько заданий может ждать в очереди (по умолчанию %(default)s)')
+    parser.add_argument('--keep', type=int, default=KEEP_FINISHED, metavar='N',
+                        help='Сколько завершённых заданий с отчётами держать в памяти')
+    parser.add_argument('--cache-dir', help='Каталог для кэша результатов по файлам между заданиями')
+    parser.add_argument('--regex-timeout', type=float, default=REGEX_TIMEOUT, metavar='SECONDS',
+                        help='Бюджет времени на правила одного файла (0 — без ограничения)')
+    parser.add_argument('--read-ahead', type=int, default=READ_AHEAD, metavar='N',
+                        help='Сколько файлов читать одновременно наперёд (0 — читать по месту)')
+    parser.add_argument('--read-ahead-mb', type=float, default=READ_AHEAD_MB, metavar='MB',
+                        help='Сколько прочитанного наперёд может ждать анализа, МБ')
+    args = parser.parse_args(argv)
+
+    from . import cli
+    # всё, что Analysis импортирует лениво, — заранее: рабочим и первому
+    # заданию ничего не придётся импортировать
+    from .analyzers import (dependency_analyzer, language_analyzer, report_generator,  # noqa: F401
+                            secret_analyzer, stack_analyzer)
+    from .detectors import config_detector, endpoint_detector, header_detector  # noqa: F401
+    from . import pipeline  # noqa: F401
+    warm_rules()
+
+    service = ScanService(args.jobs, args.regex_timeout, cli.make_read_ahead(args), args.cache_dir,
+                          args.max_running, args.max_queued, args.keep)
+    Handler.service = service
+    if args.socket:
+        server = UnixHTTPServer(args.socket, Handler)
+        where = 'unix:%s' % args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), Handler)
+        where = 'http://%s:%d' % server.server_address[:2]
+    server.daemon_threads = True
+
+    scheduler = threading.Thread(target=service.run, name='scheduler', daemon=True)
+    scheduler.start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    sys.stderr.write('anatooly serve: %s, рабочих процессов: %d, заданий одновременно: %d\n'
+                     % (where, service.guard.jobs, service.max_running))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+        service.stop()
+        scheduler.join()
+    return 0
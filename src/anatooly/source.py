@@ -0,0 +1,218 @@
+import mmap
+import os
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy необязателен
+    np = None
+
+_NEWLINE = re.compile(rb'\n')
+_TEXT_NEWLINE = re.compile('\n')
+
+# начиная с какого размера (в байтах) таблицу строк держит numpy
+NUMPY_THRESHOLD = 4 * 1024 * 1024
+# начиная с какого размера файл не читается в память, а отображается через mmap
+MMAP_THRESHOLD = 1024 * 1024
+# в построчном режиме строки длиннее этого (минифицированный код)
+# проверяются кусками такой длины
+LINE_LIMIT = 4 * 1024
+
+# если задан, вызывается перед запуском каждого правила — по нему
+# сторож (см. watchdog) узнаёт, на каком правиле завис рабочий процесс
+TRACE = None
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+def read_data(path: str) -> Buffer:
+    # большие файлы отображаются в память: страницы подгружает ядро,
+    # и в RSS попадает только то, что реально просмотрели регулярки.
+    # Члены архивов (путь «архив!/член») читаются из архива целиком
+    if '!/' in path and not os.path.exists(path):
+        from .archives import read_member
+        return read_member(path)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_text(path: str) -> str:
+    data = read_data(path)
+    try:
+        return bytes(data).decode('utf-8', 'ignore')
+    finally:
+        if not isinstance(data, bytes):
+            data.close()
+
+
+@lru_cache(maxsize=None)
+def _compile_bytes(pattern: str, flags: int) -> 're.Pattern[bytes]':
+    return re.compile(pattern.encode('ascii'), flags & ~re.UNICODE)
+
+
+def as_bytes(regex: 're.Pattern[str]') -> Optional['re.Pattern[bytes]']:
+    """Байтовая версия правила из patterns.py (None, если в нём есть не-ASCII).
+
+    Классы \\w, \\s, \\b и (?i) в байтовом варианте работают только по ASCII.
+    """
+    if not regex.pattern.isascii():
+        return None
+    return _compile_bytes(regex.pattern, regex.flags)
+
+
+def decode(value: Optional[bytes]) -> Optional[str]:
+    # в отчёт попадают только совпавшие фрагменты — декодируются только они
+    return None if value is None else value.decode('utf-8', 'ignore')
+
+
+class SourceFile:
+    """Содержимое файла и таблица начал строк для перевода смещений в номера строк.
+
+    Основное представление — байты (``data``, для больших файлов — mmap),
+    по ним работают байтовые версии правил. Текст декодируется только
+    для визитёров, которым он действительно нужен. Таблица строк строится
+    один раз при первом запросе и общая для всех детекторов; смещения —
+    в байтах, поиск строки — бинарный.
+    """
+
+    # правила применяются к строкам по отдельности (см. LineBoundedSource)
+    bounded = False
+
+    def __init__(self, data: Buffer):
+        self.data = data
+        self._text = None
+        self._starts = None
+        # то же для декодированного текста: смещения в символах, а не в байтах
+        self._text_starts = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = str(self.data, 'utf-8', 'ignore')
+        return self._text
+
+    def _build_starts(self):
+        return [0] + [m.end() for m in _NEWLINE.finditer(self.data)]
+
+    @property
+    def line_starts(self) -> List[int]:
+        if self._starts is None:
+            self._starts = self._build_starts()
+        return self._starts
+
+    def line_of(self, offset: int) -> int:
+        # номер строки с единицы, как в отчёте
+        return bisect_right(self.line_starts, offset)
+
+    def text_line_of(self, offset: int) -> int:
+        # то же для смещения в ``text`` (правила, которые не перевести в байты)
+        if self._text_starts is None:
+            self._text_starts = [0] + [m.end() for m in _TEXT_NEWLINE.finditer(self.text)]
+        return bisect_right(self._text_starts, offset)
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        line = self.line_of(offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def contains(self, regex: 're.Pattern[str]') -> bool:
+        if TRACE is not None:
+            TRACE(regex)
+        pattern = as_bytes(regex)
+        if pattern is None:
+            return regex.search(self.text) is not None
+        return pattern.search(self.data) is not None
+
+    def matches(self, regex: 're.Pattern[str]') -> Iterator[Tuple[int, tuple, Dict[str, Optional[str]]]]:
+        # (номер строки, группы, именованные группы) для каждого совпадения;
+        # правило работает по байтам, декодируются только группы
+        if TRACE is not None:
+            TRACE(regex)
+        pattern = as_bytes(regex)
+        if pattern is None:
+            for m in regex.finditer(self.text):
+                yield self.text_line_of(m.start()), m.groups(), m.groupdict()
+            return
+        for m in pattern.finditer(self.data):
+            yield (self.line_of(m.start()), tuple(decode(g) for g in m.groups()),
+                   {k: decode(v) for k, v in m.groupdict().items()})
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class NumpySourceFile(SourceFile):
+    """То же, но таблица строк в numpy-массиве — для очень больших файлов."""
+
+    def _build_starts(self):
+        codes = np.frombuffer(self.data, dtype=np.uint8)
+        starts = np.concatenate(([0], np.flatnonzero(codes == 10) + 1))
+        del codes  # иначе mmap не закрыть, пока жив вид на буфер
+        return starts
+
+    def line_of(self, offset: int) -> int:
+        return int(np.searchsorted(self.line_starts, offset, side='right'))
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        line = self.line_of(offset)
+        return line, offset - int(self.line_starts[line - 1]) + 1
+
+
+class LineBoundedSource(SourceFile):
+    """Тот же файл, но каждое правило ищется в пределах одной строки.
+
+    Запасной режим для файла, на котором правила не уложились в бюджет
+    времени (см. watchdog): перебор с возвратами ограничен длиной строки,
+    а слишком длинные строки режутся на куски по ``LINE_LIMIT``. Совпадения,
+    которые переходят через перевод строки, в этом режиме теряются.
+    """
+    bounded = True
+
+    def _segments(self) -> Iterator[Tuple[int, int]]:
+        starts = self.line_starts
+        size = len(self.data)
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else size
+            for pos in range(start, max(end, start + 1), LINE_LIMIT):
+                yield pos, min(end, pos + LINE_LIMIT)
+
+    def _lines(self) -> Iterator[Tuple[int, str]]:
+        for line_no, line in enumerate(self.text.split('\n'), start=1):
+            for pos in range(0, max(len(line), 1), LINE_LIMIT):
+                yield line_no, line[pos:pos + LINE_LIMIT]
+
+    def contains(self, regex: 're.Pattern[str]') -> bool:
+        if TRACE is not None:
+            TRACE(regex)
+        pattern = as_bytes(regex)
+        if pattern is None:
+            return any(regex.search(line) for _, line in self._lines())
+        return any(pattern.search(self.data, start, end) for start, end in self._segments())
+
+    def matches(self, regex: 're.Pattern[str]') -> Iterator[Tuple[int, tuple, Dict[str, Optional[str]]]]:
+        if TRACE is not None:
+            TRACE(regex)
+        pattern = as_bytes(regex)
+        if pattern is None:
+            for line_no, line in self._lines():
+                for m in regex.finditer(line):
+                    yield line_no, m.groups(), m.groupdict()
+            return
+        for start, end in self._segments():
+            for m in pattern.finditer(self.data, start, end):
+                yield (self.line_of(m.start()), tuple(decode(g) for g in m.groups()),
+                       {k: decode(v) for k, v in m.groupdict().items()})
+
+
+def make_source(data: Buffer, bounded: bool = False) -> SourceFile:
+    if bounded:
+        return LineBoundedSource(data)
+    if np is not None and len(data) >= NUMPY_THRESHOLD:
+        return NumpySourceFile(data)
+    return SourceFile(data)
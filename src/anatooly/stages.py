@@ -0,0 +1,75 @@
+import argparse
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# стадия -> стадии, без результатов которых её не посчитать. walk — языки по
+# именам файлов, без чтения: из неё основной язык (стеку и зависимостям) и
+# активные языки (эндпоинтам и заголовкам). В стек вливаются найденное в
+# зависимостях и конфигах, поэтому и они — его входы
+GRAPH: Dict[str, Tuple[str, ...]] = {
+    'walk':         (),
+    'languages':    ('walk',),
+    'dependencies': ('walk',),
+    'configs':      (),
+    'stack':        ('walk', 'dependencies', 'configs'),
+    'secrets':      (),
+    'endpoints':    ('walk',),
+    'headers':      ('walk',),
+}
+
+# разделы отчёта каждой стадии; walk своего раздела не даёт
+SECTIONS: Dict[str, Tuple[str, ...]] = {
+    'languages':    ('languages', 'languages_bytes', 'sloc'),
+    'stack':        ('stack',),
+    'dependencies': ('dependencies',),
+    'secrets':      ('secrets',),
+    'endpoints':    ('endpoints', 'ajax'),
+    'headers':      ('headers',),
+    'configs':      ('configs', 'config_secrets'),
+}
+
+# стадии, которые можно выбрать в --only/--skip, в порядке отчёта
+STAGES = list(SECTIONS)
+
+
+class Plan(NamedTuple):
+    """Что считать и что отдавать в отчёт."""
+    # стадии к запуску: каждая после своих входов
+    run: List[str]
+    # стадии, чьи разделы попадают в отчёт
+    emit: Set[str]
+
+
+def parse(value: str) -> List[str]:
+    # для argparse: "endpoints,headers" -> ['endpoints', 'headers']
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError('неизвестные стадии: %s (есть: %s)'
+                                         % (', '.join(unknown), ', '.join(STAGES)))
+    return names
+
+
+def plan(only: Optional[Iterable[str]] = None, skip: Iterable[str] = ()) -> Plan:
+    """План для ``--only``/``--skip``.
+
+    В отчёт попадают выбранные стадии (по умолчанию все) без пропущенных;
+    запускаются они и всё, от чего они зависят. Пропущенная стадия, нужная
+    выбранной, всё равно считается, но в отчёт не попадает.
+    """
+    emit = set(STAGES if only is None else only) - set(skip)
+    run: List[str] = []
+
+    def visit(stage: str) -> None:
+        if stage in run:
+            return
+        for dep in GRAPH[stage]:
+            visit(dep)
+        run.append(stage)
+
+    for stage in GRAPH:
+        if stage in emit:
+            visit(stage)
+    return Plan(run, emit)
+
+
+FULL = plan()
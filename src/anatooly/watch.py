@@ -0,0 +1,398 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import archives, stages
+from .ignore import IGNORE_FILES
+
+# события inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+         | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct('iIII')
+
+# тишина после последнего события, после которой идёт пересканирование, с
+DEBOUNCE = 0.3
+# период опроса, если inotify недоступен, с
+POLL_INTERVAL = 1.0
+
+
+class Changes:
+    """Накопленные между пересканированиями изменения: пути от корня."""
+
+    def __init__(self):
+        self.paths: Set[str] = set()
+        # появились/исчезли каталоги (при опросе — и файлы) или события потерялись
+        self.structural = False
+
+    def __bool__(self) -> bool:
+        return bool(self.paths) or self.structural
+
+
+class InotifyWatcher:
+    """Наблюдение за каталогами дерева через inotify (Linux, через ctypes)."""
+
+    def __init__(self, root: str, dirs: Iterable[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.root = root
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches: Dict[int, str] = {}
+        try:
+            self.sync(dirs)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, rel: str) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(os.path.join(self.root, rel)), _MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            # кончился лимит fs.inotify.max_user_watches — дальше только опрос
+            if err == errno.ENOSPC:
+                raise OSError(err, os.strerror(err))
+            return
+        self.watches[wd] = rel
+
+    def sync(self, dirs: Iterable[str]) -> None:
+        known = set(self.watches.values())
+        for rel in dirs:
+            if rel not in known:
+                self.add(rel)
+
+    def poll(self, timeout: Optional[float], changes: Changes) -> bool:
+        """Ждёт события не дольше ``timeout`` и добавляет их в ``changes``."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            self._parse(data, changes)
+        return True
+
+    def _parse(self, data: bytes, changes: Changes) -> None:
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0'))
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changes.structural = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            rel_dir = self.watches.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_ISDIR or not name:
+                # новые каталоги получают наблюдение при следующем sync
+                changes.structural = True
+                continue
+            # появился файл или исчез — WatchSession видит по описи и диску
+            changes.paths.add(os.path.join(rel_dir, name))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Запасной вариант без inotify: опрос размеров и mtime раз в ``interval``."""
+
+    def __init__(self, root: str, ignore, interval: float = POLL_INTERVAL):
+        self.root = root
+        self.ignore = ignore
+        self.interval = interval
+        self.snapshot = self._snapshot()
+        self.next_poll = time.monotonic() + interval
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        from .inventory import FileInventory
+        out = {}
+        for e in FileInventory.scan(self.root, self.ignore).entries:
+            try:
+                st = os.stat(e.path)
+            except OSError:
+                continue
+            out[e.rel] = (st.st_size, st.st_mtime_ns)
+        return out
+
+    def sync(self, dirs: Iterable[str]) -> None:
+        pass
+
+    def poll(self, timeout: Optional[float], changes: Changes) -> bool:
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if end is not None and now >= end:
+                return False
+            wake = self.next_poll if end is None else min(self.next_poll, end)
+            time.sleep(max(0.0, wake - now))
+            if time.monotonic() < self.next_poll:
+                continue
+            self.next_poll = time.monotonic() + self.interval
+            snapshot = self._snapshot()
+            if snapshot.keys() != self.snapshot.keys():
+                changes.structural = True
+            changed = {rel for rel, stamp in snapshot.items() if self.snapshot.get(rel) != stamp}
+            changed |= self.snapshot.keys() - snapshot.keys()
+            self.snapshot = snapshot
+            if changed:
+                changes.paths |= changed
+                return True
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(root: str, ignore, dirs: Iterable[str]):
+    try:
+        return InotifyWatcher(root, dirs)
+    except (OSError, AttributeError) as exc:
+        # не Linux, нет libc или кончились наблюдения
+        sys.stderr.write('inotify недоступен (%s), изменения ищутся опросом раз в %.0f с\n'
+                         % (exc, POLL_INTERVAL))
+        return PollingWatcher(root, ignore)
+
+
+class WatchSession:
+    """Результаты по каждому файлу живут в памяти между пересканированиями.
+
+    Первый проход и проходы после изменения списка файлов — тот же анализ,
+    что и у обычного запуска, но с кэшем в памяти (cache.MemoryCache). Если
+    поменялось только содержимое файлов, анализ не строится заново: вклад
+    изменённых файлов убирается из визитёров (FileVisitor.unmerge), файлы
+    сканируются и сливаются снова, остальные не трогаются вовсе — ни stat,
+    ни кэш, ни wants.
+    """
+
+    def __init__(self, args):
+        from .cache import MemoryCache
+        self.args = args
+        self.cache = MemoryCache()
+        self.ignore = self._ignore()
+        self.inventory = None
+        self.plan = stages.plan(args.only, args.skip)
+        self.pipeline = None
+        self.analysis = None
+        # пересобирался ли анализ в последнем проходе (менялись каталоги)
+        self.rebuilt = False
+
+    def _ignore(self):
+        from .cli import make_ignore
+        return make_ignore(self.args)
+
+    def relevant(self, changes: Changes) -> Changes:
+        # изменения в пропускаемых путях не в счёт
+        out = Changes()
+        out.structural = changes.structural
+        for rel in changes.paths:
+            if os.path.basename(rel) in IGNORE_FILES or not self.ignore.excludes(rel):
+                out.paths.add(rel)
+        return out
+
+    def run(self, changes: Optional[Changes] = None) -> Dict[str, Any]:
+        args = self.args
+        if changes is not None:
+            if any(os.path.basename(rel) in IGNORE_FILES for rel in changes.paths):
+                self.ignore = self._ignore()
+                self.inventory = None
+            elif changes.structural or self.inventory is None:
+                self.inventory = None
+            else:
+                modified = self._modified(changes.paths)
+                if modified is None:
+                    self.inventory = None
+                else:
+                    results = self._update(modified)
+                    if results is not None:
+                        return results
+            self.cache.forget(os.path.join(args.path, rel) for rel in changes.paths)
+        return self._rebuild()
+
+    def _rebuild(self) -> Dict[str, Any]:
+        from .cli import Analysis, make_read_ahead
+        from .pipeline import FilePipeline
+
+        args = self.args
+        self.pipeline = FilePipeline(args.path, jobs=args.jobs, cache=self.cache, ignore=self.ignore,
+                                     regex_timeout=args.regex_timeout, read_ahead=make_read_ahead(args),
+                                     archive_depth=args.archive_depth, inventory=self.inventory)
+        self.pipeline.partials = {}
+        self.analysis = Analysis(args.path, self.pipeline, args.lang_bytes, plan=self.plan)
+        self.pipeline.run(self.analysis.visitors)
+        self.inventory = self.pipeline.inventory
+        self.rebuilt = True
+        return self.analysis.results()
+
+    def _modified(self, rels: Set[str]) -> Optional[Set[str]]:
+        # изменённые файлы описи; None — менялся список файлов (нужен полный
+        # проход). Путей, которых нет ни в описи, ни на диске (временные
+        # файлы редакторов), будто и не было
+        modified = set()
+        for rel in rels:
+            exists = os.path.isfile(os.path.join(self.args.path, rel))
+            if rel in self.inventory.by_rel:
+                if not exists or archives.kind(rel):
+                    return None
+                modified.add(rel)
+            elif exists:
+                return None
+        return modified
+
+    def _update(self, rels: Set[str]) -> Optional[Dict[str, Any]]:
+        # None — какой-то визитёр не смог убрать вклад файла: состояние
+        # анализа уже не годится, нужен полный проход
+        pipeline, analysis = self.pipeline, self.analysis
+        visitors, partials = analysis.visitors, pipeline.partials
+        self.rebuilt = False
+        entries = [self.inventory.by_rel[rel] for rel in sorted(rels)]
+        self.cache.forget(e.path for e in entries)
+        for e in entries:
+            if not self._unmerge(visitors, e, partials.pop(e.path, {})):
+                return None
+        plan = []
+        for e in entries:
+            try:
+                st = os.stat(e.path)
+            except OSError:
+                st = None
+            plan.append((e.path, e.rel, st, {}, {}, None, True))
+        reopened = self._reopened(visitors, rels)
+        if reopened is None:
+            return None
+        plan.extend(reopened)
+        swept = {row[1] for row in plan}
+        pipeline.timeouts[:] = [r for r in pipeline.timeouts if r['file'] not in swept]
+        pipeline.rescan(visitors, plan)
+        if analysis.distro_bytes is not None:
+            self.inventory = pipeline._inventory = self._touch(rels)
+            analysis.distro_bytes = analysis.lang_analyzer.detect_languages(by_bytes=True)
+        return analysis.results()
+
+    @staticmethod
+    def _unmerge(visitors, entry, merged: Dict[int, Any]) -> bool:
+        return all([visitors[i].unmerge(entry.path, entry.rel, partial) for i, partial in merged.items()])
+
+    def _reopened(self, visitors, rels: Set[str]) -> Optional[List[tuple]]:
+        # визитёр снова ищет то, что нашлось только в изменённом файле:
+        # файлы, где он этого уже не искал, сканируются для него заново
+        plan: List[tuple] = []
+        reopened = [i for i, v in enumerate(visitors) if v.reopened()]
+        if not reopened:
+            return plan
+        partials = self.pipeline.partials
+        for e in self.inventory.entries:
+            if e.rel in rels:
+                continue
+            merged = partials.get(e.path, {})
+            stale = [i for i in reopened if visitors[i].wants(e.path, e.rel)
+                     and (i not in merged or not visitors[i].from_cache(merged[i])[0])]
+            if not stale:
+                continue
+            partials.pop(e.path, None)
+            if not self._unmerge(visitors, e, merged):
+                return None
+            hits = {i: partial for i, partial in merged.items() if i not in stale}
+            try:
+                st = os.stat(archives.outer(e.path))
+            except OSError:
+                st = None
+            plan.append((e.path, e.rel, st, hits, {}, None, True))
+        return plan
+
+    def _touch(self, rels: Set[str]):
+        # только содержимое поменялось: в описи обновляются размеры
+        from .inventory import FileInventory
+        entries = []
+        for e in self.inventory.entries:
+            if e.rel in rels:
+                try:
+                    e = e._replace(size=os.stat(e.path).st_size)
+                except OSError:
+                    pass
+            entries.append(e)
+        return FileInventory(self.inventory.directory, entries, self.inventory.dirs)
+
+    def watched_dirs(self) -> Iterable[str]:
+        yield ''
+        for rel in self.inventory.dirs:
+            if not self.ignore.excludes(rel, True):
+                yield rel
+
+
+def emit(args, results: Dict[str, Any]) -> None:
+    from .analyzers.report_generator import JsonLinesWriter, ReportGenerator
+    output = args.output or ('report.html' if args.format == 'html' else None)
+    if not output or output == '-' or args.format == 'console':
+        ReportGenerator(args.format, output, compact=args.compact, root=args.path).generate(results)
+        sys.stdout.flush()
+        return
+    # файл отчёта подменяется целиком: читатель не увидит его наполовину.
+    # Временное имя с тем же окончанием — по нему выбирается сжатие jsonl
+    head, tail = os.path.split(output)
+    tmp = os.path.join(head, '.%d.%s' % (os.getpid(), tail))
+    writer = JsonLinesWriter(tmp, args.compress) if args.format == 'jsonl' else None
+    ReportGenerator(args.format, tmp, writer, args.compact, args.path).generate(results)
+    if writer is not None:
+        writer.close()
+    os.replace(tmp, output)
+
+
+def watch(args) -> int:
+    """``anatooly --watch``: отчёт заново после каждой пачки изменений."""
+    session = WatchSession(args)
+    start = time.perf_counter()
+    emit(args, session.run())
+    sys.stderr.write('[%s] просканировано за %.2f с, жду изменений (Ctrl+C — выход)\n'
+                     % (time.strftime('%H:%M:%S'), time.perf_counter() - start))
+    watcher = make_watcher(args.path, session.ignore, session.watched_dirs())
+    try:
+        while True:
+            changes = Changes()
+            watcher.poll(None, changes)
+            # пачка сохранений (редактор, git checkout) — одно пересканирование
+            while watcher.poll(DEBOUNCE, changes):
+                pass
+            changes = session.relevant(changes)
+            if not changes:
+                continue
+            start = time.perf_counter()
+            emit(args, session.run(changes))
+            if session.rebuilt:
+                watcher.sync(session.watched_dirs())
+            shown = sorted(changes.paths)
+            sys.stderr.write('[%s] изменено: %s%s — пересканировано за %.2f с\n' % (
+                time.strftime('%H:%M:%S'), ', '.join(shown[:5]) or 'список файлов',
+                ' и ещё %d' % (len(shown) - 5) if len(shown) > 5 else '',
+                time.perf_counter() - start))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
@@ -0,0 +1,352 @@
+import multiprocessing
+import pickle
+import time
+from collections import OrderedDict, deque
+from multiprocessing.connection import wait
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import profiling, source as source_module
+from .prefetch import Prefetcher, ReadAhead
+
+# длина ячейки, в которую рабочий процесс пишет текущую стадию и правило
+_SLOT = 512
+# сколько файлов отправлено рабочему наперёд: он не простаивает, пока
+# основной процесс забирает ответ по предыдущему
+IN_FLIGHT = 8
+# сколько проходов (наборов визитёров) рабочий держит одновременно
+PASSES = 4
+
+# источник проходов пока пуст, но не исчерпан (см. GuardedScanner.idle)
+_LATER = object()
+
+# текущая стадия в рабочем процессе — к ней добавляется правило из TRACE
+_stage = ''
+
+
+def _mark(slot, stage: str, pattern: Any = '') -> None:
+    if isinstance(pattern, bytes):
+        pattern = pattern.decode('latin-1')
+    slot.value = ('%s\t%s' % (stage, pattern)).encode('utf-8', 'ignore')[:_SLOT - 1]
+
+
+class _Traced:
+    """Визитёр рабочего процесса, который перед scan отмечает свою стадию."""
+
+    def __init__(self, visitor, slot):
+        self._visitor = visitor
+        self._slot = slot
+        self.stage = visitor.stage or type(visitor).__name__
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._visitor, name)
+
+    def scan(self, path: str, rel: str, source) -> Any:
+        global _stage
+        _stage = self.stage
+        _mark(self._slot, _stage)
+        return self._visitor.scan(path, rel, source)
+
+
+def _serve(conn, profile: bool, slot, read_ahead: Optional[ReadAhead], opener) -> None:
+    # рабочий процесс: по одному файлу за раз, ответ — сразу по готовности.
+    # Визитёры приходят отдельным сообщением на каждый проход (ключ прохода
+    # есть в каждой задаче): один рабочий служит нескольким проходам подряд
+    from .pipeline import scan_file, wants_content
+    passes: Dict[int, Tuple[List, bool]] = {}
+    source_module.TRACE = lambda regex: _mark(slot, _stage, regex.pattern)
+    prefetch = Prefetcher(read_ahead or ReadAhead(threads=0), opener)
+    pending: Deque[tuple] = deque()
+    try:
+        while True:
+            # забираем всё, что уже прислали: эти файлы читаются наперёд
+            while not pending or conn.poll():
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    return
+                if message is None:
+                    return
+                if message[0] == 'load':
+                    _, key, blob, hashing = message
+                    passes[key] = [_Traced(v, slot) for v in pickle.loads(blob)], hashing
+                    continue
+                if message[0] == 'forget':
+                    passes.pop(message[1], None)
+                    continue
+                pending.append(message)
+                index, key, (path, rel, skip, stale, verify), _ = message
+                if wants_content(passes[key][0], path, rel, skip, stale, verify):
+                    prefetch.push(index, path)
+            index, key, (path, rel, skip, stale, verify), bounded = pending.popleft()
+            visitors, hashing = passes[key]
+            slot.value = b''
+            local = profiling.enable() if profile else None
+            try:
+                result = scan_file(visitors, path, rel, skip, stale, verify, hashing, bounded,
+                                   reader=lambda p: prefetch.take(index, p))
+            except Exception as exc:
+                result = exc
+            finally:
+                profiling.disable()
+                prefetch.discard(index)
+            conn.send((index, result, local.state() if local is not None else None))
+    finally:
+        prefetch.close()
+
+
+class _Worker:
+    def __init__(self, ctx, profile: bool, read_ahead: Optional[ReadAhead], opener):
+        self.conn, child = ctx.Pipe()
+        self.slot = ctx.Array('c', _SLOT, lock=False)
+        self.process = ctx.Process(target=_serve, daemon=True,
+                                   args=(child, profile, self.slot, read_ahead, opener))
+        self.process.start()
+        child.close()
+        # отправленные и ещё не отвеченные задачи; первая — та, что в работе
+        self.inflight: Deque[Tuple[int, int, tuple, bool]] = deque()
+        self.deadline = 0.0
+        # проходы, чьи визитёры уже у рабочего, — от давно не нужных к свежим
+        self.passes: 'OrderedDict[int, None]' = OrderedDict()
+
+    def send(self, item: Tuple[int, int, tuple, bool], budget: Optional[float],
+             blobs: Dict[int, Tuple[bytes, bool]]) -> None:
+        key = item[1]
+        if key in self.passes:
+            self.passes.move_to_end(key)
+        else:
+            # лишние проходы забываются, если их задач у рабочего не осталось
+            busy = {k for _, k, _, _ in self.inflight}
+            for old in [k for k in self.passes if k not in busy][:max(0, len(self.passes) + 1 - PASSES)]:
+                del self.passes[old]
+                self.conn.send(('forget', old))
+            blob, hashing = blobs[key]
+            self.conn.send(('load', key, blob, hashing))
+            self.passes[key] = None
+        if not self.inflight:
+            self.deadline = _deadline(budget)
+        self.inflight.append(item)
+        self.conn.send(item)
+
+    def done(self, budget: Optional[float]) -> None:
+        # ответ пришёл по первой задаче — отсчёт бюджета начинается для следующей
+        self.inflight.popleft()
+        self.deadline = _deadline(budget)
+
+    def where(self) -> Tuple[Optional[str], Optional[str]]:
+        stage, _, rule = self.slot.value.decode('utf-8', 'ignore').partition('\t')
+        return stage or None, rule or None
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _deadline(budget: Optional[float]) -> float:
+    return time.monotonic() + budget if budget else float('inf')
+
+
+class GuardedScanner:
+    """Сканирование в рабочих процессах, которые можно убить по таймауту.
+
+    У ``re`` нет таймаута, а катастрофический перебор с возвратами держит
+    GIL, поэтому прервать правило можно только вместе с процессом. Каждый
+    рабочий получает по одному файлу; если ответа нет дольше ``budget``
+    секунд, процесс убивается и заменяется новым, а файл сканируется заново
+    построчно (source.LineBoundedSource). Если и так не уложились — файл
+    пропускается. Каждый такой случай попадает в ``timeouts`` прохода:
+    файл, стадия и правило, на котором процесс завис (если это было
+    отдельное правило). ``budget`` None — без ограничения времени.
+    Файлы, отправленные рабочему наперёд, он читает заранее (``read_ahead``).
+
+    Проходов может быть много (scan-many): задачи следующего берутся, пока
+    рабочие доделывают предыдущий, так что ядра не простаивают на стыках.
+    Источник проходов может вместо прохода дать None — «пока нечего» (serve):
+    тогда сканер занимается уже начатым и спросит снова; ``idle`` говорит
+    источнику, что ждать нечего и можно блокироваться до новой работы.
+    ``prespawn`` запускает все рабочие процессы сразу, а не по первой задаче.
+    """
+
+    def __init__(self, jobs: int, budget: Optional[float],
+                 read_ahead: Optional[ReadAhead] = None, opener=source_module.read_data,
+                 prespawn: bool = False):
+        self.jobs = max(1, jobs)
+        self.budget = budget
+        self.read_ahead = read_ahead
+        self.opener = opener
+        self.prespawn = prespawn
+        self.ctx = multiprocessing.get_context()
+        # ни задач в очереди, ни ответов в ожидании
+        self.idle = True
+        # при упреждающем чтении рабочему отправляется столько файлов,
+        # сколько он может читать наперёд
+        self.in_flight = max(IN_FLIGHT, read_ahead.depth if read_ahead and read_ahead.threads > 0 else 0)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self.ctx, profiling.ACTIVE is not None, self.read_ahead, self.opener)
+
+    def scan(self, passes: Iterable) -> Iterator[Tuple[Any, Tuple[Optional[str], Optional[List[Any]]]]]:
+        """(проход, результат scan_file) по задачам всех проходов — в их порядке.
+
+        Проходы (pipeline.ScanPass) берутся из ``passes`` по мере того, как
+        рабочим нужны новые задачи. Если визитёр прохода упал, вместо
+        результата приходит исключение — один раз на проход, остальные его
+        задачи отбрасываются; другие проходы сканируются дальше.
+        """
+        source = self._items(passes)
+        owners: Dict[int, Any] = {}
+        blobs: Dict[int, Tuple[bytes, bool]] = {}
+        remaining: Dict[int, int] = {}
+        queue: Deque[Tuple[int, int, tuple, bool]] = deque()
+        done: Dict[int, Tuple[Optional[str], Optional[List[Any]]]] = {}
+        records: Dict[int, Dict[str, Any]] = {}
+        # упавшие проходы -> исключение, о котором уже сообщено (или будет)
+        failed: Dict[int, Exception] = {}
+        workers: List[_Worker] = [self._spawn() for _ in range(self.jobs)] if self.prespawn else []
+        exhausted = False
+        total = next_out = 0
+        try:
+            while True:
+                # очередь пополняется из проходов, пока рабочим есть что брать
+                while not exhausted and len(queue) < self.jobs * self.in_flight:
+                    self.idle = not queue and not any(w.inflight for w in workers)
+                    item = next(source, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    if item is _LATER:
+                        break
+                    key, scan, task = item
+                    if key in failed:
+                        # задачи упавшего прохода не сканируются
+                        remaining[key] -= 1
+                        if not remaining[key]:
+                            self._retire(key, remaining, blobs, workers)
+                        continue
+                    if key not in remaining:
+                        remaining[key] = len(scan.tasks)
+                        try:
+                            blobs[key] = pickle.dumps(scan.visitors), scan.hashing
+                        except Exception as exc:
+                            # визитёры не передать рабочим — проход упал сразу
+                            failed[key] = done[total] = exc
+                            owners[total] = key, scan
+                            total += 1
+                            continue
+                    owners[total] = key, scan
+                    queue.append((total, key, task, False))
+                    total += 1
+                if exhausted and next_out == total:
+                    break
+                busy = sum(len(w.inflight) for w in workers)
+                while len(workers) < min(self.jobs, busy + len(queue)):
+                    workers.append(self._spawn())
+                for w in workers:
+                    # построчный повтор идёт один: его бюджет не делится с другими
+                    while queue and len(w.inflight) < self.in_flight and not (
+                            w.inflight and (queue[0][3] or w.inflight[-1][3])):
+                        w.send(queue.popleft(), self.budget, blobs)
+                busy = [w for w in workers if w.inflight]
+                if not busy:
+                    continue
+                timeout = min(w.deadline for w in busy) - time.monotonic()
+                ready = wait([w.conn for w in busy], max(0.0, timeout) if timeout != float('inf') else None)
+                for i, w in enumerate(workers):
+                    if not w.inflight:
+                        continue
+                    if w.conn in ready:
+                        try:
+                            index, result, state = w.conn.recv()
+                        except (EOFError, OSError):
+                            # процесс умер сам (например, не хватило памяти)
+                            workers[i] = self._expire(w, queue, done, records, owners, 'crashed')
+                            continue
+                        w.done(self.budget)
+                        if isinstance(result, Exception):
+                            self._failed(index, result, failed, owners, queue, done)
+                            continue
+                        if state is not None:
+                            profiling.ACTIVE.merge(state)
+                        done[index] = result
+                    elif time.monotonic() >= w.deadline:
+                        workers[i] = self._expire(w, queue, done, records, owners, 'timeout')
+                while next_out in done:
+                    key, scan = owners.pop(next_out)
+                    result = done.pop(next_out)
+                    # от упавшего прохода — только его исключение
+                    if key not in failed or result is failed[key]:
+                        yield scan, result
+                    records.pop(next_out, None)
+                    next_out += 1
+                    remaining[key] -= 1
+                    if not remaining[key]:
+                        self._retire(key, remaining, blobs, workers)
+        finally:
+            for w in workers:
+                w.close()
+
+    @staticmethod
+    def _retire(key: int, remaining: Dict, blobs: Dict, workers: List[_Worker]) -> None:
+        # проход закончен — его визитёры рабочим больше не нужны
+        del remaining[key]
+        blobs.pop(key, None)
+        for w in workers:
+            if w.passes.pop(key, 0) is None:
+                w.conn.send(('forget', key))
+
+    @staticmethod
+    def _failed(index: int, exc: Exception, failed: Dict, owners: Dict, queue: Deque,
+                done: Dict) -> None:
+        # исключение визитёра касается только его прохода: оно встаёт на место
+        # результата задачи, а ещё не отправленные задачи прохода снимаются
+        key = owners[index][0]
+        if key in failed:
+            done[index] = None
+            return
+        failed[key] = done[index] = exc
+        for item in [item for item in queue if item[1] == key]:
+            queue.remove(item)
+            done[item[0]] = None
+
+    @staticmethod
+    def _items(passes: Iterable) -> Iterator[Any]:
+        for key, scan in enumerate(passes):
+            if scan is None:
+                yield _LATER
+                continue
+            for task in scan.tasks:
+                yield key, scan, task
+
+    def _expire(self, worker: _Worker, queue: Deque, done: Dict, records: Dict,
+                owners: Dict, reason: str) -> _Worker:
+        index, key, task, bounded = worker.inflight.popleft()
+        stage, rule = worker.where()
+        worker.kill()
+        # остальные отправленные этому рабочему задачи — обратно в очередь
+        queue.extendleft(reversed(worker.inflight))
+        scan = owners[index][1]
+        path, rel = task[0], task[1]
+        scan.degraded.add(path)
+        if not bounded:
+            records[index] = {
+                'file': rel, 'stage': stage, 'rule': rule, 'reason': reason,
+                'budget_s': self.budget, 'fallback': 'lines',
+            }
+            scan.timeouts.append(records[index])
+            queue.appendleft((index, key, task, True))
+        else:
+            # построчно тоже не уложились — файл пропускается целиком
+            records[index]['fallback'] = 'skipped'
+            done[index] = (None, None)
+        return self._spawn()
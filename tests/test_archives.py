@@ -0,0 +1,46 @@
+import io
+import os
+import tarfile
+import zipfile
+
+from anatooly import archives
+
+from conftest import write_tree
+
+
+def make_tar_gz(path, files):
+    with tarfile.open(path, 'w:gz') as tf:
+        for name, text in files.items():
+            data = text.encode('utf-8')
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+
+def test_compressed_tar_is_decompressed_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'bundle.tar.gz')
+    files = {'a.py': 'a = 1\n', 'lib/b.js': "app.get('/b', h);\n", 'c.txt': 'c\n'}
+    make_tar_gz(path, files)
+    opened = []
+    fileobj = archives._fileobj
+    monkeypatch.setattr(archives, '_fileobj', lambda p: opened.append(p) or fileobj(p))
+    archives.close_all()
+    try:
+        listing = list(archives.members(path))
+        assert sorted(name for name, _ in listing) == sorted(files)
+        for name, _ in listing:
+            assert archives.read_member(path + archives.SEP + name).decode('utf-8') == files[name]
+    finally:
+        archives.close_all()
+    # опись и чтение всех членов — одна распаковка
+    assert opened == [path]
+
+
+def test_members_count_in_languages_and_sloc(tmp_path, scan):
+    repo = write_tree(tmp_path / 'repo', {'app.py': 'x = 1\n'})
+    with zipfile.ZipFile(os.path.join(repo, 'lib.jar'), 'w') as zf:
+        zf.writestr('com/x/App.java', 'class App {\n}\n')
+    with_members = scan(repo, '-j', '1')
+    assert with_members['sloc']['by_lang'].get('Java') == 2
+    without = scan(repo, '-j', '1', '--archive-depth', '0')
+    assert 'Java' not in without['sloc']['by_lang']
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+
+def cache_paths(cache_dir):
+    db = sqlite3.connect(os.path.join(str(cache_dir), 'scan-cache.sqlite3'))
+    try:
+        return sorted(path for path, in db.execute('SELECT DISTINCT path FROM entries'))
+    finally:
+        db.close()
+
+
+def test_relative_path_keys_do_not_depend_on_cwd(repo, tmp_path, scan, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    parent, name = os.path.split(repo)
+
+    monkeypatch.chdir(parent)
+    first = scan(name, '-j', '1', '--cache-dir', cache_dir)
+    paths = cache_paths(cache_dir)
+    assert paths and all(os.path.isabs(path) and path.startswith(repo) for path in paths)
+
+    # тот же проект, но другой относительный путь: записи те же, новых нет
+    monkeypatch.chdir(os.path.join(repo, 'web'))
+    second = scan('..', '-j', '1', '--cache-dir', cache_dir)
+    assert cache_paths(cache_dir) == paths
+    assert second['endpoints'] == first['endpoints']
+    assert second['sloc'] == first['sloc']
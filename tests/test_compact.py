@@ -0,0 +1,8 @@
+from anatooly.findings import expand
+
+
+def test_compact_report_expands_to_full_report(repo, scan):
+    full = scan(repo, '-j', '1')
+    compact = scan(repo, '-j', '1', '--compact')
+    assert 'paths' in compact and compact != full
+    assert expand(compact) == full
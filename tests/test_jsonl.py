@@ -0,0 +1,31 @@
+import json
+
+from anatooly.analyzers.report_generator import ReportGenerator
+
+from conftest import run_cli
+
+
+def read_jsonl(path):
+    with open(str(path), encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_config_secrets_have_own_type_and_relative_paths(repo, tmp_path, monkeypatch):
+    output = tmp_path / 'report.jsonl'
+    run_cli(monkeypatch, repo, '--format', 'jsonl', '--output', output, '-j', '1')
+    records = read_jsonl(output)
+
+    config = [r for r in records if r['type'] == 'config_secret']
+    assert config == [{'type': 'config_secret', 'file': '.env', 'value': 'hunter2hunter2'}]
+    secrets = [r for r in records if r['type'] == 'secret']
+    assert secrets and all('fingerprint' in r for r in secrets)
+    # корень сканирования не утекает ни в одну запись с файлом
+    assert not [r for r in records if repo in str(r.get('file', ''))]
+
+
+def test_config_secrets_outside_stream_are_relative(tmp_path):
+    # так пишутся отчёты, собранные не потоком (--since, --watch)
+    output = tmp_path / 'report.jsonl'
+    results = {'config_secrets': [('/srv/app/conf/.env', ['s3cret'])]}
+    ReportGenerator('jsonl', str(output), root='/srv/app').generate(results)
+    assert read_jsonl(output)[0] == {'type': 'config_secret', 'file': 'conf/.env', 'value': 's3cret'}
@@ -0,0 +1,38 @@
+import pytest
+
+from anatooly import watchdog
+
+from conftest import FILES, run_cli, write_tree
+
+
+@pytest.fixture
+def big_repo(tmp_path):
+    # задач больше, чем BATCH_SIZE: -jN идёт через пул процессов пачками
+    files = dict(FILES)
+    for i in range(150):
+        files['web/routes%d.js' % i] = "app.get('/api/r%d', h);\nfetch('/api/f%d');\n" % (i, i)
+        files['py/mod%d.py' % i] = "@app.route('/p%d')\ndef view():\n    return %d\n" % (i, i)
+    return write_tree(tmp_path / 'big', files)
+
+
+def report_bytes(monkeypatch, tmp_path, path, *argv):
+    output = tmp_path / ('report%s.json' % '_'.join(argv).replace('-', ''))
+    run_cli(monkeypatch, path, '--format', 'json', '--output', output, *argv)
+    return output.read_bytes()
+
+
+def test_jobs_and_budget_give_identical_reports(big_repo, tmp_path, monkeypatch):
+    serial = report_bytes(monkeypatch, tmp_path, big_repo, '-j', '1')
+    assert b'/api/r149' in serial
+    assert report_bytes(monkeypatch, tmp_path, big_repo, '-j', '3') == serial
+    assert report_bytes(monkeypatch, tmp_path, big_repo, '-j', '1', '--regex-timeout', '10') == serial
+    assert report_bytes(monkeypatch, tmp_path, big_repo, '-j', '3', '--regex-timeout', '10') == serial
+
+
+def test_budget_is_opt_in(big_repo, tmp_path, monkeypatch):
+    # без --regex-timeout рабочие-сторожа не запускаются ни при -j1, ни при -jN
+    def forbidden(*args, **kwargs):
+        raise AssertionError('GuardedScanner без --regex-timeout')
+    monkeypatch.setattr(watchdog, 'GuardedScanner', forbidden)
+    report_bytes(monkeypatch, tmp_path, big_repo, '-j', '1')
+    report_bytes(monkeypatch, tmp_path, big_repo, '-j', '3')
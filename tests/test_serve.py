@@ -0,0 +1,35 @@
+import threading
+
+from anatooly import serve
+from anatooly.analyzers.language_analyzer import LanguageAnalyzer
+
+from conftest import write_tree
+
+
+def test_failed_merge_fails_only_its_job(tmp_path, monkeypatch):
+    # файлов больше, чем помещается в одну порцию рабочего: после ошибки
+    # в задание A ещё приходят результаты его файлов
+    files = {'m%d.py' % i: 'x = %d\n' % i for i in range(40)}
+    a = write_tree(tmp_path / 'a', files)
+    b = write_tree(tmp_path / 'b', files)
+
+    merge = LanguageAnalyzer.merge
+
+    def broken(self, path, rel, partial):
+        if path.startswith(a) and rel == 'm3.py':
+            raise RuntimeError('boom')
+        return merge(self, path, rel, partial)
+    monkeypatch.setattr(LanguageAnalyzer, 'merge', broken)
+
+    service = serve.ScanService(2, 10.0, None)
+    scheduler = threading.Thread(target=service.run, daemon=True)
+    scheduler.start()
+    try:
+        job_a, job_b = service.submit(a), service.submit(b)
+        assert job_a.done.wait(60) and job_b.done.wait(60)
+    finally:
+        service.stop()
+        scheduler.join(60)
+    assert job_a.status == 'failed' and 'boom' in job_a.error
+    assert job_b.status == 'done', job_b.error
+    assert job_b.results['sloc']['total'] == 40
@@ -0,0 +1,49 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='нужен git')
+
+# разделы, которые --since пересчитывает по изменённым файлам; языки,
+# SLOC, стек и зависимости берутся из прежнего отчёта
+DELTA_SECTIONS = ('secrets', 'endpoints', 'ajax', 'headers', 'configs', 'config_secrets')
+
+
+def git(repo, *args):
+    subprocess.run(['git', '-C', repo] + list(args), check=True,
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+@pytest.fixture
+def committed(repo):
+    git(repo, 'init', '-q')
+    git(repo, 'add', '-A')
+    git(repo, '-c', 'user.name=t', '-c', 'user.email=t@example.com', 'commit', '-q', '-m', 'base')
+    return repo
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_since_merge_equals_full_scan(committed, tmp_path, scan, compact):
+    repo = committed
+    # первый отчёт fixture scan пишет в report-0.json
+    scan(repo, '-j', '1', *(['--compact'] if compact else []))
+    previous = tmp_path / 'report-0.json'
+
+    with open(os.path.join(repo, 'web/server.js'), 'a', encoding='utf-8') as f:
+        f.write("app.put('/api/users/1', update);\nres.setHeader('X-Extra', '1');\n")
+    with open(os.path.join(repo, 'web/client.js'), 'w', encoding='utf-8') as f:
+        f.write("fetch('/api/other');\n")
+    os.remove(os.path.join(repo, 'py/views.py'))
+    git(repo, 'mv', 'src/main/java/com/x/App.java', 'src/main/java/com/x/Main.java')
+    with open(os.path.join(repo, '.env'), 'a', encoding='utf-8') as f:
+        f.write('secret=rotated123\n')
+
+    merged = scan(repo, '-j', '1', '--since', 'HEAD', '--previous', previous)
+    full = scan(repo, '-j', '1')
+    for section in DELTA_SECTIONS:
+        assert merged[section] == full[section], section
+    # дельта действительно что-то поменяла
+    assert any(r['endpoint'] == '/api/users/1' for r in merged['endpoints'])
+    assert not [r for r in merged['endpoints'] if 'views.py' in r['file']]